@@ -5,12 +5,14 @@ from sqlalchemy import engine_from_config, pool
 
 from src.config import settings
 from src.models.base import Base
-from src.models.category import Category, ProductCategory
+from src.models.category import Category, ProductCategory, CategoryClosure
 from src.models.collection import Collection, CollectionImage, CollectionProduct
 from src.models.orders import Order, OrderProduct
-from src.models.product import Product, ProductColor, ProductImage, ProductSection, ProductSize
+from src.models.product import Product, ProductCard, ProductColor, ProductImage, ProductSection, ProductSize
 from src.models.promocode import PromoCode
 from src.models.site_settings import SiteSetting
+from src.models.idempotency import IdempotencyKey
+from src.models.webhooks import WebhookEvent
 from src.models.user import User
 
 config = context.config
@@ -0,0 +1,48 @@
+"""add category closure table
+
+Revision ID: 20261017_0007
+Revises: 20260323_0006
+Create Date: 2026-10-17 00:07:00
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "20261017_0007"
+down_revision = "20260323_0006"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+    if "category_closure" not in inspector.get_table_names():
+        op.create_table(
+            "category_closure",
+            sa.Column("ancestor_id", sa.Integer(), sa.ForeignKey("categories.id", ondelete="CASCADE"), primary_key=True),
+            sa.Column("descendant_id", sa.Integer(), sa.ForeignKey("categories.id", ondelete="CASCADE"), primary_key=True),
+            sa.Column("depth", sa.Integer(), nullable=False, server_default="0"),
+        )
+        op.create_index("ix_category_closure_descendant_id", "category_closure", ["descendant_id"])
+
+    op.execute("DELETE FROM category_closure")
+
+    op.execute(
+        """
+        WITH RECURSIVE category_tree (ancestor_id, descendant_id, depth) AS (
+            SELECT id, id, 0 FROM categories
+            UNION ALL
+            SELECT category_tree.ancestor_id, categories.id, category_tree.depth + 1
+            FROM category_tree
+            JOIN categories ON categories.parent_id = category_tree.descendant_id
+            WHERE category_tree.depth < 32
+        )
+        INSERT INTO category_closure (ancestor_id, descendant_id, depth)
+        SELECT ancestor_id, descendant_id, depth FROM category_tree
+        """
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_category_closure_descendant_id", table_name="category_closure")
+    op.drop_table("category_closure")
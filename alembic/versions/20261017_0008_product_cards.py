@@ -0,0 +1,43 @@
+"""add product_cards read model
+
+Revision ID: 20261017_0008
+Revises: 20261017_0007
+Create Date: 2026-10-17 00:08:00
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "20261017_0008"
+down_revision = "20261017_0007"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Содержимое карточек собирается в Python (rebuild_product_cards) при старте приложения
+    inspector = sa.inspect(op.get_bind())
+    if "product_cards" not in inspector.get_table_names():
+        op.create_table(
+            "product_cards",
+            sa.Column("color_id", sa.Integer(), sa.ForeignKey("product_colors.id", ondelete="CASCADE"), primary_key=True),
+            sa.Column("product_id", sa.Integer(), sa.ForeignKey("products.id", ondelete="CASCADE"), nullable=False),
+            sa.Column("slug", sa.String(length=100), nullable=False),
+            sa.Column("status", sa.String(length=20), nullable=False),
+            sa.Column("sort_order", sa.Integer(), nullable=True),
+            sa.Column("created_at", sa.DateTime(), nullable=True),
+            sa.Column("price", sa.Numeric(10, 2), nullable=False),
+            sa.Column("search_text", sa.Text(), nullable=False, server_default=""),
+            sa.Column("data", sa.JSON(), nullable=False),
+            sa.Column("updated_at", sa.DateTime(), nullable=False),
+        )
+        op.create_index("ix_product_cards_product_id", "product_cards", ["product_id"])
+        op.create_index("ix_product_cards_slug", "product_cards", ["slug"])
+        op.create_index("ix_product_cards_status", "product_cards", ["status"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_product_cards_status", table_name="product_cards")
+    op.drop_index("ix_product_cards_slug", table_name="product_cards")
+    op.drop_index("ix_product_cards_product_id", table_name="product_cards")
+    op.drop_table("product_cards")
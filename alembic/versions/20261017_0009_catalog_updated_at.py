@@ -0,0 +1,44 @@
+"""add updated_at to catalog tables
+
+Revision ID: 20261017_0009
+Revises: 20261017_0008
+Create Date: 2026-10-17 00:09:00
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "20261017_0009"
+down_revision = "20261017_0008"
+branch_labels = None
+depends_on = None
+
+TABLES = (
+    "products",
+    "product_colors",
+    "product_sizes",
+    "product_images",
+    "categories",
+    "collections",
+)
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    dialect = bind.dialect.name
+    inspector = sa.inspect(bind)
+
+    for table in TABLES:
+        if "updated_at" in {column["name"] for column in inspector.get_columns(table)}:
+            continue
+        if dialect == "postgresql":
+            op.execute(f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS updated_at TIMESTAMP DEFAULT now()")
+        else:
+            # SQLite не допускает неконстантный DEFAULT в ADD COLUMN
+            op.add_column(table, sa.Column("updated_at", sa.DateTime(), nullable=True))
+        op.execute(f"UPDATE {table} SET updated_at = COALESCE(created_at, CURRENT_TIMESTAMP) WHERE updated_at IS NULL")
+
+
+def downgrade() -> None:
+    for table in reversed(TABLES):
+        op.drop_column(table, "updated_at")
@@ -0,0 +1,33 @@
+"""add composite indexes for keyset pagination
+
+Revision ID: 20261017_0010
+Revises: 20261017_0009
+Create Date: 2026-10-17 00:10:00
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "20261017_0010"
+down_revision = "20261017_0009"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+    card_indexes = {index["name"] for index in inspector.get_indexes("product_cards")}
+    if "ix_product_cards_listing" not in card_indexes:
+        op.create_index(
+            "ix_product_cards_listing",
+            "product_cards",
+            ["sort_order", sa.text("created_at DESC"), sa.text("color_id DESC")],
+        )
+    order_indexes = {index["name"] for index in inspector.get_indexes("orders")}
+    if "ix_orders_created_at_id" not in order_indexes:
+        op.create_index("ix_orders_created_at_id", "orders", ["created_at", "id"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_orders_created_at_id", table_name="orders")
+    op.drop_index("ix_product_cards_listing", table_name="product_cards")
@@ -0,0 +1,77 @@
+"""add full-text search for product_cards
+
+Revision ID: 20261017_0011
+Revises: 20261017_0010
+Create Date: 2026-10-17 00:11:00
+"""
+
+from alembic import op
+
+revision = "20261017_0011"
+down_revision = "20261017_0010"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    dialect = op.get_bind().dialect.name
+
+    if dialect == "postgresql":
+        op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        op.execute(
+            """
+            ALTER TABLE product_cards ADD COLUMN IF NOT EXISTS search_vector tsvector GENERATED ALWAYS AS (
+                setweight(to_tsvector('russian'::regconfig, split_part(search_text, E'\\n', 1)), 'A') ||
+                setweight(to_tsvector('english'::regconfig, split_part(search_text, E'\\n', 1)), 'A') ||
+                setweight(to_tsvector('russian'::regconfig, search_text), 'B') ||
+                setweight(to_tsvector('english'::regconfig, search_text), 'B')
+            ) STORED
+            """
+        )
+        op.execute("CREATE INDEX IF NOT EXISTS ix_product_cards_search_vector ON product_cards USING gin (search_vector)")
+        op.execute("CREATE INDEX IF NOT EXISTS ix_product_cards_search_trgm ON product_cards USING gin (search_text gin_trgm_ops)")
+    elif dialect == "sqlite":
+        op.execute(
+            """
+            CREATE VIRTUAL TABLE IF NOT EXISTS product_cards_fts USING fts5(
+                search_text, content='product_cards', content_rowid='color_id',
+                tokenize='unicode61 remove_diacritics 2'
+            )
+            """
+        )
+        op.execute(
+            """
+            CREATE TRIGGER IF NOT EXISTS product_cards_fts_ai AFTER INSERT ON product_cards BEGIN
+                INSERT INTO product_cards_fts(rowid, search_text) VALUES (new.color_id, new.search_text);
+            END
+            """
+        )
+        op.execute(
+            """
+            CREATE TRIGGER IF NOT EXISTS product_cards_fts_ad AFTER DELETE ON product_cards BEGIN
+                INSERT INTO product_cards_fts(product_cards_fts, rowid, search_text) VALUES ('delete', old.color_id, old.search_text);
+            END
+            """
+        )
+        op.execute(
+            """
+            CREATE TRIGGER IF NOT EXISTS product_cards_fts_au AFTER UPDATE OF search_text ON product_cards BEGIN
+                INSERT INTO product_cards_fts(product_cards_fts, rowid, search_text) VALUES ('delete', old.color_id, old.search_text);
+                INSERT INTO product_cards_fts(rowid, search_text) VALUES (new.color_id, new.search_text);
+            END
+            """
+        )
+        op.execute("INSERT INTO product_cards_fts(product_cards_fts) VALUES ('rebuild')")
+
+
+def downgrade() -> None:
+    dialect = op.get_bind().dialect.name
+
+    if dialect == "postgresql":
+        op.execute("DROP INDEX IF EXISTS ix_product_cards_search_trgm")
+        op.execute("DROP INDEX IF EXISTS ix_product_cards_search_vector")
+        op.execute("ALTER TABLE product_cards DROP COLUMN IF EXISTS search_vector")
+    elif dialect == "sqlite":
+        for trigger in ("product_cards_fts_ai", "product_cards_fts_ad", "product_cards_fts_au"):
+            op.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+        op.execute("DROP TABLE IF EXISTS product_cards_fts")
@@ -0,0 +1,45 @@
+"""add color columns to product_cards for faceted filters
+
+Revision ID: 20261017_0012
+Revises: 20261017_0011
+Create Date: 2026-10-17 00:12:00
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "20261017_0012"
+down_revision = "20261017_0011"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+    columns = {column["name"] for column in inspector.get_columns("product_cards")}
+    if "label" not in columns:
+        op.add_column("product_cards", sa.Column("label", sa.String(length=100), nullable=True))
+    if "hex" not in columns:
+        op.add_column("product_cards", sa.Column("hex", sa.String(length=7), nullable=True))
+    indexes = {index["name"] for index in inspector.get_indexes("product_cards")}
+    if "ix_product_cards_label" not in indexes:
+        op.create_index("ix_product_cards_label", "product_cards", ["label"])
+    # Размеры фасета берутся из product_sizes: доступные размеры цвета ищем по (цвет, количество)
+    size_indexes = {index["name"] for index in inspector.get_indexes("product_sizes")}
+    if "ix_product_sizes_color_quantity" not in size_indexes:
+        op.create_index("ix_product_sizes_color_quantity", "product_sizes", ["product_color_id", "size", "quantity"])
+
+    op.execute(
+        """
+        UPDATE product_cards SET
+            label = (SELECT product_colors.label FROM product_colors WHERE product_colors.id = product_cards.color_id),
+            hex = (SELECT product_colors.hex FROM product_colors WHERE product_colors.id = product_cards.color_id)
+        """
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_product_sizes_color_quantity", table_name="product_sizes")
+    op.drop_index("ix_product_cards_label", table_name="product_cards")
+    op.drop_column("product_cards", "hex")
+    op.drop_column("product_cards", "label")
@@ -0,0 +1,53 @@
+"""add popularity and sort indexes to product_cards for category listings
+
+Revision ID: 20261017_0013
+Revises: 20261017_0012
+Create Date: 2026-10-17 00:13:00
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "20261017_0013"
+down_revision = "20261017_0012"
+branch_labels = None
+depends_on = None
+
+SORT_INDEXES = {
+    "ix_product_cards_newest": ["created_at", "color_id"],
+    "ix_product_cards_price": ["price", "color_id"],
+    "ix_product_cards_popularity": ["popularity", "color_id"],
+}
+
+
+def upgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+    columns = {column["name"] for column in inspector.get_columns("product_cards")}
+    if "popularity" not in columns:
+        op.add_column(
+            "product_cards",
+            sa.Column("popularity", sa.Integer(), nullable=False, server_default=sa.text("0")),
+        )
+    indexes = {index["name"] for index in inspector.get_indexes("product_cards")}
+    for name, index_columns in SORT_INDEXES.items():
+        if name not in indexes:
+            op.create_index(name, "product_cards", index_columns)
+
+    op.execute(
+        """
+        UPDATE product_cards SET popularity = COALESCE((
+            SELECT SUM(order_products.quantity)
+            FROM order_products
+            JOIN product_sizes ON product_sizes.id = order_products.product_size_id
+            JOIN orders ON orders.id = order_products.order_id
+            WHERE product_sizes.product_color_id = product_cards.color_id
+              AND lower(orders.status) NOT IN ('cancelled', 'payment_failed', 'refunded')
+        ), 0)
+        """
+    )
+
+
+def downgrade() -> None:
+    for name in SORT_INDEXES:
+        op.drop_index(name, table_name="product_cards")
+    op.drop_column("product_cards", "popularity")
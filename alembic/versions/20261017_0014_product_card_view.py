@@ -0,0 +1,26 @@
+"""add lightweight card projection to product_cards
+
+Revision ID: 20261017_0014
+Revises: 20261017_0013
+Create Date: 2026-10-17 00:14:00
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "20261017_0014"
+down_revision = "20261017_0013"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+    columns = {column["name"] for column in inspector.get_columns("product_cards")}
+    if "card" not in columns:
+        # Заполняется пересборкой карточек при старте приложения (_ensure_product_cards)
+        op.add_column("product_cards", sa.Column("card", sa.JSON(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column("product_cards", "card")
@@ -0,0 +1,73 @@
+"""add product snapshot columns to order_products
+
+Revision ID: 20261017_0015
+Revises: 20261017_0014
+Create Date: 2026-10-17 00:15:00
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "20261017_0015"
+down_revision = "20261017_0014"
+branch_labels = None
+depends_on = None
+
+SNAPSHOT_COLUMNS = [
+    sa.Column("product_id", sa.Integer(), nullable=True),
+    sa.Column("product_color_id", sa.Integer(), nullable=True),
+    sa.Column("slug", sa.String(length=100), nullable=True),
+    sa.Column("title", sa.String(length=200), nullable=True),
+    sa.Column("label", sa.String(length=100), nullable=True),
+    sa.Column("hex", sa.String(length=7), nullable=True),
+    sa.Column("size", sa.String(length=10), nullable=True),
+    sa.Column("price", sa.Numeric(10, 2), nullable=True),
+    sa.Column("discount_price", sa.Numeric(10, 2), nullable=True),
+    sa.Column("unit_price", sa.Numeric(10, 2), nullable=True),
+    sa.Column("currency", sa.String(length=3), nullable=True),
+    sa.Column("weight", sa.Float(), nullable=True),
+]
+
+# Существующие строки получают снимок текущего каталога — исторические цены уже не восстановить
+BACKFILL = {
+    "product_id": "products.id",
+    "product_color_id": "product_colors.id",
+    "slug": "product_colors.slug",
+    "label": "product_colors.label",
+    "hex": "product_colors.hex",
+    "size": "product_sizes.size",
+    "price": "COALESCE(product_colors.price, products.price)",
+    "discount_price": "COALESCE(product_colors.discount_price, products.discount_price)",
+    "unit_price": "COALESCE(product_colors.discount_price, products.discount_price, product_colors.price, products.price)",
+    "currency": "COALESCE(products.currency, 'RUB')",
+    "weight": "products.weight",
+    # title последним: по нему отбираются строки без снимка
+    "title": "product_colors.title",
+}
+
+
+def upgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+    columns = {column["name"] for column in inspector.get_columns("order_products")}
+    for column in SNAPSHOT_COLUMNS:
+        if column.name not in columns:
+            op.add_column("order_products", column)
+
+    for name, expression in BACKFILL.items():
+        op.execute(
+            f"""
+            UPDATE order_products SET {name} = (
+                SELECT {expression}
+                FROM product_sizes
+                JOIN product_colors ON product_colors.id = product_sizes.product_color_id
+                JOIN products ON products.id = product_colors.product_id
+                WHERE product_sizes.id = order_products.product_size_id
+            )
+            WHERE order_products.title IS NULL
+            """
+        )
+
+
+def downgrade() -> None:
+    for column in reversed(SNAPSHOT_COLUMNS):
+        op.drop_column("order_products", column.name)
@@ -0,0 +1,33 @@
+"""add stock reservation state and expiry to orders
+
+Revision ID: 20261017_0016
+Revises: 20261017_0015
+Create Date: 2026-10-17 00:16:00
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "20261017_0016"
+down_revision = "20261017_0015"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+    columns = {column["name"] for column in inspector.get_columns("orders")}
+    # Существующие заказы остаются без резерва (NULL): воркер их не трогает
+    if "reservation_status" not in columns:
+        op.add_column("orders", sa.Column("reservation_status", sa.String(length=20), nullable=True))
+    if "reserved_until" not in columns:
+        op.add_column("orders", sa.Column("reserved_until", sa.DateTime(), nullable=True))
+    indexes = {index["name"] for index in inspector.get_indexes("orders")}
+    if "ix_orders_reservation_expiry" not in indexes:
+        op.create_index("ix_orders_reservation_expiry", "orders", ["reservation_status", "reserved_until"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_orders_reservation_expiry", table_name="orders")
+    op.drop_column("orders", "reserved_until")
+    op.drop_column("orders", "reservation_status")
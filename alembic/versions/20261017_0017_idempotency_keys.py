@@ -0,0 +1,41 @@
+"""add idempotency_keys table for order creation and payment init
+
+Revision ID: 20261017_0017
+Revises: 20261017_0016
+Create Date: 2026-10-17 00:17:00
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "20261017_0017"
+down_revision = "20261017_0016"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+    if "idempotency_keys" in inspector.get_table_names():
+        return
+    op.create_table(
+        "idempotency_keys",
+        sa.Column("id", sa.Integer(), primary_key=True, autoincrement=True),
+        sa.Column("scope", sa.String(length=50), nullable=False),
+        sa.Column("key", sa.String(length=255), nullable=False),
+        sa.Column("request_hash", sa.String(length=64), nullable=False),
+        sa.Column("state", sa.String(length=20), nullable=False),
+        sa.Column("response_status", sa.Integer(), nullable=True),
+        sa.Column("response_body", sa.Text(), nullable=True),
+        sa.Column("created_at", sa.DateTime(), server_default=sa.func.now(), nullable=True),
+        sa.Column("completed_at", sa.DateTime(), nullable=True),
+        sa.UniqueConstraint("scope", "key", name="uq_idempotency_keys_scope_key"),
+    )
+    op.create_index("ix_idempotency_keys_id", "idempotency_keys", ["id"])
+    op.create_index("ix_idempotency_keys_created_at", "idempotency_keys", ["created_at"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_idempotency_keys_created_at", table_name="idempotency_keys")
+    op.drop_index("ix_idempotency_keys_id", table_name="idempotency_keys")
+    op.drop_table("idempotency_keys")
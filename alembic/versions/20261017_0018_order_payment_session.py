@@ -0,0 +1,34 @@
+"""store the live payment session (url, expiry, amount) on orders
+
+Revision ID: 20261017_0018
+Revises: 20261017_0017
+Create Date: 2026-10-17 00:18:00
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "20261017_0018"
+down_revision = "20261017_0017"
+branch_labels = None
+depends_on = None
+
+PAYMENT_SESSION_COLUMNS = [
+    sa.Column("payment_url", sa.String(length=500), nullable=True),
+    sa.Column("payment_expires_at", sa.DateTime(), nullable=True),
+    sa.Column("payment_amount", sa.Numeric(10, 2), nullable=True),
+]
+
+
+def upgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+    columns = {column["name"] for column in inspector.get_columns("orders")}
+    # Существующие сессии не восстановить: первая инициализация после миграции создаст новую
+    for column in PAYMENT_SESSION_COLUMNS:
+        if column.name not in columns:
+            op.add_column("orders", column)
+
+
+def downgrade() -> None:
+    for column in reversed(PAYMENT_SESSION_COLUMNS):
+        op.drop_column("orders", column.name)
@@ -0,0 +1,30 @@
+"""track when an order's payment status was last checked with the provider
+
+Revision ID: 20261017_0019
+Revises: 20261017_0018
+Create Date: 2026-10-17 00:19:00
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "20261017_0019"
+down_revision = "20261017_0018"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+    columns = {column["name"] for column in inspector.get_columns("orders")}
+    # NULL — ещё не сверялся: такие заказы фоновая сверка берёт первыми
+    if "payment_checked_at" not in columns:
+        op.add_column("orders", sa.Column("payment_checked_at", sa.DateTime(), nullable=True))
+    indexes = {index["name"] for index in inspector.get_indexes("orders")}
+    if "ix_orders_payment_check" not in indexes:
+        op.create_index("ix_orders_payment_check", "orders", ["status", "payment_checked_at"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_orders_payment_check", table_name="orders")
+    op.drop_column("orders", "payment_checked_at")
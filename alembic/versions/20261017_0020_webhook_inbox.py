@@ -0,0 +1,46 @@
+"""add webhook_inbox table for durable TBank and CDEK webhooks
+
+Revision ID: 20261017_0020
+Revises: 20261017_0019
+Create Date: 2026-10-17 00:20:00
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "20261017_0020"
+down_revision = "20261017_0019"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+    if "webhook_inbox" in inspector.get_table_names():
+        return
+    op.create_table(
+        "webhook_inbox",
+        sa.Column("id", sa.Integer(), primary_key=True, autoincrement=True),
+        sa.Column("provider", sa.String(length=20), nullable=False),
+        sa.Column("dedup_key", sa.String(length=200), nullable=False),
+        sa.Column("order_key", sa.String(length=100), nullable=False),
+        sa.Column("body", sa.Text(), nullable=False),
+        sa.Column("state", sa.String(length=20), nullable=False),
+        sa.Column("attempts", sa.Integer(), nullable=False),
+        sa.Column("next_attempt_at", sa.DateTime(), server_default=sa.func.now(), nullable=True),
+        sa.Column("locked_until", sa.DateTime(), nullable=True),
+        sa.Column("last_error", sa.Text(), nullable=True),
+        sa.Column("received_at", sa.DateTime(), server_default=sa.func.now(), nullable=True),
+        sa.Column("processed_at", sa.DateTime(), nullable=True),
+        sa.UniqueConstraint("provider", "dedup_key", name="uq_webhook_inbox_provider_dedup_key"),
+    )
+    op.create_index("ix_webhook_inbox_id", "webhook_inbox", ["id"])
+    op.create_index("ix_webhook_inbox_state_next_attempt", "webhook_inbox", ["state", "next_attempt_at"])
+    op.create_index("ix_webhook_inbox_order_key_id", "webhook_inbox", ["order_key", "id"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_webhook_inbox_order_key_id", table_name="webhook_inbox")
+    op.drop_index("ix_webhook_inbox_state_next_attempt", table_name="webhook_inbox")
+    op.drop_index("ix_webhook_inbox_id", table_name="webhook_inbox")
+    op.drop_table("webhook_inbox")
@@ -0,0 +1,144 @@
+"""
+Бенчмарк задержки запросов к провайдеру: новый httpx-клиент на вызов против общего пула.
+
+Локальный HTTPS-заглушка-сервер (самоподписанный сертификат, keep-alive) отвечает как TBank Init.
+Сравниваются два пути:
+  per_call — прежний код: ``async with httpx.AsyncClient()`` внутри каждого метода,
+             т.е. новое TCP- и TLS-соединение (и новый SSL-контекст) на каждый запрос;
+  pooled   — общий клиент src.services.http_clients с keep-alive соединениями.
+
+Печатаются медиана и p95 последовательных запросов и время пачки параллельных запросов.
+На реальном провайдере к разнице добавляются ещё 2–3 RTT рукопожатия на каждый запрос:
+
+    python -m benchmarks.provider_http
+"""
+import asyncio
+import datetime
+import os
+import ssl
+import statistics
+import tempfile
+import time
+
+for _name in ("POSTGRES_DB", "POSTGRES_USER", "POSTGRES_PASSWORD", "SECRET_KEY", "MINIO_ROOT_USER", "MINIO_ROOT_PASSWORD"):
+    os.environ.setdefault(_name, "bench")
+
+import httpx
+from cryptography import x509
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import ec
+from cryptography.x509.oid import NameOID
+
+from src.config import settings
+from src.services.http_clients import TBANK, _provider_settings
+
+SEQUENTIAL = 200
+CONCURRENT = 50
+BODY = b'{"Success":true,"PaymentId":1,"PaymentURL":"https://pay.test/1"}'
+
+
+def self_signed_cert(directory: str) -> tuple[str, str]:
+    key = ec.generate_private_key(ec.SECP256R1())
+    name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, "localhost")])
+    now = datetime.datetime.now(datetime.timezone.utc)
+    cert = (
+        x509.CertificateBuilder()
+        .subject_name(name)
+        .issuer_name(name)
+        .public_key(key.public_key())
+        .serial_number(x509.random_serial_number())
+        .not_valid_before(now - datetime.timedelta(days=1))
+        .not_valid_after(now + datetime.timedelta(days=1))
+        .add_extension(x509.SubjectAlternativeName([x509.DNSName("localhost")]), critical=False)
+        .add_extension(x509.BasicConstraints(ca=True, path_length=None), critical=True)
+        .sign(key, hashes.SHA256())
+    )
+    cert_path, key_path = os.path.join(directory, "cert.pem"), os.path.join(directory, "key.pem")
+    with open(cert_path, "wb") as f:
+        f.write(cert.public_bytes(serialization.Encoding.PEM))
+    with open(key_path, "wb") as f:
+        f.write(key.private_bytes(
+            serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption()
+        ))
+    return cert_path, key_path
+
+
+async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+    """Минимальный HTTP/1.1 с keep-alive: читает запрос и отвечает фиксированным JSON."""
+    try:
+        while True:
+            head = await reader.readuntil(b"\r\n\r\n")
+            length = 0
+            for line in head.split(b"\r\n"):
+                name, _, value = line.partition(b":")
+                if name.strip().lower() == b"content-length":
+                    length = int(value)
+            if length:
+                await reader.readexactly(length)
+            writer.write(
+                b"HTTP/1.1 200 OK\r\nContent-Type: application/json\r\n"
+                b"Content-Length: " + str(len(BODY)).encode() + b"\r\n\r\n" + BODY
+            )
+            await writer.drain()
+    except (asyncio.IncompleteReadError, ConnectionError, ssl.SSLError):
+        pass
+    finally:
+        writer.close()
+
+
+async def per_call(url: str, verify: ssl.SSLContext, _: httpx.AsyncClient) -> None:
+    async with httpx.AsyncClient(verify=verify) as client:
+        (await client.post(url, json={"TerminalKey": "bench"}, timeout=30.0)).json()
+
+
+async def pooled(url: str, _: ssl.SSLContext, client: httpx.AsyncClient) -> None:
+    (await client.post(url, json={"TerminalKey": "bench"}, timeout=30.0)).json()
+
+
+async def measure(path, url: str, verify: ssl.SSLContext, client: httpx.AsyncClient) -> tuple[float, float, float]:
+    await path(url, verify, client)  # прогрев
+    timings = []
+    for _ in range(SEQUENTIAL):
+        started = time.perf_counter()
+        await path(url, verify, client)
+        timings.append(time.perf_counter() - started)
+    started = time.perf_counter()
+    await asyncio.gather(*(path(url, verify, client) for _ in range(CONCURRENT)))
+    burst = time.perf_counter() - started
+    p95 = statistics.quantiles(timings, n=20)[-1]
+    return statistics.median(timings), p95, burst
+
+
+async def main() -> None:
+    with tempfile.TemporaryDirectory() as directory:
+        cert_path, key_path = self_signed_cert(directory)
+        server_ssl = ssl.create_default_context(ssl.Purpose.CLIENT_AUTH)
+        server_ssl.load_cert_chain(cert_path, key_path)
+        verify = ssl.create_default_context(cafile=cert_path)
+
+        server = await asyncio.start_server(handle, "127.0.0.1", 0, ssl=server_ssl)
+        port = server.sockets[0].getsockname()[1]
+        url = f"https://localhost:{port}/v2/Init"
+
+        max_connections, timeout = _provider_settings(TBANK)
+        shared = httpx.AsyncClient(
+            verify=verify,
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_connections,
+                keepalive_expiry=settings.HTTP_KEEPALIVE_SECONDS,
+            ),
+            timeout=httpx.Timeout(timeout, connect=settings.HTTP_CONNECT_TIMEOUT),
+        )
+
+        print(f"stub: {url}  sequential={SEQUENTIAL} concurrent={CONCURRENT} pool={max_connections}")
+        print(f"{'path':<9} {'median, ms':>11} {'p95, ms':>8} {'burst, ms':>10}")
+        async with server:
+            for path in (per_call, pooled):
+                median, p95, burst = await measure(path, url, verify, shared)
+                print(f"{path.__name__:<9} {median * 1000:>11.2f} {p95 * 1000:>8.2f} {burst * 1000:>10.1f}")
+            await shared.aclose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
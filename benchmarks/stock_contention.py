@@ -0,0 +1,130 @@
+"""
+Бенчмарк списания остатков на одном «горячем» размере при конкурентных заказах.
+
+Много корутин одновременно покупают один SKU, каждая в своей сессии и транзакции:
+  locked_rmw — прежний путь: SELECT ... FOR UPDATE, проверка в Python, запись остатка;
+  atomic     — decrement_stock: UPDATE ... SET quantity = quantity - n WHERE quantity >= n RETURNING;
+  order      — полный crud.create_order поверх atomic (заказ, снимки строк, карточки витрины).
+
+Для каждого пути печатаются время, число успешных покупок и итоговый остаток: успехов должно
+быть ровно min(остаток, покупки), перепродажа (oversold) — 0. На SQLite запись сериализуется
+самой БД, показательные цифры даёт Postgres (BENCH_DATABASE_URL, таблицы будут пересозданы):
+
+    python -m benchmarks.stock_contention
+"""
+import asyncio
+import os
+import tempfile
+import time
+
+_DEFAULT_URL = f"sqlite+aiosqlite:///{tempfile.gettempdir()}/psih-bench-stock.db"
+os.environ["DATABASE_URL"] = os.environ.get("BENCH_DATABASE_URL", _DEFAULT_URL)
+for _name in ("POSTGRES_DB", "POSTGRES_USER", "POSTGRES_PASSWORD", "SECRET_KEY", "MINIO_ROOT_USER", "MINIO_ROOT_PASSWORD"):
+    os.environ.setdefault(_name, "bench")
+
+from fastapi import HTTPException
+from sqlalchemy import select
+from sqlalchemy.exc import OperationalError
+
+from src.crud.orders import create_order, decrement_stock
+from src.database import AsyncSessionLocal, engine
+from src.models.base import Base
+from src.models.product import Product, ProductColor, ProductSize
+from src.schemas.orders import OrderCreate, OrderProductCreate
+
+STOCK = 50
+BUYERS = 200
+QUANTITY = 1
+
+
+async def seed() -> int:
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+        await conn.run_sync(Base.metadata.create_all)
+    async with AsyncSessionLocal() as db:
+        product = Product(description="Drop", price="4990.00", weight=0.5, currency="RUB")
+        db.add(product)
+        await db.flush()
+        color = ProductColor(product_id=product.id, slug="drop", title="Drop", label="Black", hex="#000000")
+        db.add(color)
+        await db.flush()
+        size = ProductSize(product_color_id=color.id, size="M", quantity=STOCK)
+        db.add(size)
+        await db.commit()
+        return size.id
+
+
+async def locked_rmw(size_id: int, _: int) -> bool:
+    async with AsyncSessionLocal() as db:
+        size = await db.scalar(select(ProductSize).where(ProductSize.id == size_id).with_for_update())
+        if size.quantity < QUANTITY:
+            await db.rollback()
+            return False
+        size.quantity -= QUANTITY
+        await db.commit()
+        return True
+
+
+async def atomic(size_id: int, _: int) -> bool:
+    async with AsyncSessionLocal() as db:
+        size = await db.get(ProductSize, size_id)
+        try:
+            await decrement_stock(db, {size_id: size}, {size_id: QUANTITY})
+        except HTTPException:
+            return False
+        await db.commit()
+        return True
+
+
+async def order(size_id: int, index: int) -> bool:
+    async with AsyncSessionLocal() as db:
+        try:
+            await create_order(
+                db,
+                OrderCreate(email=f"buyer{index}@example.com", first_name="Bench", last_name="Buyer"),
+                [OrderProductCreate(product_size_id=size_id, quantity=QUANTITY)],
+            )
+        except HTTPException as e:
+            if e.status_code != 400:
+                raise
+            return False
+        return True
+
+
+async def run(path, size_id: int) -> tuple[float, int, int, int]:
+    errors = 0
+
+    async def buyer(index: int) -> bool:
+        nonlocal errors
+        try:
+            return await path(size_id, index)
+        except OperationalError:
+            # Таймаут блокировки/«database is locked» считается неудачной покупкой
+            errors += 1
+            return False
+
+    started = time.perf_counter()
+    results = await asyncio.gather(*(buyer(index) for index in range(BUYERS)))
+    elapsed = time.perf_counter() - started
+    async with AsyncSessionLocal() as db:
+        remaining = await db.scalar(select(ProductSize.quantity).where(ProductSize.id == size_id))
+    return elapsed, sum(results), remaining, errors
+
+
+async def main() -> None:
+    print(f"database: {engine.url.render_as_string(hide_password=True)}")
+    print(f"stock={STOCK} buyers={BUYERS} quantity={QUANTITY}")
+    print(f"{'path':<11} {'ms':>8} {'orders/s':>9} {'sold':>5} {'left':>5} {'oversold':>9} {'errors':>7}")
+    for path in (locked_rmw, atomic, order):
+        size_id = await seed()
+        elapsed, sold, remaining, errors = await run(path, size_id)
+        oversold = sold * QUANTITY - (STOCK - remaining)
+        print(
+            f"{path.__name__:<11} {elapsed * 1000:>8.1f} {sold / elapsed:>9.0f} "
+            f"{sold:>5} {remaining:>5} {oversold:>9} {errors:>7}"
+        )
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
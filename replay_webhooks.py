@@ -0,0 +1,56 @@
+"""
+Replay stored provider webhooks from the webhook_inbox table.
+
+Events are put back into the queue with their attempt counter reset and processed
+right away (the running application's webhook worker would pick them up as well).
+
+Usage:
+    python replay_webhooks.py                       # all dead events
+    python replay_webhooks.py --id 12 --id 15       # specific events, in any state
+    python replay_webhooks.py --provider tbank --since 2026-10-01 --state dead --state done
+"""
+import argparse
+import asyncio
+from datetime import datetime
+
+from src.database import AsyncSessionLocal, engine
+from src.crud.webhook_inbox import replay_webhook_events
+from src.models.webhooks import WebhookEvent
+from src.services.webhook_inbox import process_pending_webhooks
+# Роутеры регистрируют обработчики вебхуков своих провайдеров
+import src.routers.payments  # noqa: F401
+import src.routers.webhooks  # noqa: F401
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Replay stored TBank/CDEK webhooks")
+    parser.add_argument("--id", dest="ids", type=int, action="append", help="event id (repeatable)")
+    parser.add_argument("--provider", choices=["tbank", "cdek"])
+    parser.add_argument(
+        "--state", dest="states", action="append",
+        choices=[WebhookEvent.DEAD, WebhookEvent.DONE, WebhookEvent.PENDING],
+        help="event states to replay (default: dead)",
+    )
+    parser.add_argument("--since", type=datetime.fromisoformat, help="received at or after (UTC, ISO date)")
+    parser.add_argument("--no-process", action="store_true", help="only re-queue, leave processing to the app")
+    return parser.parse_args()
+
+
+async def main() -> None:
+    args = parse_args()
+    async with AsyncSessionLocal() as db:
+        queued = await replay_webhook_events(
+            db,
+            ids=args.ids,
+            provider=args.provider,
+            states=args.states or [WebhookEvent.DEAD],
+            received_after=args.since,
+        )
+    print(f"Re-queued: {queued}")
+    if queued and not args.no_process:
+        print(f"Processed: {await process_pending_webhooks()}")
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -2,11 +2,12 @@ import httpx
 import asyncio
 import logging
 from typing import Optional, Dict, Any, List
-from datetime import datetime, timedelta
 from decimal import Decimal
 from cachetools import TTLCache
 from sqlalchemy.ext.asyncio import AsyncSession
 from src.config import settings
+from src.services.http_clients import CDEK, get_http_client
+from src.services.token_cache import TokenCache
 
 logger = logging.getLogger(__name__)
 
@@ -38,8 +39,8 @@ class CDEKClient:
         else:
             self.api_url = settings.CDEK_API_URL or "https://api.cdek.ru/v2"
         
-        self._access_token: Optional[str] = None
-        self._token_expires_at: Optional[datetime] = None
+        # Токен обновляется за 5 минут до истечения, одним запросом на все параллельные вызовы
+        self._token = TokenCache(self._fetch_access_token, refresh_margin=300)
         
         # Кеш для городов с TTL 1 день (86400 секунд)
         # TTLCache автоматически удаляет истекшие записи
@@ -61,52 +62,46 @@ class CDEKClient:
             )
     
     async def _get_access_token(self) -> str:
-        # Проверяем, не истек ли текущий токен (с запасом 5 минут)
-        if self._access_token and self._token_expires_at:
-            if datetime.now() < self._token_expires_at - timedelta(minutes=5):
-                return self._access_token
-        
+        return await self._token.get()
+
+    async def _fetch_access_token(self) -> tuple[str, float]:
         if not self.account or not self.secure_password:
             raise CDEKError("CDEK credentials not configured")
         
         # Получаем новый токен
-        async with httpx.AsyncClient() as client:
-            try:
-                response = await client.post(
-                    f"https://api.cdek.ru/v2/oauth/token",
-                    data={
-                        "grant_type": "client_credentials",
-                        "client_id": self.account,
-                        "client_secret": self.secure_password
-                    },
-                    headers={"Content-Type": "application/x-www-form-urlencoded"},
-                    timeout=10.0
-                )
-                
-                if response.status_code != 200:
-                    error_text = response.text
-                    logger.error(f"CDEK token request failed: {response.status_code} - {error_text}")
-                    raise CDEKError(f"Failed to get CDEK access token: {response.status_code}")
-                
-                data = response.json()
-                
-                if "access_token" not in data:
-                    logger.error(f"CDEK token response missing access_token: {data}")
-                    raise CDEKError("Invalid response from CDEK token endpoint")
-                
-                self._access_token = data["access_token"]
-                expires_in = data.get("expires_in", 3600)
-                self._token_expires_at = datetime.now() + timedelta(seconds=expires_in)
-                
-                logger.info("CDEK access token obtained successfully")
-                return self._access_token
-                
-            except httpx.HTTPError as e:
-                logger.error(f"HTTP error while getting CDEK token: {str(e)}")
-                raise CDEKError(f"CDEK authentication failed: {str(e)}")
-            except Exception as e:
-                logger.error(f"Unexpected error while getting CDEK token: {str(e)}")
-                raise CDEKError(f"CDEK authentication failed: {str(e)}")
+        client = get_http_client(CDEK)
+        try:
+            response = await client.post(
+                f"https://api.cdek.ru/v2/oauth/token",
+                data={
+                    "grant_type": "client_credentials",
+                    "client_id": self.account,
+                    "client_secret": self.secure_password
+                },
+                headers={"Content-Type": "application/x-www-form-urlencoded"},
+                timeout=10.0
+            )
+            
+            if response.status_code != 200:
+                error_text = response.text
+                logger.error(f"CDEK token request failed: {response.status_code} - {error_text}")
+                raise CDEKError(f"Failed to get CDEK access token: {response.status_code}")
+            
+            data = response.json()
+            
+            if "access_token" not in data:
+                logger.error(f"CDEK token response missing access_token: {data}")
+                raise CDEKError("Invalid response from CDEK token endpoint")
+            
+            logger.info("CDEK access token obtained successfully")
+            return data["access_token"], data.get("expires_in", 3600)
+            
+        except httpx.HTTPError as e:
+            logger.error(f"HTTP error while getting CDEK token: {str(e)}")
+            raise CDEKError(f"CDEK authentication failed: {str(e)}")
+        except Exception as e:
+            logger.error(f"Unexpected error while getting CDEK token: {str(e)}")
+            raise CDEKError(f"CDEK authentication failed: {str(e)}")
     
     async def add_order_to_cdek(
         self,
@@ -171,32 +166,18 @@ class CDEKClient:
             else:
                 products_dicts.append(product)
         
-        # Получаем веса товаров из БД
-        from src.models.product import Product
-        from sqlalchemy import select
-        
-        product_ids = [p.get("product_id") for p in products_dicts if p.get("product_id")]
-        product_weights = {}
-        if product_ids:
-            products_result = await db.execute(
-                select(Product).where(Product.id.in_(product_ids))
-            )
-            products = products_result.scalars().all()
-            product_weights = {p.id: p.weight for p in products}
-        
         for product in products_dicts:
-            # Получаем цену (используем discount_price если есть, иначе price)
-            price = product.get("discount_price") or product.get("price")
+            # Цена и вес — из снимка строки заказа (цена продажи с учётом цвета и скидки)
+            price = product.get("unit_price") or product.get("discount_price") or product.get("price")
             # Конвертируем Decimal в float для payment.value
             price_float = float(price) if price else 0.0
             
             # Формируем ware_key: slug-color-size
             ware_key = f"{product.get('slug', '')}-{product.get('label', '').lower()}-{product.get('size', '').lower()}"
             
-            # Получаем вес товара из БД (в КГ), конвертируем в граммы для CDEK
-            product_id = product.get("product_id")
+            # Вес в снимке хранится в КГ, конвертируем в граммы для CDEK
             # Если в базе 0.5 (кг), то для СДЭК это будет 0.5 * 1000 = 500 (грамм)
-            weight_kg = product_weights.get(product_id, 0.5) if product_id and product_weights else 0.5
+            weight_kg = product.get("weight") or 0.5
             item_weight_grams = int(weight_kg * 1000)
             
             item = {
@@ -253,56 +234,56 @@ class CDEKClient:
         
         # Отправляем запрос в CDEK
         try:
-            async with httpx.AsyncClient() as client:
-                response = await client.post(
-                    f"{self.api_url}/orders",
-                    json=order_data,
-                    headers={
-                        "Authorization": f"Bearer {token}",
-                        "Content-Type": "application/json"
-                    },
-                    timeout=30.0
-                )
-                
-                response_data = response.json() if response.content else {}
-                
-                # Проверяем наличие ошибок
-                if response.status_code != 202:
-                    errors = response_data.get("errors", [])
-                    if errors:
-                        error_messages = [e.get("message", "Unknown error") for e in errors]
-                        error_msg = "; ".join(error_messages)
-                    else:
-                        error_msg = f"HTTP {response.status_code}: {response.text}"
-                    
-                    logger.error(f"CDEK order creation failed: {error_msg}")
-                    raise CDEKError(f"CDEK API error: {error_msg}")
-                
-                # Проверяем наличие ошибок в ответе
-                if "errors" in response_data:
-                    errors = response_data["errors"]
+            client = get_http_client(CDEK)
+            response = await client.post(
+                f"{self.api_url}/orders",
+                json=order_data,
+                headers={
+                    "Authorization": f"Bearer {token}",
+                    "Content-Type": "application/json"
+                },
+                timeout=30.0
+            )
+            
+            response_data = response.json() if response.content else {}
+            
+            # Проверяем наличие ошибок
+            if response.status_code != 202:
+                errors = response_data.get("errors", [])
+                if errors:
                     error_messages = [e.get("message", "Unknown error") for e in errors]
                     error_msg = "; ".join(error_messages)
-                    logger.error(f"CDEK order creation returned errors: {error_msg}")
-                    raise CDEKError(f"CDEK API error: {error_msg}")
-                
-                # Получаем UUID заказа
-                cdek_uuid = response_data.get("entity", {}).get("uuid")
-                if not cdek_uuid:
-                    logger.error(f"CDEK order response missing uuid: {response_data}")
-                    raise CDEKError("Invalid response from CDEK: missing uuid")
-                
-                # Сохраняем cdek_uuid в БД
-                from src.models.orders import Order
-                order = await db.get(Order, order_id)
-                if order:
-                    order.cdek_uuid = cdek_uuid
-                    await db.commit()
-                    logger.info(f"Updated order {order_id} with cdek_uuid: {cdek_uuid}")
-                
-                logger.info(f"CDEK order created successfully: {cdek_uuid}")
-                return cdek_uuid
+                else:
+                    error_msg = f"HTTP {response.status_code}: {response.text}"
                 
+                logger.error(f"CDEK order creation failed: {error_msg}")
+                raise CDEKError(f"CDEK API error: {error_msg}")
+            
+            # Проверяем наличие ошибок в ответе
+            if "errors" in response_data:
+                errors = response_data["errors"]
+                error_messages = [e.get("message", "Unknown error") for e in errors]
+                error_msg = "; ".join(error_messages)
+                logger.error(f"CDEK order creation returned errors: {error_msg}")
+                raise CDEKError(f"CDEK API error: {error_msg}")
+            
+            # Получаем UUID заказа
+            cdek_uuid = response_data.get("entity", {}).get("uuid")
+            if not cdek_uuid:
+                logger.error(f"CDEK order response missing uuid: {response_data}")
+                raise CDEKError("Invalid response from CDEK: missing uuid")
+            
+            # Сохраняем cdek_uuid в БД
+            from src.models.orders import Order
+            order = await db.get(Order, order_id)
+            if order:
+                order.cdek_uuid = cdek_uuid
+                await db.commit()
+                logger.info(f"Updated order {order_id} with cdek_uuid: {cdek_uuid}")
+            
+            logger.info(f"CDEK order created successfully: {cdek_uuid}")
+            return cdek_uuid
+            
         except httpx.HTTPError as e:
             logger.error(f"HTTP error while creating CDEK order: {str(e)}")
             raise CDEKError(f"CDEK order creation failed: {str(e)}")
@@ -332,31 +313,31 @@ class CDEKClient:
         if tariff_code:
             request_data["tariff_code"] = tariff_code
         
-        async with httpx.AsyncClient() as client:
-            try:
-                response = await client.post(
-                    f"{self.api_url}/calculator/tarifflist",
-                    json=request_data,
-                    headers={
-                        "Authorization": f"Bearer {token}",
-                        "Content-Type": "application/json"
-                    },
-                    timeout=10.0
-                )
-                
-                if response.status_code != 200:
-                    error_text = response.text
-                    logger.error(f"CDEK delivery calculation failed: {response.status_code} - {error_text}")
-                    raise CDEKError(f"Failed to calculate delivery cost: {response.status_code}")
-                
-                return response.json()
-                
-            except httpx.HTTPError as e:
-                logger.error(f"HTTP error while calculating delivery cost: {str(e)}")
-                raise CDEKError(f"Failed to calculate delivery cost: {str(e)}")
-            except Exception as e:
-                logger.error(f"Unexpected error while calculating delivery cost: {str(e)}")
-                raise CDEKError(f"Failed to calculate delivery cost: {str(e)}")
+        client = get_http_client(CDEK)
+        try:
+            response = await client.post(
+                f"{self.api_url}/calculator/tarifflist",
+                json=request_data,
+                headers={
+                    "Authorization": f"Bearer {token}",
+                    "Content-Type": "application/json"
+                },
+                timeout=10.0
+            )
+            
+            if response.status_code != 200:
+                error_text = response.text
+                logger.error(f"CDEK delivery calculation failed: {response.status_code} - {error_text}")
+                raise CDEKError(f"Failed to calculate delivery cost: {response.status_code}")
+            
+            return response.json()
+            
+        except httpx.HTTPError as e:
+            logger.error(f"HTTP error while calculating delivery cost: {str(e)}")
+            raise CDEKError(f"Failed to calculate delivery cost: {str(e)}")
+        except Exception as e:
+            logger.error(f"Unexpected error while calculating delivery cost: {str(e)}")
+            raise CDEKError(f"Failed to calculate delivery cost: {str(e)}")
     
     async def get_suggest_cities(self, city_name: str) -> List[Dict[str, Any]]:
         # Нормализуем название города для кеша (приводим к нижнему регистру)
@@ -370,26 +351,26 @@ class CDEKClient:
         # Получаем данные из API
         token = await self._get_access_token()
         try:
-            async with httpx.AsyncClient() as client:
-                response = await client.get(
-                    f"{self.api_url}/location/suggest/cities",
-                    params={"name": city_name},
-                    headers={"Authorization": f"Bearer {token}"},
-                    timeout=10.0
-                )
-                
-                if response.status_code != 200:
-                    error_text = response.text
-                    logger.error(f"CDEK cities request failed: {response.status_code} - {error_text}")
-                    raise CDEKError(f"Failed to get suggest cities: {response.status_code}")
-                
-                result = response.json()
-                
-                # Сохраняем в кеш (TTLCache автоматически управляет временем жизни)
-                self._cities_cache[cache_key] = result
-                logger.debug(f"Cached cities for '{city_name}' (expires in 1 day)")
-                
-                return result
+            client = get_http_client(CDEK)
+            response = await client.get(
+                f"{self.api_url}/location/suggest/cities",
+                params={"name": city_name},
+                headers={"Authorization": f"Bearer {token}"},
+                timeout=10.0
+            )
+            
+            if response.status_code != 200:
+                error_text = response.text
+                logger.error(f"CDEK cities request failed: {response.status_code} - {error_text}")
+                raise CDEKError(f"Failed to get suggest cities: {response.status_code}")
+            
+            result = response.json()
+            
+            # Сохраняем в кеш (TTLCache автоматически управляет временем жизни)
+            self._cities_cache[cache_key] = result
+            logger.debug(f"Cached cities for '{city_name}' (expires in 1 day)")
+            
+            return result
 
         except httpx.HTTPError as e:
             logger.error(f"HTTP error while getting suggest cities: {str(e)}")
@@ -416,29 +397,29 @@ class CDEKClient:
         # Получаем данные из API
         token = await self._get_access_token()
         try:
-            async with httpx.AsyncClient() as client:
-                response = await client.get(
-                    f"{self.api_url}/deliverypoints",
-                    params={
-                        "city_code": city_code,
-                        "type": office_type
-                    },
-                    headers={"Authorization": f"Bearer {token}"},
-                    timeout=10.0
-                )
-                
-                if response.status_code != 200:
-                    error_text = response.text
-                    logger.error(f"CDEK offices request failed: {response.status_code} - {error_text}")
-                    raise CDEKError(f"Failed to get offices: {response.status_code}")
-                
-                result = response.json()
-                
-                # Сохраняем в кеш (TTLCache автоматически управляет временем жизни)
-                self._offices_cache[cache_key] = result
-                logger.debug(f"Cached offices for city_code={city_code}, type={office_type} (expires in 1 day)")
-                
-                return result
+            client = get_http_client(CDEK)
+            response = await client.get(
+                f"{self.api_url}/deliverypoints",
+                params={
+                    "city_code": city_code,
+                    "type": office_type
+                },
+                headers={"Authorization": f"Bearer {token}"},
+                timeout=10.0
+            )
+            
+            if response.status_code != 200:
+                error_text = response.text
+                logger.error(f"CDEK offices request failed: {response.status_code} - {error_text}")
+                raise CDEKError(f"Failed to get offices: {response.status_code}")
+            
+            result = response.json()
+            
+            # Сохраняем в кеш (TTLCache автоматически управляет временем жизни)
+            self._offices_cache[cache_key] = result
+            logger.debug(f"Cached offices for city_code={city_code}, type={office_type} (expires in 1 day)")
+            
+            return result
 
         except httpx.HTTPError as e:
             logger.error(f"HTTP error while getting offices: {str(e)}")
@@ -465,22 +446,22 @@ class CDEKClient:
         token = await self._get_access_token()
         
         try:
-            async with httpx.AsyncClient() as client:
-                response = await client.get(
-                    f"{self.api_url}/orders/{uuid}",
-                    headers={"Authorization": f"Bearer {token}"},
-                    timeout=10.0
-                )
-                
-                if response.status_code != 200:
-                    error_text = response.text
-                    logger.error(f"CDEK order info request failed: {response.status_code} - {error_text}")
-                    raise CDEKError(f"Failed to get order info: {response.status_code}")
-                
-                result = response.json()
-                logger.debug(f"Retrieved order info for UUID: {uuid}")
-                return result
-                
+            client = get_http_client(CDEK)
+            response = await client.get(
+                f"{self.api_url}/orders/{uuid}",
+                headers={"Authorization": f"Bearer {token}"},
+                timeout=10.0
+            )
+            
+            if response.status_code != 200:
+                error_text = response.text
+                logger.error(f"CDEK order info request failed: {response.status_code} - {error_text}")
+                raise CDEKError(f"Failed to get order info: {response.status_code}")
+            
+            result = response.json()
+            logger.debug(f"Retrieved order info for UUID: {uuid}")
+            return result
+            
         except httpx.HTTPError as e:
             logger.error(f"HTTP error while getting order info: {str(e)}")
             raise CDEKError(f"Failed to get order info: {str(e)}")
@@ -506,62 +487,62 @@ class CDEKClient:
         token = await self._get_access_token()
         
         try:
-            async with httpx.AsyncClient() as client:
-                # 1. Запрос на генерацию накладной
-                response = await client.post(
-                    f"{self.api_url}/print/orders",
-                    json={"orders": [{"order_uuid": cdek_uuid}]},
-                    headers={
-                        "Authorization": f"Bearer {token}",
-                        "Content-Type": "application/json"
-                    },
-                    timeout=30.0
-                )
-                
-                if response.status_code not in (200, 202):
-                    error_text = response.text
-                    logger.error(f"CDEK waybill generation failed: {response.status_code} - {error_text}")
-                    raise CDEKError(f"Failed to generate waybill: {response.status_code}")
-                
-                response_data = response.json()
-                print_uuid = response_data.get("entity", {}).get("uuid")
-                
-                if not print_uuid:
-                    logger.error(f"CDEK waybill response missing uuid: {response_data}")
-                    raise CDEKError("Invalid response from CDEK: missing print uuid")
-                
-                logger.debug(f"Waybill generation requested, print_uuid: {print_uuid}")
-                
-                # 2. Задержка 2 секунды
-                await asyncio.sleep(2)
-                
-                # 3. Получение URL накладной
-                response = await client.get(
-                    f"{self.api_url}/print/orders/{print_uuid}",
-                    headers={"Authorization": f"Bearer {token}"},
-                    timeout=10.0
-                )
-                
-                if response.status_code != 200:
-                    error_text = response.text
-                    logger.error(f"CDEK waybill URL request failed: {response.status_code} - {error_text}")
-                    raise CDEKError(f"Failed to get waybill URL: {response.status_code}")
-                
-                result = response.json()
-                url = result.get("entity", {}).get("url")
-                
-                if not url:
-                    # Проверяем статусы на ошибки
-                    statuses = result.get("entity", {}).get("statuses", [])
-                    if statuses:
-                        last_status = statuses[-1]
-                        if last_status.get("code") == "FAIL":
-                            raise CDEKError(f"Waybill generation failed: {last_status.get('reason', 'Unknown error')}")
-                    raise CDEKError("Waybill URL not ready yet, try again later")
-                
-                logger.info(f"Waybill URL retrieved for order {cdek_uuid}: {url}")
-                return url
-                
+            client = get_http_client(CDEK)
+            # 1. Запрос на генерацию накладной
+            response = await client.post(
+                f"{self.api_url}/print/orders",
+                json={"orders": [{"order_uuid": cdek_uuid}]},
+                headers={
+                    "Authorization": f"Bearer {token}",
+                    "Content-Type": "application/json"
+                },
+                timeout=30.0
+            )
+            
+            if response.status_code not in (200, 202):
+                error_text = response.text
+                logger.error(f"CDEK waybill generation failed: {response.status_code} - {error_text}")
+                raise CDEKError(f"Failed to generate waybill: {response.status_code}")
+            
+            response_data = response.json()
+            print_uuid = response_data.get("entity", {}).get("uuid")
+            
+            if not print_uuid:
+                logger.error(f"CDEK waybill response missing uuid: {response_data}")
+                raise CDEKError("Invalid response from CDEK: missing print uuid")
+            
+            logger.debug(f"Waybill generation requested, print_uuid: {print_uuid}")
+            
+            # 2. Задержка 2 секунды
+            await asyncio.sleep(2)
+            
+            # 3. Получение URL накладной
+            response = await client.get(
+                f"{self.api_url}/print/orders/{print_uuid}",
+                headers={"Authorization": f"Bearer {token}"},
+                timeout=10.0
+            )
+            
+            if response.status_code != 200:
+                error_text = response.text
+                logger.error(f"CDEK waybill URL request failed: {response.status_code} - {error_text}")
+                raise CDEKError(f"Failed to get waybill URL: {response.status_code}")
+            
+            result = response.json()
+            url = result.get("entity", {}).get("url")
+            
+            if not url:
+                # Проверяем статусы на ошибки
+                statuses = result.get("entity", {}).get("statuses", [])
+                if statuses:
+                    last_status = statuses[-1]
+                    if last_status.get("code") == "FAIL":
+                        raise CDEKError(f"Waybill generation failed: {last_status.get('reason', 'Unknown error')}")
+                raise CDEKError("Waybill URL not ready yet, try again later")
+            
+            logger.info(f"Waybill URL retrieved for order {cdek_uuid}: {url}")
+            return url
+            
         except httpx.HTTPError as e:
             logger.error(f"HTTP error while generating waybill: {str(e)}")
             raise CDEKError(f"Failed to generate waybill: {str(e)}")
@@ -587,62 +568,62 @@ class CDEKClient:
         token = await self._get_access_token()
         
         try:
-            async with httpx.AsyncClient() as client:
-                # 1. Запрос на генерацию штрихкода
-                response = await client.post(
-                    f"{self.api_url}/print/barcodes",
-                    json={"orders": [{"order_uuid": cdek_uuid}]},
-                    headers={
-                        "Authorization": f"Bearer {token}",
-                        "Content-Type": "application/json"
-                    },
-                    timeout=30.0
-                )
-                
-                if response.status_code not in (200, 202):
-                    error_text = response.text
-                    logger.error(f"CDEK barcode generation failed: {response.status_code} - {error_text}")
-                    raise CDEKError(f"Failed to generate barcode: {response.status_code}")
-                
-                response_data = response.json()
-                print_uuid = response_data.get("entity", {}).get("uuid")
-                
-                if not print_uuid:
-                    logger.error(f"CDEK barcode response missing uuid: {response_data}")
-                    raise CDEKError("Invalid response from CDEK: missing print uuid")
-                
-                logger.debug(f"Barcode generation requested, print_uuid: {print_uuid}")
-                
-                # 2. Задержка 2 секунды
-                await asyncio.sleep(2)
-                
-                # 3. Получение URL штрихкода
-                response = await client.get(
-                    f"{self.api_url}/print/barcodes/{print_uuid}",
-                    headers={"Authorization": f"Bearer {token}"},
-                    timeout=10.0
-                )
-                
-                if response.status_code != 200:
-                    error_text = response.text
-                    logger.error(f"CDEK barcode URL request failed: {response.status_code} - {error_text}")
-                    raise CDEKError(f"Failed to get barcode URL: {response.status_code}")
-                
-                result = response.json()
-                url = result.get("entity", {}).get("url")
-                
-                if not url:
-                    # Проверяем статусы на ошибки
-                    statuses = result.get("entity", {}).get("statuses", [])
-                    if statuses:
-                        last_status = statuses[-1]
-                        if last_status.get("code") == "FAIL":
-                            raise CDEKError(f"Barcode generation failed: {last_status.get('reason', 'Unknown error')}")
-                    raise CDEKError("Barcode URL not ready yet, try again later")
-                
-                logger.info(f"Barcode URL retrieved for order {cdek_uuid}: {url}")
-                return url
-                
+            client = get_http_client(CDEK)
+            # 1. Запрос на генерацию штрихкода
+            response = await client.post(
+                f"{self.api_url}/print/barcodes",
+                json={"orders": [{"order_uuid": cdek_uuid}]},
+                headers={
+                    "Authorization": f"Bearer {token}",
+                    "Content-Type": "application/json"
+                },
+                timeout=30.0
+            )
+            
+            if response.status_code not in (200, 202):
+                error_text = response.text
+                logger.error(f"CDEK barcode generation failed: {response.status_code} - {error_text}")
+                raise CDEKError(f"Failed to generate barcode: {response.status_code}")
+            
+            response_data = response.json()
+            print_uuid = response_data.get("entity", {}).get("uuid")
+            
+            if not print_uuid:
+                logger.error(f"CDEK barcode response missing uuid: {response_data}")
+                raise CDEKError("Invalid response from CDEK: missing print uuid")
+            
+            logger.debug(f"Barcode generation requested, print_uuid: {print_uuid}")
+            
+            # 2. Задержка 2 секунды
+            await asyncio.sleep(2)
+            
+            # 3. Получение URL штрихкода
+            response = await client.get(
+                f"{self.api_url}/print/barcodes/{print_uuid}",
+                headers={"Authorization": f"Bearer {token}"},
+                timeout=10.0
+            )
+            
+            if response.status_code != 200:
+                error_text = response.text
+                logger.error(f"CDEK barcode URL request failed: {response.status_code} - {error_text}")
+                raise CDEKError(f"Failed to get barcode URL: {response.status_code}")
+            
+            result = response.json()
+            url = result.get("entity", {}).get("url")
+            
+            if not url:
+                # Проверяем статусы на ошибки
+                statuses = result.get("entity", {}).get("statuses", [])
+                if statuses:
+                    last_status = statuses[-1]
+                    if last_status.get("code") == "FAIL":
+                        raise CDEKError(f"Barcode generation failed: {last_status.get('reason', 'Unknown error')}")
+                raise CDEKError("Barcode URL not ready yet, try again later")
+            
+            logger.info(f"Barcode URL retrieved for order {cdek_uuid}: {url}")
+            return url
+            
         except httpx.HTTPError as e:
             logger.error(f"HTTP error while generating barcode: {str(e)}")
             raise CDEKError(f"Failed to generate barcode: {str(e)}")
@@ -665,34 +646,34 @@ class CDEKClient:
         """
         token = await self._get_access_token()
         
-        async with httpx.AsyncClient() as client:
-            try:
-                response = await client.post(
-                    f"{self.api_url}/webhooks",
-                    json={
-                        "type": webhook_type,
-                        "url": url
-                    },
-                    headers={
-                        "Authorization": f"Bearer {token}",
-                        "Content-Type": "application/json"
-                    },
-                    timeout=10.0
-                )
-                
-                if response.status_code != 200:
-                    error_text = response.text
-                    logger.error(f"CDEK webhook creation failed: {response.status_code} - {error_text}")
-                    raise CDEKError(f"Failed to create webhook: {response.status_code}")
-                
-                return response.json()
-                
-            except httpx.HTTPError as e:
-                logger.error(f"HTTP error while creating webhook: {str(e)}")
-                raise CDEKError(f"Failed to create webhook: {str(e)}")
-            except Exception as e:
-                logger.error(f"Unexpected error while creating webhook: {str(e)}")
-                raise CDEKError(f"Failed to create webhook: {str(e)}")
+        client = get_http_client(CDEK)
+        try:
+            response = await client.post(
+                f"{self.api_url}/webhooks",
+                json={
+                    "type": webhook_type,
+                    "url": url
+                },
+                headers={
+                    "Authorization": f"Bearer {token}",
+                    "Content-Type": "application/json"
+                },
+                timeout=10.0
+            )
+            
+            if response.status_code != 200:
+                error_text = response.text
+                logger.error(f"CDEK webhook creation failed: {response.status_code} - {error_text}")
+                raise CDEKError(f"Failed to create webhook: {response.status_code}")
+            
+            return response.json()
+            
+        except httpx.HTTPError as e:
+            logger.error(f"HTTP error while creating webhook: {str(e)}")
+            raise CDEKError(f"Failed to create webhook: {str(e)}")
+        except Exception as e:
+            logger.error(f"Unexpected error while creating webhook: {str(e)}")
+            raise CDEKError(f"Failed to create webhook: {str(e)}")
 
     async def delete_webhook(self, uuid: str) -> Dict[str, Any]:
         """
@@ -706,29 +687,29 @@ class CDEKClient:
         """
         token = await self._get_access_token()
         
-        async with httpx.AsyncClient() as client:
-            try:
-                response = await client.delete(
-                    f"{self.api_url}/webhooks/{uuid}",
-                    headers={
-                        "Authorization": f"Bearer {token}"
-                    },
-                    timeout=10.0
-                )
-                
-                if response.status_code != 200:
-                    error_text = response.text
-                    logger.error(f"CDEK webhook deletion failed: {response.status_code} - {error_text}")
-                    raise CDEKError(f"Failed to delete webhook: {response.status_code}")
-                
-                return response.json()
-                
-            except httpx.HTTPError as e:
-                logger.error(f"HTTP error while deleting webhook: {str(e)}")
-                raise CDEKError(f"Failed to delete webhook: {str(e)}")
-            except Exception as e:
-                logger.error(f"Unexpected error while deleting webhook: {str(e)}")
-                raise CDEKError(f"Failed to delete webhook: {str(e)}")
+        client = get_http_client(CDEK)
+        try:
+            response = await client.delete(
+                f"{self.api_url}/webhooks/{uuid}",
+                headers={
+                    "Authorization": f"Bearer {token}"
+                },
+                timeout=10.0
+            )
+            
+            if response.status_code != 200:
+                error_text = response.text
+                logger.error(f"CDEK webhook deletion failed: {response.status_code} - {error_text}")
+                raise CDEKError(f"Failed to delete webhook: {response.status_code}")
+            
+            return response.json()
+            
+        except httpx.HTTPError as e:
+            logger.error(f"HTTP error while deleting webhook: {str(e)}")
+            raise CDEKError(f"Failed to delete webhook: {str(e)}")
+        except Exception as e:
+            logger.error(f"Unexpected error while deleting webhook: {str(e)}")
+            raise CDEKError(f"Failed to delete webhook: {str(e)}")
 
     async def update_order(self, payload: Dict[str, Any]) -> Dict[str, Any]:
         """
@@ -742,31 +723,31 @@ class CDEKClient:
         """
         token = await self._get_access_token()
         
-        async with httpx.AsyncClient() as client:
-            try:
-                response = await client.patch(
-                    f"{self.api_url}/orders",
-                    json=payload,
-                    headers={
-                        "Authorization": f"Bearer {token}",
-                        "Content-Type": "application/json"
-                    },
-                    timeout=10.0
-                )
-                
-                if response.status_code != 202:
-                    error_text = response.text
-                    logger.error(f"CDEK order update failed: {response.status_code} - {error_text}")
-                    raise CDEKError(f"Failed to update order: {response.status_code}")
-                
-                return response.json()
-                
-            except httpx.HTTPError as e:
-                logger.error(f"HTTP error while updating order: {str(e)}")
-                raise CDEKError(f"Failed to update order: {str(e)}")
-            except Exception as e:
-                logger.error(f"Unexpected error while updating order: {str(e)}")
-                raise CDEKError(f"Failed to update order: {str(e)}")
+        client = get_http_client(CDEK)
+        try:
+            response = await client.patch(
+                f"{self.api_url}/orders",
+                json=payload,
+                headers={
+                    "Authorization": f"Bearer {token}",
+                    "Content-Type": "application/json"
+                },
+                timeout=10.0
+            )
+            
+            if response.status_code != 202:
+                error_text = response.text
+                logger.error(f"CDEK order update failed: {response.status_code} - {error_text}")
+                raise CDEKError(f"Failed to update order: {response.status_code}")
+            
+            return response.json()
+            
+        except httpx.HTTPError as e:
+            logger.error(f"HTTP error while updating order: {str(e)}")
+            raise CDEKError(f"Failed to update order: {str(e)}")
+        except Exception as e:
+            logger.error(f"Unexpected error while updating order: {str(e)}")
+            raise CDEKError(f"Failed to update order: {str(e)}")
 
 
 # Создаем глобальный экземпляр клиента (можно использовать как singleton)
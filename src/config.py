@@ -77,12 +77,65 @@ class Settings(BaseSettings):
     PAYPAL_CLIENT_SECRET: Optional[str] = None
     PAYPAL_MODE: str = "sandbox"
 
+    # Срок жизни платёжной ссылки; пока он не истёк, /payments/init возвращает её повторно
+    PAYMENT_SESSION_TTL_MINUTES: int = 30
+
+    # Фоновая сверка статусов неоплаченных заказов с TBank/PayPal
+    PAYMENT_RECONCILE_INTERVAL_SECONDS: int = 30
+    PAYMENT_RECONCILE_BATCH_SIZE: int = 100
+    PAYMENT_RECONCILE_CONCURRENCY: int = 10
+    PAYMENT_RECONCILE_MAX_AGE_HOURS: int = 24
+    # Не чаще одного запроса к провайдеру на заказ за этот интервал (force refresh статуса)
+    PAYMENT_STATUS_REFRESH_SECONDS: int = 15
+
+    # SSE-поток статуса оплаты: memory — один процесс, postgres — LISTEN/NOTIFY между воркерами
+    PAYMENT_EVENTS_BACKEND: str = "memory"  # memory | postgres
+    PAYMENT_EVENTS_KEEPALIVE_SECONDS: int = 15
+    PAYMENT_EVENTS_MAX_WAIT_SECONDS: int = 300
+
+    # Пулы HTTP-соединений к провайдерам (по одному клиенту на провайдера)
+    HTTP_KEEPALIVE_SECONDS: float = 60.0
+    HTTP_CONNECT_TIMEOUT: float = 5.0
+    HTTP2_ENABLED: bool = True
+    TBANK_HTTP_MAX_CONNECTIONS: int = 20
+    TBANK_HTTP_TIMEOUT: float = 30.0
+    PAYPAL_HTTP_MAX_CONNECTIONS: int = 20
+    PAYPAL_HTTP_TIMEOUT: float = 30.0
+    CDEK_HTTP_MAX_CONNECTIONS: int = 20
+    CDEK_HTTP_TIMEOUT: float = 30.0
+
     @property
     def paypal_api_url(self) -> str:
         if self.PAYPAL_MODE == "live":
             return "https://api-m.paypal.com"
         return "https://api-m.sandbox.paypal.com"
 
+    # Response cache for public catalog GETs
+    RESPONSE_CACHE_ENABLED: bool = True
+    RESPONSE_CACHE_BACKEND: str = "memory"  # memory | redis
+    RESPONSE_CACHE_MAX_ENTRIES: int = 2048
+    RESPONSE_CACHE_TTL_SECONDS: int = 300
+    REDIS_URL: Optional[str] = None
+
+    # Stock reservations of unpaid orders
+    STOCK_RESERVATION_MINUTES: int = 30
+    STOCK_RESERVATION_SWEEP_SECONDS: int = 60
+    STOCK_RESERVATION_BATCH_SIZE: int = 100
+
+    # Idempotency-Key for order creation and payment init
+    IDEMPOTENCY_KEY_TTL_HOURS: int = 24
+    IDEMPOTENCY_WAIT_SECONDS: float = 30.0  # сколько дубль ждёт выполняющийся запрос
+    IDEMPOTENCY_LOCK_SECONDS: int = 120  # ключ «в работе» дольше этого считается брошенным
+
+    # Входящие вебхуки TBank/CDEK: сохраняются в webhook_inbox и обрабатываются воркерами
+    WEBHOOK_WORKERS: int = 4
+    WEBHOOK_BATCH_SIZE: int = 50
+    WEBHOOK_POLL_SECONDS: int = 5
+    WEBHOOK_MAX_ATTEMPTS: int = 8
+    WEBHOOK_RETRY_BASE_SECONDS: int = 5  # пауза перед повтором удваивается с каждой попыткой
+    WEBHOOK_LOCK_SECONDS: int = 120  # событие «в обработке» дольше этого считается брошенным
+    WEBHOOK_INBOX_RETENTION_DAYS: int = 30  # обработанные события хранятся для replay и дедупликации повторов
+
     # Media upload safety
     MAX_UPLOAD_SIZE_BYTES: int = 10 * 1024 * 1024
     MAX_IMAGE_PIXELS: int = 20_000_000
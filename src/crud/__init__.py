@@ -1,6 +1,6 @@
 from .user import get_user_by_email, create_user, get_user_by_id, get_users
 from .product import (
-    get_product_by_id, get_product_by_slug, get_products, get_products_count,
+    get_product_by_id, get_product_by_slug, get_products, get_products_count, get_products_version, get_product_facets, load_product_detail, get_product_cards_batch,
     create_product, update_product, delete_product, check_slug_exists, check_slug_collision, get_product_by_category_and_slug,
     get_product_color_by_id, create_product_color, update_product_color, delete_product_color, list_product_colors,
     get_sizes_for_products, get_images_for_products,
@@ -10,11 +10,11 @@ from .product import (
     get_product_main_category, get_main_categories_for_products,
     list_product_sections, create_product_section, update_product_section, delete_product_section,
     reorder_product_sections, get_sections_for_products,
-    reorder_global_products
+    reorder_global_products, refresh_product_cards, rebuild_product_cards
 )
 from .category import (
-    create_category, delete_category, get_all_categories, build_tree,
-    get_products_by_category_slug, get_category_by_slug
+    create_category, delete_category, get_all_categories, get_categories_version, build_tree,
+    get_products_by_category_slug, get_products_by_category_count, get_category_by_slug, rebuild_category_closure
     , add_product_to_category, remove_product_from_category,
     set_product_categories, get_categories_by_product, check_category_assignment_collision,
     reorder_category_products
@@ -26,8 +26,13 @@ from .collection import (
     get_products_by_collection, add_product_to_collection, remove_product_from_collection
 )
 from .orders import (
-    create_order, get_orders, get_order_by_id, get_order_detail, get_orders_detail, update_order
+    create_order, order_line_snapshot, backfill_order_line_snapshots, decrement_stock, load_cart, quote_cart, get_orders, get_orders_count, get_order_by_id, load_order_details, get_order_detail, get_orders_detail, update_order
 )
+from .reservations import (
+    hold_reservation, release_reservation, confirm_reservation, set_order_payment_status,
+    release_expired_reservations
+)
+from .payment_checks import claim_payment_checks, claim_payment_refresh, apply_payment_statuses
 from .custom_status import (
     get_custom_status_by_id, get_custom_status_by_name, list_custom_statuses,
     create_custom_status, delete_custom_status
@@ -1,13 +1,39 @@
-from sqlalchemy import select
+from sqlalchemy import Row, select, delete, insert, literal, func
 from sqlalchemy.ext.asyncio import AsyncSession
-from typing import List, Optional, Dict, Set
-from src.models.category import Category, ProductCategory
-from src.models.product import Product, ProductColor
+from sqlalchemy.orm import aliased
+from typing import List, Optional, Dict
+from datetime import datetime
+from src.models.category import Category, ProductCategory, CategoryClosure
+from src.models.product import Product, ProductColor, ProductCard
+from src.crud.product import refresh_product_cards, category_listing_keys, product_card_columns
+from src.schemas.category import CategoryProductSort
+from src.services import response_cache
+from src.services.pagination import Page, build_page, decode_cursor, keyset_after, keyset_order_by
+
+# Защита от циклов в parent_id при пересборке closure-таблицы
+MAX_CATEGORY_DEPTH = 32
 
 
 async def create_category(db: AsyncSession, *, name: str, slug: str, parent_id: Optional[int], level: int, sort_order: int, is_active: bool) -> Category:
     cat = Category(name=name, slug=slug, parent_id=parent_id, level=level, sort_order=sort_order, is_active=is_active)
     db.add(cat)
+    await db.flush()
+
+    # Категория является потомком самой себя и всех предков родителя
+    db.add(CategoryClosure(ancestor_id=cat.id, descendant_id=cat.id, depth=0))
+    if parent_id is not None:
+        await db.execute(
+            insert(CategoryClosure).from_select(
+                ["ancestor_id", "descendant_id", "depth"],
+                select(
+                    CategoryClosure.ancestor_id,
+                    literal(cat.id),
+                    CategoryClosure.depth + 1,
+                ).where(CategoryClosure.descendant_id == parent_id),
+            )
+        )
+
+    response_cache.mark_stale(response_cache.CATEGORIES_KEY)
     await db.commit()
     await db.refresh(cat)
     return cat
@@ -18,16 +44,72 @@ async def delete_category(db: AsyncSession, category_id: int) -> bool:
     cat = result.scalar_one_or_none()
     if not cat:
         return False
-    db.delete(cat)
+
+    # Отрываем поддерево от предков удаляемой категории и убираем её собственные связи
+    subtree = select(CategoryClosure.descendant_id).where(CategoryClosure.ancestor_id == category_id)
+    affected = await db.execute(
+        select(ProductCategory.product_id).where(ProductCategory.category_id.in_(subtree))
+    )
+    affected_product_ids = set(affected.scalars().all())
+    response_cache.mark_stale(response_cache.CATEGORIES_KEY, *await category_listing_keys(db, [category_id]))
+    ancestors = select(CategoryClosure.ancestor_id).where(CategoryClosure.descendant_id == category_id)
+    await db.execute(
+        delete(CategoryClosure).where(
+            CategoryClosure.ancestor_id.in_(ancestors),
+            CategoryClosure.descendant_id.in_(subtree),
+        )
+    )
+    await db.execute(
+        delete(CategoryClosure).where(
+            (CategoryClosure.ancestor_id == category_id) | (CategoryClosure.descendant_id == category_id)
+        )
+    )
+
+    await db.execute(delete(ProductCategory).where(ProductCategory.category_id == category_id))
+    await db.delete(cat)
+    await refresh_product_cards(db, affected_product_ids)
     await db.commit()
     return True
 
 
+async def rebuild_category_closure(db: AsyncSession) -> None:
+    """Пересобрать closure-таблицу по parent_id (для заполнения существующих данных)."""
+    tree = select(
+        Category.id.label("ancestor_id"),
+        Category.id.label("descendant_id"),
+        literal(0).label("depth"),
+    ).cte("category_tree", recursive=True)
+    child = aliased(Category)
+    tree = tree.union_all(
+        select(tree.c.ancestor_id, child.id, tree.c.depth + 1)
+        .join(child, child.parent_id == tree.c.descendant_id)
+        .where(tree.c.depth < MAX_CATEGORY_DEPTH)
+    )
+
+    await db.execute(delete(CategoryClosure))
+    await db.execute(
+        insert(CategoryClosure).from_select(
+            ["ancestor_id", "descendant_id", "depth"],
+            select(tree.c.ancestor_id, tree.c.descendant_id, tree.c.depth),
+        )
+    )
+    await db.commit()
+
+
 async def get_all_categories(db: AsyncSession) -> List[Category]:
     result = await db.execute(select(Category).where(Category.is_active == True).order_by(Category.level, Category.sort_order, Category.name))
     return result.scalars().all()
 
 
+async def get_categories_version(db: AsyncSession) -> tuple[int, Optional[datetime]]:
+    """Количество активных категорий и время последнего изменения (валидатор для ETag)"""
+    result = await db.execute(
+        select(func.count(Category.id), func.max(Category.updated_at)).where(Category.is_active == True)
+    )
+    total, last_modified = result.one()
+    return total, last_modified
+
+
 def build_tree(categories: List[Category]) -> List[Dict]:
     by_id = {c.id: {"id": c.id, "name": c.name, "slug": c.slug, "children": []} for c in categories}
     roots: List[Dict] = []
@@ -45,37 +127,67 @@ async def get_category_by_slug(db: AsyncSession, slug: str) -> Optional[Category
     return result.scalar_one_or_none()
 
 
-async def get_products_by_category_slug(db: AsyncSession, slug: str) -> List[ProductColor]:
-    """Получить продукты категории (теперь возвращаем ProductColor)"""
-    cat = await get_category_by_slug(db, slug)
-    if not cat:
-        return []
-
-    categories_result = await db.execute(select(Category.id, Category.parent_id))
-    rows = categories_result.all()
-    children: Dict[int, List[int]] = {}
-    for cid, parent_id in rows:
-        if parent_id is None:
-            continue
-        children.setdefault(parent_id, []).append(cid)
-
-    category_ids: Set[int] = set()
-    stack = [cat.id]
-    while stack:
-        current = stack.pop()
-        if current in category_ids:
-            continue
-        category_ids.add(current)
-        stack.extend(children.get(current, []))
+def _category_positions(slug: str):
+    """Позиция продукта в поддереве категории.
+
+    Продукт может быть привязан к нескольким категориям поддерева — берём минимальную позицию.
+    """
+    return (
+        select(
+            ProductCategory.product_id.label("product_id"),
+            func.min(ProductCategory.sort_order).label("sort_order"),
+        )
+        .join(CategoryClosure, CategoryClosure.descendant_id == ProductCategory.category_id)
+        .join(Category, Category.id == CategoryClosure.ancestor_id)
+        .where(Category.slug == slug)
+        .group_by(ProductCategory.product_id)
+        .subquery()
+    )
+
+
+def _category_product_order(positions, sort: CategoryProductSort):
+    """Keyset-порядок листинга категории; color_id в конце делает порядок строгим."""
+    if sort == CategoryProductSort.NEWEST:
+        return ((ProductCard.created_at, True), (ProductCard.color_id, True))
+    if sort == CategoryProductSort.PRICE_ASC:
+        return ((ProductCard.price, False), (ProductCard.color_id, False))
+    if sort == CategoryProductSort.PRICE_DESC:
+        return ((ProductCard.price, True), (ProductCard.color_id, True))
+    if sort == CategoryProductSort.POPULARITY:
+        return ((ProductCard.popularity, True), (ProductCard.color_id, True))
+    return ((positions.c.sort_order, False), (ProductCard.color_id, False))
 
+
+async def get_products_by_category_slug(
+    db: AsyncSession,
+    slug: str,
+    *,
+    limit: int = 100,
+    cursor: Optional[str] = None,
+    sort: CategoryProductSort = CategoryProductSort.MANUAL,
+    card_view: bool = False,
+) -> Page[Row]:
+    """Страница карточек (строки product_card_columns) категории и всех её подкатегорий"""
+    positions = _category_positions(slug)
+    order = _category_product_order(positions, sort)
+    keys = [column.label(f"key_{index}") for index, (column, _) in enumerate(order)]
+    query = (
+        select(*product_card_columns(card_view), *keys)
+        .join(positions, positions.c.product_id == ProductCard.product_id)
+    )
+    after = decode_cursor(cursor, order)
+    if after is not None:
+        query = query.where(keyset_after(order, after))
+    result = await db.execute(query.order_by(*keyset_order_by(order)).limit(limit + 1))
+    return build_page(result.all(), limit, lambda row: tuple(getattr(row, key.name) for key in keys))
+
+
+async def get_products_by_category_count(db: AsyncSession, slug: str) -> int:
+    positions = _category_positions(slug)
     result = await db.execute(
-        select(ProductColor)
-        .join(Product, ProductColor.product_id == Product.id)
-        .join(ProductCategory, ProductCategory.product_id == Product.id)
-        .where(ProductCategory.category_id.in_(list(category_ids)))
-        .order_by(ProductCategory.sort_order)
+        select(func.count(ProductCard.color_id)).join(positions, positions.c.product_id == ProductCard.product_id)
     )
-    return result.scalars().all()
+    return result.scalar()
 
 
 async def check_category_assignment_collision(db: AsyncSession, product_id: int, category_id: int) -> Optional[str]:
@@ -117,6 +229,8 @@ async def add_product_to_category(db: AsyncSession, product_id: int, category_id
         return True
     link = ProductCategory(product_id=product_id, category_id=category_id)
     db.add(link)
+    response_cache.mark_stale(*await category_listing_keys(db, [category_id]))
+    await refresh_product_cards(db, [product_id])
     await db.commit()
     return True
 
@@ -131,15 +245,21 @@ async def remove_product_from_category(db: AsyncSession, product_id: int, catego
     link = result.scalar_one_or_none()
     if not link:
         return False
-    db.delete(link)
+    await db.delete(link)
+    response_cache.mark_stale(*await category_listing_keys(db, [category_id]))
+    await refresh_product_cards(db, [product_id])
     await db.commit()
     return True
 
 
 async def set_product_categories(db: AsyncSession, product_id: int, category_ids: List[int]) -> bool:
     """Установить список категорий для товара (удаляет старые и добавляет новые)"""
+    current = await db.execute(
+        select(ProductCategory.category_id).where(ProductCategory.product_id == product_id)
+    )
+    response_cache.mark_stale(*await category_listing_keys(db, {*current.scalars().all(), *category_ids}))
+
     # Удаляем все текущие привязки
-    from sqlalchemy import delete
     await db.execute(
         delete(ProductCategory).where(ProductCategory.product_id == product_id)
     )
@@ -149,6 +269,7 @@ async def set_product_categories(db: AsyncSession, product_id: int, category_ids
         link = ProductCategory(product_id=product_id, category_id=cat_id)
         db.add(link)
         
+    await refresh_product_cards(db, [product_id])
     await db.commit()
     return True
 
@@ -186,6 +307,7 @@ async def reorder_category_products(db: AsyncSession, category_id: int, product_
         if actual_pid and actual_pid in links:
             links[actual_pid].sort_order = index
 
+    response_cache.mark_stale(*await category_listing_keys(db, [category_id]))
     await db.commit()
     return True
 
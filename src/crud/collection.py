@@ -1,9 +1,11 @@
-from sqlalchemy import select, func
+from sqlalchemy import Row, select, func
 from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional
 from src.models.collection import Collection, CollectionImage, CollectionProduct
-from src.models.product import Product
+from src.models.product import ProductCard
+from src.crud.product import product_card_columns
 from src.schemas.collection import CollectionCreate, CollectionUpdate
+from src.services import response_cache
 from src.utils import delete_image_from_minio
 
 
@@ -50,6 +52,7 @@ async def create_collection(db: AsyncSession, collection_create: CollectionCreat
         category=collection_create.category
     )
     db.add(db_collection)
+    response_cache.mark_stale(response_cache.COLLECTIONS_KEY)
     await db.commit()
     await db.refresh(db_collection)
     return db_collection
@@ -65,6 +68,7 @@ async def update_collection(db: AsyncSession, collection_id: int, update_data: C
     for field, value in update_dict.items():
         setattr(collection, field, value)
     
+    response_cache.mark_stale(response_cache.COLLECTIONS_KEY, response_cache.collection_key(collection_id))
     await db.commit()
     await db.refresh(collection)
     return collection
@@ -83,6 +87,16 @@ async def delete_collection(db: AsyncSession, collection_id: int) -> bool:
         if img.file:
             await delete_image_from_minio(img.file)
             
+    # Выборки продуктов с фильтром по коллекции и карточки её продуктов тоже меняются
+    members = await db.execute(
+        select(CollectionProduct.product_id).where(CollectionProduct.collection_id == collection_id)
+    )
+    response_cache.mark_stale(
+        response_cache.COLLECTIONS_KEY,
+        response_cache.collection_key(collection_id),
+        response_cache.PRODUCT_FILTERS_KEY,
+        *(response_cache.product_key(pid) for pid in members.scalars().all()),
+    )
     await db.delete(collection)
     await db.commit()
     return True
@@ -102,6 +116,7 @@ async def create_collection_image(db: AsyncSession, collection_id: int, *, file_
     """Создать изображение коллекции"""
     img = CollectionImage(collection_id=collection_id, file=file_url, sort_order=sort_order)
     db.add(img)
+    response_cache.mark_stale(response_cache.COLLECTIONS_KEY, response_cache.collection_key(collection_id))
     await db.commit()
     await db.refresh(img)
     return img
@@ -119,19 +134,20 @@ async def delete_collection_image(db: AsyncSession, image_id: int) -> bool:
         await delete_image_from_minio(img.file)
         
     await db.delete(img)
+    response_cache.mark_stale(response_cache.COLLECTIONS_KEY, response_cache.collection_key(img.collection_id))
     await db.commit()
     return True
 
 
-async def get_products_by_collection(db: AsyncSession, collection_id: int) -> List[Product]:
-    """Получить продукты коллекции"""
+async def get_products_by_collection(db: AsyncSession, collection_id: int, card_view: bool = False) -> List[Row]:
+    """Получить карточки продуктов коллекции (строки product_card_columns, по одной на цвет)"""
     result = await db.execute(
-        select(Product)
-        .join(CollectionProduct, CollectionProduct.product_id == Product.id)
+        select(*product_card_columns(card_view))
+        .join(CollectionProduct, CollectionProduct.product_id == ProductCard.product_id)
         .where(CollectionProduct.collection_id == collection_id)
-        .order_by(CollectionProduct.sort_order)
+        .order_by(CollectionProduct.sort_order, ProductCard.color_id)
     )
-    return result.scalars().all()
+    return result.all()
 
 
 async def add_product_to_collection(db: AsyncSession, collection_id: int, product_id: int, sort_order: int = 0) -> bool:
@@ -148,6 +164,11 @@ async def add_product_to_collection(db: AsyncSession, collection_id: int, produc
     
     link = CollectionProduct(collection_id=collection_id, product_id=product_id, sort_order=sort_order)
     db.add(link)
+    response_cache.mark_stale(
+        response_cache.collection_key(collection_id),
+        response_cache.PRODUCT_FILTERS_KEY,
+        response_cache.product_key(product_id),
+    )
     await db.commit()
     return True
 
@@ -163,6 +184,11 @@ async def remove_product_from_collection(db: AsyncSession, collection_id: int, p
     link = result.scalar_one_or_none()
     if not link:
         return False
-    db.delete(link)
+    await db.delete(link)
+    response_cache.mark_stale(
+        response_cache.collection_key(collection_id),
+        response_cache.PRODUCT_FILTERS_KEY,
+        response_cache.product_key(product_id),
+    )
     await db.commit()
     return True
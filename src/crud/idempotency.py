@@ -0,0 +1,59 @@
+from datetime import datetime, timezone
+from typing import Optional
+
+from sqlalchemy import delete, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.models.idempotency import IdempotencyKey
+
+
+async def get_idempotency_key(db: AsyncSession, scope: str, key: str) -> Optional[IdempotencyKey]:
+    """Текущее состояние ключа из БД (минуя закэшированный в сессии объект)"""
+    result = await db.execute(
+        select(IdempotencyKey)
+        .where(IdempotencyKey.scope == scope, IdempotencyKey.key == key)
+        .execution_options(populate_existing=True)
+    )
+    return result.scalar_one_or_none()
+
+
+async def claim_idempotency_key(
+    db: AsyncSession, scope: str, key: str, request_hash: str
+) -> Optional[IdempotencyKey]:
+    """Занять ключ под выполнение запроса: None — ключ наш, иначе уже существующая запись"""
+    db.add(IdempotencyKey(scope=scope, key=key, request_hash=request_hash, state=IdempotencyKey.IN_PROGRESS))
+    try:
+        await db.commit()
+        return None
+    except IntegrityError:
+        await db.rollback()
+        return await get_idempotency_key(db, scope, key)
+
+
+async def complete_idempotency_key(db: AsyncSession, scope: str, key: str, status_code: int, body: str) -> None:
+    await db.execute(
+        update(IdempotencyKey)
+        .where(IdempotencyKey.scope == scope, IdempotencyKey.key == key)
+        .values(
+            state=IdempotencyKey.COMPLETED,
+            response_status=status_code,
+            response_body=body,
+            completed_at=datetime.now(timezone.utc).replace(tzinfo=None),
+        )
+    )
+    await db.commit()
+
+
+async def release_idempotency_key(db: AsyncSession, scope: str, key: str) -> None:
+    """Освободить ключ после сбоя, чтобы повтор выполнил запрос заново"""
+    await db.execute(
+        delete(IdempotencyKey).where(IdempotencyKey.scope == scope, IdempotencyKey.key == key)
+    )
+    await db.commit()
+
+
+async def delete_idempotency_keys_before(db: AsyncSession, created_before: datetime) -> int:
+    result = await db.execute(delete(IdempotencyKey).where(IdempotencyKey.created_at < created_before))
+    await db.commit()
+    return result.rowcount
@@ -1,18 +1,111 @@
-from sqlalchemy import select, or_, String, cast
+from sqlalchemy import select, update, or_, String, cast, func
+from sqlalchemy.orm.attributes import set_committed_value
 from sqlalchemy.ext.asyncio import AsyncSession
-from src.models.orders import Order, OrderProduct, DeliveryMethod, CustomStatus
+from src.models.orders import Order, OrderProduct, OrderStatus, DeliveryMethod, CustomStatus
 from src.models.product import Product, ProductColor, ProductSize
-from src.models.promocode import PromoCode, DiscountType
+from src.crud.product import refresh_product_cards
+from src.crud.promocode import get_promo_code_by_code
+from src.crud.reservations import hold_reservation, set_order_payment_status
+from src.services.pricing import CartPrice, price_cart, unit_price
+from src.services.pagination import Page, build_page, decode_cursor, keyset_after, keyset_order_by
 from src.schemas.orders import OrderCreate, OrderProductCreate, OrderDetail, OrderProductDetail, OrderUpdate
 from typing import List, Optional
 from decimal import Decimal
-from datetime import datetime, timezone
 from fastapi import HTTPException, status
 import logging
 import secrets
 
 logger = logging.getLogger(__name__)
 
+async def load_cart(
+    db: AsyncSession,
+    product_size_ids: List[int],
+) -> tuple[dict[int, ProductSize], dict[int, ProductColor], dict[int, Product]]:
+    """Размеры, цвета и продукты корзины тремя батч-запросами"""
+    result = await db.execute(select(ProductSize).where(ProductSize.id.in_(product_size_ids)))
+    sizes = {ps.id: ps for ps in result.scalars().all()}
+
+    result = await db.execute(
+        select(ProductColor).where(ProductColor.id.in_({ps.product_color_id for ps in sizes.values()}))
+    )
+    colors = {pc.id: pc for pc in result.scalars().all()}
+
+    result = await db.execute(select(Product).where(Product.id.in_({pc.product_id for pc in colors.values()})))
+    products = {p.id: p for p in result.scalars().all()}
+    return sizes, colors, products
+
+def order_line_snapshot(product_size: ProductSize, color: ProductColor, product: Product) -> dict:
+    """Поля снимка строки заказа из текущего состояния каталога"""
+    return {
+        "product_id": product.id,
+        "product_color_id": color.id,
+        "slug": color.slug,
+        "title": color.title,
+        "label": color.label,
+        "hex": color.hex,
+        "size": product_size.size,
+        "price": color.price if color.price is not None else product.price,
+        "discount_price": color.discount_price if color.discount_price is not None else product.discount_price,
+        "unit_price": unit_price(product, color),
+        "currency": product.currency or "RUB",
+        "weight": product.weight,
+    }
+
+async def backfill_order_line_snapshots(db: AsyncSession) -> int:
+    """Заполнить снимки строк, созданных до их появления, по текущему каталогу"""
+    result = await db.execute(
+        select(OrderProduct, ProductSize, ProductColor, Product)
+        .join(ProductSize, ProductSize.id == OrderProduct.product_size_id)
+        .join(ProductColor, ProductColor.id == ProductSize.product_color_id)
+        .join(Product, Product.id == ProductColor.product_id)
+        .where(OrderProduct.title.is_(None))
+    )
+    rows = result.all()
+    for order_product, product_size, color, product in rows:
+        for name, value in order_line_snapshot(product_size, color, product).items():
+            setattr(order_product, name, value)
+    await db.commit()
+    return len(rows)
+
+async def quote_cart(db: AsyncSession, items: List[OrderProductCreate], promo_code: Optional[str] = None) -> CartPrice:
+    """Предварительный расчёт корзины по тем же правилам, что и create_order, без изменения остатков"""
+    sizes, colors, products = await load_cart(db, list(dict.fromkeys(item.product_size_id for item in items)))
+    promo = await get_promo_code_by_code(db, promo_code) if promo_code else None
+    return price_cart(
+        [(item.product_size_id, item.quantity) for item in items],
+        sizes, colors, products,
+        promo_code=promo_code, promo=promo,
+    )
+
+async def decrement_stock(db: AsyncSession, sizes: dict[int, ProductSize], quantities: dict[int, int]) -> None:
+    """
+    Списать остатки условными UPDATE без блокировок на чтение.
+
+    Каждый размер — один запрос ``quantity = quantity - n WHERE quantity >= n``; размеры
+    обходятся по возрастанию ID, чтобы конкурентные заказы брали блокировки строк
+    в одном порядке и не попадали в deadlock. При нехватке транзакция откатывается.
+    """
+    for size_id in sorted(quantities):
+        requested = quantities[size_id]
+        result = await db.execute(
+            update(ProductSize)
+            .where(ProductSize.id == size_id, ProductSize.quantity >= requested)
+            .values(quantity=ProductSize.quantity - requested)
+            .returning(ProductSize.quantity)
+            .execution_options(synchronize_session=False)
+        )
+        remaining = result.scalar_one_or_none()
+        if remaining is None:
+            available = await db.scalar(select(ProductSize.quantity).where(ProductSize.id == size_id))
+            await db.rollback()
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Insufficient quantity for product size {size_id}. "
+                       f"Available: {available}, Requested: {requested}"
+            )
+        # Остаток в сессии — из RETURNING, чтобы карточки витрины пересобрались по нему
+        set_committed_value(sizes[size_id], "quantity", remaining)
+
 async def create_order(
     db: AsyncSession,
     order_data: OrderCreate,
@@ -23,9 +116,8 @@ async def create_order(
     
     Валидации:
     - Проверка наличия всех ProductSize
-    - Проверка достаточности количества товаров
     - Вычисление total_price
-    - Обновление quantity в ProductSize
+    - Атомарное списание quantity в ProductSize с проверкой достаточности
     """
     if not products:
         raise HTTPException(
@@ -35,100 +127,36 @@ async def create_order(
     
     # Получаем все ID размеров продуктов
     product_size_ids = list(dict.fromkeys(p.product_size_id for p in products))
-    
-    # Загружаем все ProductSize
-    result = await db.execute(
-        select(ProductSize)
-        .where(ProductSize.id.in_(product_size_ids))
-        .with_for_update()
-    )
-    product_sizes = result.scalars().all()
+    product_size_map, product_color_map, product_map = await load_cart(db, product_size_ids)
     
     # Проверяем, что все размеры найдены
-    found_ids = {ps.id for ps in product_sizes}
-    missing_ids = set(product_size_ids) - found_ids
+    missing_ids = set(product_size_ids) - set(product_size_map)
     if missing_ids:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"Product sizes not found: {missing_ids}"
         )
-    
-    # Создаем словарь для быстрого доступа
-    product_size_map = {ps.id: ps for ps in product_sizes}
-    
-    # Загружаем ProductColor для получения product_id
-    product_color_ids = [ps.product_color_id for ps in product_sizes]
-    product_colors_result = await db.execute(
-        select(ProductColor)
-        .where(ProductColor.id.in_(product_color_ids))
-    )
-    product_colors = product_colors_result.scalars().all()
-    product_color_map = {pc.id: pc for pc in product_colors}
-    
-    # Загружаем Product для получения цен
-    product_ids = [pc.product_id for pc in product_colors]
-    products_result = await db.execute(
-        select(Product)
-        .where(Product.id.in_(product_ids))
+    product_color_ids = list(product_color_map)
+
+    promo = await get_promo_code_by_code(db, order_data.promo_code) if order_data.promo_code else None
+    cart = price_cart(
+        [(p.product_size_id, p.quantity) for p in products],
+        product_size_map, product_color_map, product_map,
+        promo_code=order_data.promo_code, promo=promo,
     )
-    products_list = products_result.scalars().all()
-    product_map = {p.id: p for p in products_list}
-    
-    # Валидация количества и вычисление total_price
-    total_price = Decimal("0.00")
-    updates = []  # Список обновлений для ProductSize
-    
-    for order_product in products:
-        product_size = product_size_map[order_product.product_size_id]
-        
-        # Проверяем достаточность количества
-        if product_size.quantity < order_product.quantity:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail=f"Insufficient quantity for product size {order_product.product_size_id}. "
-                       f"Available: {product_size.quantity}, Requested: {order_product.quantity}"
-            )
-        
-        # Получаем цену продукта
-        product_color = product_color_map[product_size.product_color_id]
-        product = product_map[product_color.product_id]
-        
-        effective_price = product_color.price if product_color.price is not None else product.price
-        effective_discount = product_color.discount_price if product_color.discount_price is not None else product.discount_price
-        price = effective_discount if effective_discount is not None else effective_price
-        
-        # Добавляем к общей стоимости (конвертируем в Decimal для точных вычислений)
-        total_price += Decimal(str(price)) * Decimal(str(order_product.quantity))
-        
-        # Подготавливаем обновление quantity
-        new_quantity = product_size.quantity - order_product.quantity
-        product_size.quantity = new_quantity
-        updates.append(product_size)
-    
-    # Добавляем стоимость доставки
-    delivery_cost = Decimal("300.00")
-    total_price += delivery_cost
-    
-    # Промокод
+
+    # Списание остатков: проверка и уменьшение — один атомарный запрос на размер
+    quantities: dict[int, int] = {}
+    for line in cart.lines:
+        quantities[line.product_size.id] = quantities.get(line.product_size.id, 0) + line.quantity
+    await decrement_stock(db, product_size_map, quantities)
+
+    total_price = cart.total
+    discount_amount = cart.discount_amount
     promo_code_id = None
-    discount_amount = Decimal("0")
-    if order_data.promo_code:
-        result = await db.execute(
-            select(PromoCode).where(PromoCode.code == order_data.promo_code.upper().strip())
-        )
-        promo = result.scalar_one_or_none()
-        if promo and promo.is_active:
-            expired = promo.expires_at and promo.expires_at < datetime.now(timezone.utc).replace(tzinfo=None)
-            exhausted = promo.max_uses and promo.used_count >= promo.max_uses
-            items_total = total_price - delivery_cost
-            if not expired and not exhausted:
-                if promo.discount_type == DiscountType.PERCENTAGE:
-                    discount_amount = (items_total * promo.discount_value / Decimal("100")).quantize(Decimal("0.01"))
-                else:
-                    discount_amount = min(promo.discount_value, items_total)
-                total_price -= discount_amount
-                promo_code_id = promo.id
-                promo.used_count = (promo.used_count or 0) + 1
+    if cart.promo:
+        promo_code_id = cart.promo.id
+        cart.promo.used_count = (cart.promo.used_count or 0) + 1
     
     # Создаем заказ
     order = Order(
@@ -149,25 +177,26 @@ async def create_order(
         access_token=secrets.token_hex(32),
     )
     
+    if order.status in (None, OrderStatus.NOT_PAID):
+        hold_reservation(order)
     db.add(order)
     await db.flush()  # Получаем ID заказа
     
-    # Создаем записи OrderProduct
+    # Создаем записи OrderProduct со снимком цены, названия и веса на момент заказа
     order_products = []
-    for order_product in products:
+    for line in cart.lines:
         order_product_db = OrderProduct(
             order_id=order.id,
-            product_size_id=order_product.product_size_id,
-            quantity=order_product.quantity
+            product_size_id=line.product_size.id,
+            quantity=line.quantity,
+            **order_line_snapshot(line.product_size, line.color, line.product),
         )
         db.add(order_product_db)
         order_products.append(order_product_db)
     
-    # Обновляем quantity в ProductSize
-    for product_size in updates:
-        db.add(product_size)
-    
     try:
+        # Остатки в карточках витрины должны совпадать с product_sizes
+        await refresh_product_cards(db, color_ids=product_color_ids)
         await db.commit()
         await db.refresh(order)
         logger.info(f"Order {order.id} created successfully with {len(products)} products")
@@ -180,14 +209,17 @@ async def create_order(
             detail="Failed to create order"
         )
 
-async def get_orders(
-    db: AsyncSession,
-    skip: int = 0,
-    limit: int = 100,
-    search: Optional[str] = None
-) -> List[Order]:
-    """Get orders list with pagination"""
-    query = select(Order)
+# Админский список: новые заказы первыми, id разрешает совпадения created_at
+ORDER_LIST_ORDER = (
+    (Order.created_at, True),
+    (Order.id, True),
+)
+
+def order_cursor(order) -> tuple:
+    return (order.created_at, order.id)
+
+def _orders_query(columns, search: Optional[str] = None):
+    query = select(*columns)
     if search:
         search_value = search.strip()
         if search_value:
@@ -203,14 +235,34 @@ async def get_orders(
             if search_value.isdigit():
                 filters.append(Order.id == int(search_value))
             query = query.where(or_(*filters))
+    return query
 
+async def get_orders(
+    db: AsyncSession,
+    skip: int = 0,
+    limit: int = 100,
+    search: Optional[str] = None,
+    cursor: Optional[str] = None,
+) -> Page[Order]:
+    """Get orders page by cursor from the previous page"""
+    query = _orders_query([Order], search)
+    after = decode_cursor(cursor, ORDER_LIST_ORDER)
+    if after is not None:
+        query = query.where(keyset_after(ORDER_LIST_ORDER, after))
     result = await db.execute(
         query
+        .order_by(*keyset_order_by(ORDER_LIST_ORDER))
         .offset(skip)
-        .limit(limit)
-        .order_by(Order.created_at.desc())
+        .limit(limit + 1)
     )
-    return result.scalars().all()
+    return build_page(result.scalars().all(), limit, order_cursor)
+
+async def get_orders_count(db: AsyncSession, search: Optional[str] = None) -> int:
+    """Количество заказов под фильтром поиска (считается только по запросу)"""
+    query = _orders_query([func.count(Order.id)], search)
+    result = await db.execute(query)
+    return result.scalar()
+
 async def get_order_by_id(db: AsyncSession, order_id: int) -> Optional[Order]:
     """Получить заказ по ID"""
     result = await db.execute(select(Order).where(Order.id == order_id))
@@ -237,7 +289,17 @@ async def update_order(
 
     # Update only provided fields
     if "status" in fields_set:
-        order.status = order_update.status
+        status_changed = order.status != order_update.status
+        if status_changed:
+            # Оплата подтверждает резерв остатков, отмена возвращает их на витрину
+            await set_order_payment_status(db, order, order_update.status)
+            # Отмена или возврат меняют популярность товаров заказа в карточках витрины
+            result = await db.execute(
+                select(ProductSize.product_color_id)
+                .join(OrderProduct, OrderProduct.product_size_id == ProductSize.id)
+                .where(OrderProduct.order_id == order_id)
+            )
+            await refresh_product_cards(db, color_ids=result.scalars().all())
 
     if "custom_status_id" in fields_set:
         if order_update.custom_status_id is not None:
@@ -270,40 +332,45 @@ async def delete_order(db: AsyncSession, order_id: int) -> bool:
     await db.commit()
     return True
 
-async def get_order_detail(
+async def load_order_details(
     db: AsyncSession,
-    order_id: int,
+    orders: List[Order],
     *,
     include_access_token: bool = False,
-) -> Optional[OrderDetail]:
+) -> List[OrderDetail]:
     """
-    Получить полную информацию о заказе с товарами.
-    
-    Возвращает:
-    - Всю информацию о заказе
-    - Список товаров с полной информацией (Product, ProductColor, размер, количество)
+    Собрать OrderDetail для пачки заказов за постоянное число запросов.
+
+    Кастомные статусы — одним запросом, строки всех заказов (со снимком товара) —
+    вторым; порядок заказов сохраняется.
     """
-    # Получаем заказ
-    order = await get_order_by_id(db, order_id)
-    if not order:
-        return None
+    if not orders:
+        return []
+    order_ids = [order.id for order in orders]
 
-    custom_status_name = None
-    if order.custom_status_id is not None:
-        custom_status_result = await db.execute(
-            select(CustomStatus.name).where(CustomStatus.id == order.custom_status_id)
+    custom_status_ids = {order.custom_status_id for order in orders if order.custom_status_id is not None}
+    custom_status_names: dict[int, str] = {}
+    if custom_status_ids:
+        result = await db.execute(
+            select(CustomStatus.id, CustomStatus.name).where(CustomStatus.id.in_(custom_status_ids))
         )
-        custom_status_name = custom_status_result.scalar_one_or_none()
-    
-    # Получаем все товары заказа
-    order_products_result = await db.execute(
+        custom_status_names = {row.id: row.name for row in result}
+
+    # Строки заказа хранят снимок товара, каталог для чтения не нужен
+    lines_result = await db.execute(
         select(OrderProduct)
-        .where(OrderProduct.order_id == order_id)
+        .where(OrderProduct.order_id.in_(order_ids))
+        .order_by(OrderProduct.order_id, OrderProduct.id)
     )
-    order_products = order_products_result.scalars().all()
-    
-    if not order_products:
-        return OrderDetail(
+    products_by_order: dict[int, list[OrderProductDetail]] = {order_id: [] for order_id in order_ids}
+    for order_product in lines_result.scalars().all():
+        if order_product.title is None:
+            logger.warning(f"Order {order_product.order_id}: OrderProduct {order_product.id} has no snapshot")
+            continue
+        products_by_order[order_product.order_id].append(OrderProductDetail.model_validate(order_product))
+
+    return [
+        OrderDetail(
             id=order.id,
             email=order.email,
             first_name=order.first_name,
@@ -316,7 +383,7 @@ async def get_order_detail(
             total_price=order.total_price,
             delivery_method=order.delivery_method,
             status=order.status,
-            custom_status_name=custom_status_name,
+            custom_status_name=custom_status_names.get(order.custom_status_id),
             user_id=order.user_id,
             access_token=order.access_token if include_access_token else None,
             cdek_uuid=order.cdek_uuid,
@@ -324,108 +391,39 @@ async def get_order_detail(
             promo_code_id=order.promo_code_id,
             discount_amount=order.discount_amount or Decimal("0"),
             created_at=order.created_at,
-            products=[]
+            products=products_by_order[order.id]
         )
+        for order in orders
+    ]
+
+async def get_order_detail(
+    db: AsyncSession,
+    order_id: int,
+    *,
+    include_access_token: bool = False,
+) -> Optional[OrderDetail]:
+    """
+    Получить полную информацию о заказе с товарами.
     
-    # Получаем все ProductSize
-    product_size_ids = [op.product_size_id for op in order_products]
-    product_sizes_result = await db.execute(
-        select(ProductSize)
-        .where(ProductSize.id.in_(product_size_ids))
-    )
-    product_sizes = product_sizes_result.scalars().all()
-    product_size_map = {ps.id: ps for ps in product_sizes}
-    
-    # Получаем все ProductColor
-    product_color_ids = [ps.product_color_id for ps in product_sizes]
-    product_colors_result = await db.execute(
-        select(ProductColor)
-        .where(ProductColor.id.in_(product_color_ids))
-    )
-    product_colors = product_colors_result.scalars().all()
-    product_color_map = {pc.id: pc for pc in product_colors}
-    
-    # Получаем все Product
-    product_ids = [pc.product_id for pc in product_colors]
-    products_result = await db.execute(
-        select(Product)
-        .where(Product.id.in_(product_ids))
-    )
-    products = products_result.scalars().all()
-    product_map = {p.id: p for p in products}
-    
-    # Формируем список товаров с полной информацией
-    products_detail = []
-    for order_product in order_products:
-        product_size = product_size_map.get(order_product.product_size_id)
-        if not product_size:
-            logger.warning(f"Order {order_id}: ProductSize {order_product.product_size_id} not found (deleted?)")
-            continue
-        product_color = product_color_map.get(product_size.product_color_id)
-        if not product_color:
-            logger.warning(f"Order {order_id}: ProductColor {product_size.product_color_id} not found (deleted?)")
-            continue
-        product = product_map.get(product_color.product_id)
-        if not product:
-            logger.warning(f"Order {order_id}: Product {product_color.product_id} not found (deleted?)")
-            continue
-        
-        eff_price = product_color.price if product_color.price is not None else product.price
-        eff_discount = product_color.discount_price if product_color.discount_price is not None else product.discount_price
-
-        products_detail.append(OrderProductDetail(
-            id=order_product.id,
-            product_id=product.id,
-            product_color_id=product_color.id,
-            slug=product_color.slug,
-            title=product_color.title,
-            label=product_color.label,
-            hex=product_color.hex,
-            price=eff_price,
-            discount_price=eff_discount,
-            currency=product.currency,
-            size=product_size.size,
-            quantity=order_product.quantity
-        ))
-    
-    return OrderDetail(
-        id=order.id,
-        email=order.email,
-        first_name=order.first_name,
-        last_name=order.last_name,
-        phone=order.phone,
-        city=order.city,
-        postal_code=order.postal_code,
-        address=order.address,
-        comment=order.comment,
-        total_price=order.total_price,
-        delivery_method=order.delivery_method,
-        status=order.status,
-        custom_status_name=custom_status_name,
-        user_id=order.user_id,
-        access_token=order.access_token if include_access_token else None,
-        cdek_uuid=order.cdek_uuid,
-        cdek_number=order.cdek_number,
-        promo_code_id=order.promo_code_id,
-        discount_amount=order.discount_amount or Decimal("0"),
-        created_at=order.created_at,
-        products=products_detail
-    )
+    Возвращает:
+    - Всю информацию о заказе
+    - Список товаров с полной информацией (Product, ProductColor, размер, количество)
+    """
+    order = await get_order_by_id(db, order_id)
+    if not order:
+        return None
+    details = await load_order_details(db, [order], include_access_token=include_access_token)
+    return details[0]
 
 async def get_orders_detail(
     db: AsyncSession,
     skip: int = 0,
     limit: int = 100,
-    search: Optional[str] = None
-) -> List[OrderDetail]:
-    """Получить список всех заказов с полной информацией о товарах"""
-    orders = await get_orders(db, skip, limit, search)
-    orders_detail = []
-    
-    for order in orders:
-        order_detail = await get_order_detail(db, order.id, include_access_token=False)
-        if order_detail:
-            orders_detail.append(order_detail)
-    
-    return orders_detail
+    search: Optional[str] = None,
+    cursor: Optional[str] = None,
+) -> Page[OrderDetail]:
+    """Получить страницу заказов с полной информацией о товарах"""
+    page = await get_orders(db, skip, limit, search, cursor)
+    orders_detail = await load_order_details(db, page.items, include_access_token=False)
+    return Page(items=orders_detail, next_cursor=page.next_cursor)
 
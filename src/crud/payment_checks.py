@@ -0,0 +1,104 @@
+"""Сверка статусов оплаты неоплаченных заказов с провайдером.
+
+Заказ «занимается» под сверку записью payment_checked_at и commit до запроса к провайдеру:
+блокировки строк не держатся на время HTTP, а параллельные воркеры и force refresh не
+опрашивают провайдера по одному заказу чаще заданного интервала.
+"""
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+from sqlalchemy import or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.config import settings
+from src.crud.reservations import set_order_payment_status
+from src.models.orders import Order, OrderStatus
+
+logger = logging.getLogger(__name__)
+
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+async def claim_payment_checks(
+    db: AsyncSession,
+    *,
+    batch_size: Optional[int] = None,
+    now: Optional[datetime] = None,
+) -> list[tuple[int, Optional[str], str]]:
+    """
+    Занять пачку неоплаченных заказов с payment_id для сверки: (id, провайдер, payment_id).
+
+    Берутся заказы не старше PAYMENT_RECONCILE_MAX_AGE_HOURS, не сверявшиеся дольше
+    PAYMENT_RECONCILE_INTERVAL_SECONDS, сначала — ни разу не сверявшиеся.
+    """
+    batch_size = batch_size or settings.PAYMENT_RECONCILE_BATCH_SIZE
+    now = now or _utcnow()
+    checked_before = now - timedelta(seconds=settings.PAYMENT_RECONCILE_INTERVAL_SECONDS)
+    result = await db.execute(
+        select(Order.id, Order.payment_provider, Order.payment_id)
+        .where(
+            Order.status == OrderStatus.NOT_PAID,
+            Order.payment_id.is_not(None),
+            Order.created_at >= now - timedelta(hours=settings.PAYMENT_RECONCILE_MAX_AGE_HOURS),
+            or_(Order.payment_checked_at.is_(None), Order.payment_checked_at < checked_before),
+        )
+        .order_by(Order.payment_checked_at.asc().nulls_first())
+        .limit(batch_size)
+        .with_for_update(skip_locked=True)
+    )
+    rows = [tuple(row) for row in result.all()]
+    if rows:
+        await db.execute(
+            update(Order)
+            .where(Order.id.in_([row[0] for row in rows]))
+            .values(payment_checked_at=now)
+            .execution_options(synchronize_session=False)
+        )
+    await db.commit()
+    return rows
+
+
+async def claim_payment_refresh(db: AsyncSession, order_id: int, now: Optional[datetime] = None) -> bool:
+    """Занять заказ под внеочередную сверку; False, если его сверяли меньше PAYMENT_STATUS_REFRESH_SECONDS назад."""
+    now = now or _utcnow()
+    checked_before = now - timedelta(seconds=settings.PAYMENT_STATUS_REFRESH_SECONDS)
+    result = await db.execute(
+        update(Order)
+        .where(
+            Order.id == order_id,
+            or_(Order.payment_checked_at.is_(None), Order.payment_checked_at < checked_before),
+        )
+        .values(payment_checked_at=now)
+        .returning(Order.id)
+        .execution_options(synchronize_session=False)
+    )
+    claimed = result.scalar_one_or_none() is not None
+    await db.commit()
+    return claimed
+
+
+async def apply_payment_statuses(db: AsyncSession, statuses: dict[int, OrderStatus]) -> int:
+    """
+    Записать статусы, полученные от провайдеров, одной транзакцией.
+
+    Меняются только заказы, всё ещё ожидающие оплаты: если вебхук успел раньше, его статус
+    остаётся. Возвращает число изменённых заказов.
+    """
+    if not statuses:
+        return 0
+    result = await db.execute(
+        select(Order)
+        .where(Order.id.in_(list(statuses)), Order.status == OrderStatus.NOT_PAID)
+        .order_by(Order.id)
+        .with_for_update()
+        .execution_options(populate_existing=True)
+    )
+    orders = result.scalars().all()
+    for order in orders:
+        await set_order_payment_status(db, order, statuses[order.id])
+        logger.info(f"Order {order.id} updated to {statuses[order.id].value} by payment reconciliation")
+    await db.commit()
+    return len(orders)
@@ -1,14 +1,25 @@
-from sqlalchemy import select, func
+from sqlalchemy import Row, String, Text, and_, cast, delete, distinct, func, insert, literal, null, or_, select, union_all
 from sqlalchemy.ext.asyncio import AsyncSession
-from src.models.product import Product, ProductColor, ProductSize, ProductImage, ProductSection
-from src.models.category import Category, ProductCategory
+from sqlalchemy.orm import defer
+from src.models.product import Product, ProductColor, ProductSize, ProductImage, ProductSection, ProductCard, ProductStatus
+from src.models.category import Category, ProductCategory, CategoryClosure
+from src.models.collection import CollectionProduct
+from src.models.orders import Order, OrderProduct, OrderStatus
 from src.schemas.product import (
     ProductCreate, ProductUpdate, ProductColorCreate, ProductColorUpdate,
-    ProductSectionCreate, ProductSectionUpdate
+    ProductSectionCreate, ProductSectionUpdate, ProductFilters, ProductFacets,
+    SizeFacet, ColorFacet, PriceFacet,
 )
+from src.services.catalog import build_card_view, build_product_public
+from src.services import response_cache
+from src.services.pricing import unit_price
+from src.services.pagination import Page, build_page, decode_cursor, keyset_after, keyset_order_by
+from src.services.search import apply_product_search, normalize_search
 from src.utils import delete_image_from_minio
-from typing import List, Optional
+from typing import Iterable, List, Optional, Sequence
 from collections import defaultdict
+from dataclasses import dataclass
+from datetime import datetime, timezone
 
 # --- Product CRUD ---
 async def get_product_by_id(db: AsyncSession, product_id: int) -> Optional[Product]:
@@ -21,53 +32,188 @@ async def get_product_by_slug(db: AsyncSession, slug: str) -> Optional[ProductCo
     result = await db.execute(select(ProductColor).where(ProductColor.slug == slug))
     return result.scalars().first()
 
+def _product_cards_query(
+    db: AsyncSession,
+    columns,
+    filters: Optional[ProductFilters] = None,
+    *,
+    exclude: Optional[str] = None,
+):
+    """Запрос по карточкам с фильтрами; при поиске возвращает и выражение релевантности.
+
+    exclude — измерение фасета ("sizes", "colors", "price"), фильтр по которому не применяется:
+    счётчики фасета показывают, сколько карточек даст выбор любого его значения.
+    """
+    filters = filters or ProductFilters()
+    query = select(*columns)
+    if filters.status:
+        query = query.where(ProductCard.status == ProductStatus(filters.status).value)
+    if exclude != "price":
+        if filters.price_min is not None:
+            query = query.where(ProductCard.price >= filters.price_min)
+        if filters.price_max is not None:
+            query = query.where(ProductCard.price <= filters.price_max)
+    if filters.sizes and exclude != "sizes":
+        query = query.where(
+            select(ProductSize.id)
+            .where(
+                ProductSize.product_color_id == ProductCard.color_id,
+                ProductSize.quantity > 0,
+                ProductSize.size.in_(filters.sizes),
+            )
+            .exists()
+        )
+    if filters.colors and exclude != "colors":
+        query = query.where(or_(
+            ProductCard.label.in_(filters.colors),
+            func.lower(ProductCard.hex).in_([value.lower() for value in filters.colors]),
+        ))
+    if filters.category:
+        query = query.where(ProductCard.product_id.in_(
+            select(ProductCategory.product_id)
+            .join(CategoryClosure, CategoryClosure.descendant_id == ProductCategory.category_id)
+            .join(Category, Category.id == CategoryClosure.ancestor_id)
+            .where(Category.slug == filters.category)
+        ))
+    if filters.collection_id is not None:
+        query = query.where(ProductCard.product_id.in_(
+            select(CollectionProduct.product_id).where(CollectionProduct.collection_id == filters.collection_id)
+        ))
+    rank = None
+    search = normalize_search(filters.search)
+    if search:
+        query, rank = apply_product_search(db, query, search)
+    return query, rank
+
+def product_card_columns(card_view: bool = False) -> list:
+    """Колонки листинга: ключи и JSON карточки текстом — он уходит в ответ без ORM и повторной сериализации."""
+    payload = ProductCard.card if card_view else ProductCard.data
+    return [
+        ProductCard.product_id,
+        ProductCard.color_id,
+        ProductCard.sort_order,
+        ProductCard.created_at,
+        cast(payload, Text).label("payload"),
+    ]
+
+# Порядок витрины: глобальная позиция, затем новые цвета первыми
+PRODUCT_CARD_ORDER = (
+    (ProductCard.sort_order, False),
+    (ProductCard.created_at, True),
+    (ProductCard.color_id, True),
+)
+
+def product_card_cursor(card) -> tuple:
+    return (card.sort_order, card.created_at, card.color_id)
+
+def _products_page_query(db: AsyncSession, columns, *, skip, limit, filters, cursor):
+    query, rank = _product_cards_query(db, columns, filters)
+    order = PRODUCT_CARD_ORDER
+    if rank is not None:
+        # Поисковая выдача сортируется по релевантности, курсор хранит её значение
+        order = ((rank, True), (ProductCard.color_id, True))
+        query = query.add_columns(rank.label("search_rank"))
+    after = decode_cursor(cursor, order)
+    if after is not None:
+        query = query.where(keyset_after(order, after))
+    # limit + 1: лишняя строка сообщает, что есть следующая страница
+    return query.order_by(*keyset_order_by(order)).offset(skip).limit(limit + 1), rank is not None
+
 async def get_products(
     db: AsyncSession, 
     skip: int = 0, 
     limit: int = 100,
-    status: Optional[str] = None,
-    search: Optional[str] = None
-) -> List[ProductColor]:
-    """Получить список продуктов (теперь возвращаем ProductColor)"""
-    query = select(ProductColor).join(Product, ProductColor.product_id == Product.id)
-    
-    if status:
-        query = query.where(Product.status == status)
-    
-    if search:
-        search_filter = f"%{search}%"
-        query = query.where(
-            (ProductColor.title.ilike(search_filter)) |
-            (ProductColor.slug.ilike(search_filter)) |
-            (Product.description.ilike(search_filter))
-        )
-    
-    query = query.offset(skip).limit(limit).order_by(Product.sort_order.asc(), ProductColor.created_at.desc())
+    filters: Optional[ProductFilters] = None,
+    cursor: Optional[str] = None,
+    card_view: bool = False,
+) -> Page[Row]:
+    """Страница карточек витрины (строки product_card_columns) по курсору из next_cursor"""
+    query, ranked = _products_page_query(
+        db, product_card_columns(card_view), skip=skip, limit=limit, filters=filters, cursor=cursor
+    )
     result = await db.execute(query)
-    return result.scalars().all()
+    if ranked:
+        return build_page(result.all(), limit, lambda row: (row.search_rank, row.color_id))
+    return build_page(result.all(), limit, product_card_cursor)
 
-async def get_products_count(
-    db: AsyncSession,
-    status: Optional[str] = None,
-    search: Optional[str] = None
-) -> int:
+async def get_products_version(
+    db: AsyncSession, filters: Optional[ProductFilters] = None
+) -> tuple[int, Optional[int], Optional[datetime]]:
+    """Валидатор для ETag: количество карточек под фильтром, сумма их ID и время последнего изменения.
+
+    Привязки к категориям и коллекциям не меняют карточек: замену одного продукта другим
+    при том же количестве видно только по составу (сумме color_id).
+    """
+    query, _ = _product_cards_query(
+        db,
+        [func.count(ProductCard.color_id), func.sum(ProductCard.color_id), func.max(ProductCard.updated_at)],
+        filters,
+    )
+    result = await db.execute(query)
+    total, members, last_modified = result.one()
+    return total, members, last_modified
+
+async def get_products_count(db: AsyncSession, filters: Optional[ProductFilters] = None) -> int:
     """Получить общее количество продуктов"""
-    query = select(func.count(ProductColor.id)).join(Product, ProductColor.product_id == Product.id)
-    
-    if status:
-        query = query.where(Product.status == status)
-    
-    if search:
-        search_filter = f"%{search}%"
-        query = query.where(
-            (ProductColor.title.ilike(search_filter)) |
-            (ProductColor.slug.ilike(search_filter)) |
-            (Product.description.ilike(search_filter))
-        )
-    
+    query, _ = _product_cards_query(db, [func.count(ProductCard.color_id)], filters)
     result = await db.execute(query)
     return result.scalar()
 
+async def get_product_facets(db: AsyncSession, filters: Optional[ProductFilters] = None) -> ProductFacets:
+    """Фасеты витрины (размеры, цвета, диапазон цен) одним запросом.
+
+    Каждая ветка UNION ALL считает своё измерение по выборке со всеми фильтрами,
+    кроме фильтра по этому же измерению.
+    """
+    card_columns = [ProductCard.color_id, ProductCard.label, ProductCard.hex, ProductCard.price]
+
+    def matching(dimension: str):
+        query, _ = _product_cards_query(db, card_columns, filters, exclude=dimension)
+        return query.subquery(f"{dimension}_cards")
+
+    sizes = matching("sizes")
+    colors = matching("colors")
+    prices = matching("price")
+    no_text = cast(null(), String)
+    no_price = cast(null(), ProductCard.price.type)
+    facet_query = union_all(
+        select(
+            literal("sizes").label("facet"),
+            ProductSize.size.label("value"),
+            no_text.label("hex"),
+            func.min(ProductSize.sort_order).label("position"),
+            no_price.label("price_min"),
+            no_price.label("price_max"),
+            func.count(distinct(sizes.c.color_id)).label("count"),
+        )
+        .join_from(sizes, ProductSize, and_(ProductSize.product_color_id == sizes.c.color_id, ProductSize.quantity > 0))
+        .group_by(ProductSize.size),
+        select(
+            literal("colors"), colors.c.label, colors.c.hex, literal(0), no_price, no_price,
+            func.count(colors.c.color_id),
+        )
+        .where(colors.c.label.is_not(None))
+        .group_by(colors.c.label, colors.c.hex),
+        select(
+            literal("price"), no_text, no_text, literal(0), func.min(prices.c.price), func.max(prices.c.price),
+            func.count(prices.c.color_id),
+        ),
+    )
+    result = await db.execute(facet_query)
+
+    facets = ProductFacets()
+    size_rows = []
+    for row in result.all():
+        if row.facet == "sizes":
+            size_rows.append((row.position or 0, row.value, row.count))
+        elif row.facet == "colors":
+            facets.colors.append(ColorFacet(label=row.value, hex=row.hex, count=row.count))
+        elif row.facet == "price" and row.count:
+            facets.price = PriceFacet(min=row.price_min, max=row.price_max)
+    facets.sizes = [SizeFacet(value=value, count=count) for _, value, count in sorted(size_rows)]
+    facets.colors.sort(key=lambda color: (-color.count, color.label))
+    return facets
+
 async def create_product(db: AsyncSession, product_create: ProductCreate) -> Product:
     """Создать новый продукт"""
     db_product = Product(
@@ -100,6 +246,7 @@ async def update_product(db: AsyncSession, product_id: int, update_data: Product
     for field, value in update_dict.items():
         setattr(product, field, value)
     
+    await refresh_product_cards(db, [product_id])
     await db.commit()
     await db.refresh(product)
     return product
@@ -122,7 +269,11 @@ async def delete_product(db: AsyncSession, product_id: int) -> bool:
             if img.file:
                 await delete_image_from_minio(img.file)
     
+    # Привязки к категориям и коллекциям удаляются каскадом (ON DELETE CASCADE) —
+    # ключи их листингов собираем до удаления
+    response_cache.mark_stale(*await _listing_keys_for_products(db, [product_id]))
     await db.delete(product)
+    await refresh_product_cards(db, [product_id])
     await db.commit()
     return True
 
@@ -180,6 +331,89 @@ async def get_product_by_category_and_slug(db: AsyncSession, category_slug: str,
     
     return result.scalars().first()
 
+async def get_product_cards_batch(
+    db: AsyncSession,
+    *,
+    color_ids: Sequence[int] = (),
+    size_ids: Sequence[int] = (),
+    card_view: bool = False,
+) -> list[Row]:
+    """Карточки (строки product_card_columns) по ID цветов и/или размеров одним запросом, в порядке запрошенных ID"""
+    conditions = []
+    if color_ids:
+        conditions.append(ProductCard.color_id.in_(set(color_ids)))
+    if size_ids:
+        conditions.append(ProductCard.color_id.in_(
+            select(ProductSize.product_color_id).where(ProductSize.id.in_(set(size_ids)))
+        ))
+    if not conditions:
+        return []
+    result = await db.execute(
+        select(*product_card_columns(card_view), ProductSize.id.label("size_id"))
+        .outerjoin(ProductSize, and_(ProductSize.product_color_id == ProductCard.color_id, ProductSize.id.in_(set(size_ids))))
+        .where(or_(*conditions))
+    )
+    cards: dict[int, Row] = {}
+    color_by_size: dict[int, int] = {}
+    for row in result.all():
+        cards[row.color_id] = row
+        if row.size_id is not None:
+            color_by_size[row.size_id] = row.color_id
+    ordered = [*color_ids, *(color_by_size[size_id] for size_id in size_ids if size_id in color_by_size)]
+    return [cards[color_id] for color_id in dict.fromkeys(ordered) if color_id in cards]
+
+@dataclass
+class ProductDetailBundle:
+    """Продукт со всеми цветами: строки ProductColor и их готовые карточки витрины."""
+    product: Product
+    colors: list[ProductColor]
+    cards: dict[int, ProductCard]
+    selected: Optional[ProductCard] = None
+
+async def load_product_detail(
+    db: AsyncSession,
+    *,
+    product_id: Optional[int] = None,
+    color_slug: Optional[str] = None,
+    category_slug: Optional[str] = None,
+) -> Optional[ProductDetailBundle]:
+    """Загрузить продукт, все его цвета и их карточки (размеры, фото, секции, категория) одним запросом.
+
+    Продукт ищется по ID или по slug цвета (опционально — среди прямых привязок к категории).
+    """
+    if product_id is not None:
+        product_filter = Product.id == product_id
+    else:
+        matches = select(ProductCard.product_id).where(ProductCard.slug == color_slug)
+        if category_slug is not None:
+            matches = matches.where(ProductCard.product_id.in_(
+                select(ProductCategory.product_id)
+                .join(Category, Category.id == ProductCategory.category_id)
+                .where(Category.slug == category_slug)
+            ))
+        product_filter = Product.id.in_(matches)
+    result = await db.execute(
+        select(Product, ProductColor, ProductCard)
+        .outerjoin(ProductColor, ProductColor.product_id == Product.id)
+        .outerjoin(ProductCard, ProductCard.color_id == ProductColor.id)
+        .where(product_filter)
+        .order_by(Product.id, ProductColor.id)
+        .options(defer(ProductCard.search_text), defer(ProductCard.card))
+    )
+    rows = result.all()
+    if not rows:
+        return None
+
+    selected = None
+    if color_slug is not None:
+        selected = next((card for _, _, card in rows if card is not None and card.slug == color_slug), None)
+        if selected is None:
+            return None
+    product = next(p for p, _, _ in rows if selected is None or p.id == selected.product_id)
+    colors = [color for p, color, _ in rows if p.id == product.id and color is not None]
+    cards = {card.color_id: card for p, _, card in rows if p.id == product.id and card is not None}
+    return ProductDetailBundle(product=product, colors=colors, cards=cards, selected=selected)
+
 # --- ProductColor CRUD ---
 async def get_product_color_by_id(db: AsyncSession, color_id: int) -> Optional[ProductColor]:
     """Получить цвет продукта по ID"""
@@ -195,6 +429,7 @@ async def create_product_color(db: AsyncSession, product_id: int, *, slug: str,
     """Создать цвет продукта"""
     color = ProductColor(product_id=product_id, slug=slug, title=title, label=label, hex=hex, price=price, discount_price=discount_price)
     db.add(color)
+    await refresh_product_cards(db, [product_id])
     await db.commit()
     await db.refresh(color)
     return color
@@ -209,6 +444,7 @@ async def update_product_color(db: AsyncSession, color_id: int, update_data: Pro
     for field, value in update_dict.items():
         setattr(color, field, value)
     
+    await refresh_product_cards(db, [color.product_id])
     await db.commit()
     await db.refresh(color)
     return color
@@ -227,6 +463,7 @@ async def delete_product_color(db: AsyncSession, color_id: int) -> bool:
             await delete_image_from_minio(img.file)
             
     await db.delete(color)
+    await refresh_product_cards(db, [color.product_id])
     await db.commit()
     return True
 
@@ -244,6 +481,7 @@ async def create_product_image(db: AsyncSession, product_color_id: int, *, file_
     """Создать изображение продукта"""
     img = ProductImage(product_color_id=product_color_id, file=file_url, sort_order=sort_order)
     db.add(img)
+    await refresh_product_cards(db, color_ids=[product_color_id])
     await db.commit()
     await db.refresh(img)
     return img
@@ -259,6 +497,7 @@ async def delete_product_image(db: AsyncSession, image_id: int) -> bool:
         await delete_image_from_minio(img.file)
     
     await db.delete(img)
+    await refresh_product_cards(db, color_ids=[img.product_color_id])
     await db.commit()
     return True
 
@@ -276,6 +515,7 @@ async def reorder_product_images(db: AsyncSession, product_color_id: int, image_
                 continue
             images[img_id].sort_order = index
             
+    await refresh_product_cards(db, color_ids=[product_color_id])
     await db.commit()
     return True
 
@@ -292,6 +532,7 @@ async def delete_primary_image(db: AsyncSession, product_color_id: int) -> bool:
         if img.file:
             await delete_image_from_minio(img.file)
         await db.delete(img)
+    await refresh_product_cards(db, color_ids=[product_color_id])
     await db.commit()
     return True
 
@@ -323,6 +564,7 @@ async def create_product_size(db: AsyncSession, product_color_id: int, *, size:
     """Создать размер продукта"""
     ps = ProductSize(product_color_id=product_color_id, size=size, quantity=quantity)
     db.add(ps)
+    await refresh_product_cards(db, color_ids=[product_color_id])
     await db.commit()
     await db.refresh(ps)
     return ps
@@ -339,6 +581,7 @@ async def update_product_size(db: AsyncSession, size_id: int, *, size: Optional[
     if quantity is not None:
         ps.quantity = quantity
     
+    await refresh_product_cards(db, color_ids=[ps.product_color_id])
     await db.commit()
     await db.refresh(ps)
     return ps
@@ -349,59 +592,34 @@ async def delete_product_size(db: AsyncSession, size_id: int) -> bool:
     if not ps:
         return False
     await db.delete(ps)
+    await refresh_product_cards(db, color_ids=[ps.product_color_id])
     await db.commit()
     return True
 
 async def get_product_main_category(db: AsyncSession, product_id: int) -> Optional[dict]:
     """Получить основную категорию продукта (уровень 0)"""
-    # Получаем все категории, к которым привязан продукт
-    query = (
-        select(Category)
-        .join(ProductCategory, ProductCategory.category_id == Category.id)
-        .where(ProductCategory.product_id == product_id)
-    )
-    result = await db.execute(query)
-    categories = result.scalars().all()
-    
-    if not categories:
-        return None
-        
-    # Ищем самую верхнюю категорию (level 0)
-    # Если продукт привязан к подкатегории, поднимаемся вверх по дереву
-    for cat in categories:
-        if cat.level == 0:
-            return {"name": cat.name, "slug": cat.slug}
-            
-        current_cat = cat
-        # Ограничим количество итераций на всякий случай, чтобы избежать бесконечного цикла
-        for _ in range(10): 
-            if current_cat.level == 0 or not current_cat.parent_id:
-                break
-            parent_query = select(Category).where(Category.id == current_cat.parent_id)
-            parent_result = await db.execute(parent_query)
-            parent_cat = parent_result.scalar_one_or_none()
-            if not parent_cat:
-                break
-            current_cat = parent_cat
-            
-        if current_cat.level == 0:
-            return {"name": current_cat.name, "slug": current_cat.slug}
-            
-    return None
+    main_categories = await get_main_categories_for_products(db, [product_id])
+    return main_categories.get(product_id)
 
 async def get_main_categories_for_products(db: AsyncSession, product_ids: List[int]) -> dict[int, dict]:
-    """Загрузить основные категории для списка продуктов (батч-версия)"""
+    """Загрузить основные категории для списка продуктов (батч-версия).
+
+    Корень каждой привязанной категории берётся из closure-таблицы одним join,
+    поэтому количество запросов не зависит от размера страницы и глубины дерева.
+    """
     if not product_ids:
         return {}
-        
-    # Это упрощенная версия, которая делает запросы для каждого товара,
-    # но в будущем её можно оптимизировать одним сложным CTE запросом.
-    # Для текущего объема данных этого достаточно.
-    results = {}
-    for pid in product_ids:
-        main_cat = await get_product_main_category(db, pid)
-        if main_cat:
-            results[pid] = main_cat
+
+    result = await db.execute(
+        select(ProductCategory.product_id, Category.name, Category.slug)
+        .join(CategoryClosure, CategoryClosure.descendant_id == ProductCategory.category_id)
+        .join(Category, Category.id == CategoryClosure.ancestor_id)
+        .where(ProductCategory.product_id.in_(set(product_ids)), Category.level == 0)
+        .order_by(ProductCategory.product_id, CategoryClosure.depth, Category.sort_order, Category.id)
+    )
+    results: dict[int, dict] = {}
+    for product_id, name, slug in result.all():
+        results.setdefault(product_id, {"name": name, "slug": slug})
     return results
 
 async def get_sizes_for_products(db: AsyncSession, product_color_ids: List[int]) -> dict[int, list[dict]]:
@@ -434,6 +652,7 @@ async def reorder_product_sizes(db: AsyncSession, product_color_id: int, size_id
         if size_id in sizes:
             sizes[size_id].sort_order = index
             
+    await refresh_product_cards(db, color_ids=[product_color_id])
     await db.commit()
     return True
 
@@ -457,6 +676,7 @@ async def create_product_section(db: AsyncSession, product_id: int, section_in:
         sort_order=section_in.sort_order
     )
     db.add(db_section)
+    await refresh_product_cards(db, [product_id])
     await db.commit()
     await db.refresh(db_section)
     return db_section
@@ -471,6 +691,7 @@ async def update_product_section(db: AsyncSession, section_id: int, section_upda
     for field, value in update_data.items():
         setattr(db_section, field, value)
     
+    await refresh_product_cards(db, [db_section.product_id])
     await db.commit()
     await db.refresh(db_section)
     return db_section
@@ -482,6 +703,7 @@ async def delete_product_section(db: AsyncSession, section_id: int) -> bool:
         return False
     
     await db.delete(db_section)
+    await refresh_product_cards(db, [db_section.product_id])
     await db.commit()
     return True
 
@@ -496,6 +718,7 @@ async def reorder_product_sections(db: AsyncSession, product_id: int, section_id
         if section_id in sections:
             sections[section_id].sort_order = index
             
+    await refresh_product_cards(db, [product_id])
     await db.commit()
     return True
 
@@ -534,5 +757,156 @@ async def reorder_global_products(db: AsyncSession, product_ids: List[int]) -> b
     for index, prod_id in enumerate(product_ids):
         if prod_id in products:
             products[prod_id].sort_order = index
+    await refresh_product_cards(db, [p.id for p in products.values()])
     await db.commit()
     return True
+
+
+# --- ProductCard read model ---
+async def category_listing_keys(db: AsyncSession, category_ids: Iterable[int]) -> list[str]:
+    """Surrogate-ключи листингов категорий и всех их предков (листинг включает поддерево)."""
+    category_ids = list(category_ids)
+    if not category_ids:
+        return []
+    result = await db.execute(
+        select(CategoryClosure.ancestor_id)
+        .where(CategoryClosure.descendant_id.in_(category_ids))
+        .distinct()
+    )
+    return [response_cache.category_key(cid) for cid in result.scalars().all()]
+
+async def _listing_keys_for_products(db: AsyncSession, product_ids: Iterable[int]) -> list[str]:
+    """Ключи всех листингов, в которых могут появиться карточки продуктов."""
+    product_ids = list(product_ids)
+    categories = await db.execute(
+        select(ProductCategory.category_id).where(ProductCategory.product_id.in_(product_ids))
+    )
+    collections = await db.execute(
+        select(CollectionProduct.collection_id)
+        .where(CollectionProduct.product_id.in_(product_ids))
+        .distinct()
+    )
+    keys = [response_cache.PRODUCTS_KEY]
+    keys += await category_listing_keys(db, set(categories.scalars().all()))
+    keys += [response_cache.collection_key(cid) for cid in collections.scalars().all()]
+    return keys
+
+# Заказы, которые не учитываются в популярности
+_UNSOLD_ORDER_STATUSES = (OrderStatus.CANCELLED, OrderStatus.PAYMENT_FAILED, OrderStatus.REFUNDED)
+
+async def get_sales_for_colors(db: AsyncSession, color_ids: List[int]) -> dict[int, int]:
+    """Продано единиц по цветам (без отменённых, неоплатившихся и возвращённых заказов)"""
+    if not color_ids:
+        return {}
+    result = await db.execute(
+        select(ProductSize.product_color_id, func.sum(OrderProduct.quantity))
+        .join(OrderProduct, OrderProduct.product_size_id == ProductSize.id)
+        .join(Order, Order.id == OrderProduct.order_id)
+        .where(
+            ProductSize.product_color_id.in_(color_ids),
+            # Старые заказы хранят статус в верхнем регистре — сравниваем как миграция 0013
+            func.lower(Order.status).not_in(_UNSOLD_ORDER_STATUSES),
+        )
+        .group_by(ProductSize.product_color_id)
+    )
+    return {color_id: int(sold or 0) for color_id, sold in result.all()}
+
+async def refresh_product_cards(
+    db: AsyncSession,
+    product_ids: Iterable[int] = (),
+    *,
+    color_ids: Iterable[int] = (),
+) -> None:
+    """Пересобрать карточки витрины для продуктов (или продуктов указанных цветов).
+
+    Вызывается из write-путей до commit, поэтому карточки меняются в той же транзакции.
+    """
+    product_ids = {pid for pid in product_ids if pid is not None}
+    color_ids = {cid for cid in color_ids if cid is not None}
+    await db.flush()
+    if color_ids:
+        result = await db.execute(
+            select(ProductColor.product_id).where(ProductColor.id.in_(color_ids))
+        )
+        product_ids.update(result.scalars().all())
+    if not product_ids:
+        return
+
+    products_result = await db.execute(select(Product).where(Product.id.in_(product_ids)))
+    products_map = {p.id: p for p in products_result.scalars().all()}
+    colors_result = await db.execute(
+        select(ProductColor).where(ProductColor.product_id.in_(products_map.keys()))
+    )
+    colors = colors_result.scalars().all()
+
+    all_color_ids = [c.id for c in colors]
+    sizes_map = await get_sizes_for_products(db, all_color_ids)
+    images_map = await get_images_for_products(db, all_color_ids)
+    main_categories_map = await get_main_categories_for_products(db, list(products_map.keys()))
+    sections_map = await get_sections_for_products(db, list(products_map.keys()))
+    sales_map = await get_sales_for_colors(db, all_color_ids)
+
+    old_result = await db.execute(
+        select(ProductCard.color_id, ProductCard.status, ProductCard.sort_order)
+        .where(ProductCard.product_id.in_(product_ids))
+    )
+    old_positions = {row.color_id: (row.status, row.sort_order) for row in old_result}
+
+    await db.execute(
+        delete(ProductCard)
+        .where(ProductCard.product_id.in_(product_ids))
+        .execution_options(synchronize_session=False)
+    )
+
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    rows = []
+    for color in colors:
+        product = products_map[color.product_id]
+        card = build_product_public(
+            product,
+            color,
+            sizes=sizes_map.get(color.id, []),
+            images=images_map.get(color.id, []),
+            main_category=main_categories_map.get(product.id),
+            sections=sections_map.get(product.id, []),
+        )
+        data = card.model_dump(mode="json")
+        rows.append({
+            "color_id": color.id,
+            "product_id": product.id,
+            "slug": color.slug,
+            "status": card.status.value,
+            "sort_order": product.sort_order or 0,
+            "created_at": color.created_at,
+            "price": unit_price(product, color),
+            "label": color.label,
+            "hex": color.hex,
+            "popularity": sales_map.get(color.id, 0),
+            "search_text": "\n".join(filter(None, [color.title, color.slug, product.description])),
+            "data": data,
+            "card": build_card_view(data),
+            "updated_at": now,
+        })
+    if rows:
+        await db.execute(insert(ProductCard), rows)
+
+    # Изменения внутри карточки сбрасывают только ответы с этим продуктом;
+    # новые или удалённые карточки, смена статуса или позиции затрагивают и остальные листинги
+    response_cache.mark_stale(
+        response_cache.PRODUCT_FILTERS_KEY, *(response_cache.product_key(pid) for pid in product_ids)
+    )
+    new_positions = {row["color_id"]: (row["status"], row["sort_order"]) for row in rows}
+    if old_positions.keys() - new_positions.keys() or any(
+        old_positions.get(color_id) != position for color_id, position in new_positions.items()
+    ):
+        response_cache.mark_stale(*await _listing_keys_for_products(db, product_ids))
+
+async def rebuild_product_cards(db: AsyncSession, batch_size: int = 500) -> int:
+    """Пересобрать все карточки витрины (заполнение после миграции)."""
+    result = await db.execute(select(Product.id).order_by(Product.id))
+    product_ids = result.scalars().all()
+    await db.execute(delete(ProductCard).execution_options(synchronize_session=False))
+    for start in range(0, len(product_ids), batch_size):
+        await refresh_product_cards(db, product_ids[start:start + batch_size])
+    await db.commit()
+    return len(product_ids)
@@ -1,10 +1,10 @@
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
-from src.models.promocode import PromoCode, DiscountType
+from src.models.promocode import PromoCode
 from src.schemas.promocode import PromoCodeCreate, PromoCodeUpdate, PromoCodeValidateResponse
+from src.services.pricing import promo_discount, promo_rejection
 from typing import List, Optional
 from decimal import Decimal
-from datetime import datetime, timezone
 import logging
 
 logger = logging.getLogger(__name__)
@@ -67,22 +67,11 @@ async def delete_promo_code(db: AsyncSession, promo_id: int) -> bool:
 async def validate_promo_code(db: AsyncSession, code: str, order_amount: Decimal) -> PromoCodeValidateResponse:
     promo = await get_promo_code_by_code(db, code)
 
-    if not promo:
-        return PromoCodeValidateResponse(valid=False, message="Промокод не найден")
-
-    if not promo.is_active:
-        return PromoCodeValidateResponse(valid=False, message="Промокод неактивен")
-
-    if promo.expires_at and promo.expires_at < datetime.now(timezone.utc).replace(tzinfo=None):
-        return PromoCodeValidateResponse(valid=False, message="Срок действия промокода истек")
-
-    if promo.max_uses and promo.used_count >= promo.max_uses:
-        return PromoCodeValidateResponse(valid=False, message="Промокод исчерпан")
+    rejection = promo_rejection(promo)
+    if rejection:
+        return PromoCodeValidateResponse(valid=False, message=rejection)
 
-    if promo.discount_type == DiscountType.PERCENTAGE:
-        discount_amount = (order_amount * promo.discount_value / Decimal("100")).quantize(Decimal("0.01"))
-    else:
-        discount_amount = min(promo.discount_value, order_amount)
+    discount_amount = promo_discount(promo, order_amount)
 
     return PromoCodeValidateResponse(
         valid=True,
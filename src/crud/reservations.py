@@ -0,0 +1,161 @@
+"""Резервы остатков неоплаченных заказов.
+
+Остаток списывается при создании заказа (decrement_stock) и удерживается до reserved_until.
+Оплата подтверждает резерв, неуспешная оплата или истечение срока возвращают остаток.
+Функции вызываются из write-путей до commit, кроме release_expired_reservations.
+"""
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Iterable, Optional
+
+from sqlalchemy import func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.config import settings
+from src.crud.product import refresh_product_cards
+from src.models.orders import Order, OrderProduct, OrderStatus, ReservationStatus
+from src.models.product import ProductSize
+from src.services.payment_events import publish_payment_status
+
+logger = logging.getLogger(__name__)
+
+# Статусы, при которых оплаченный или неоплаченный заказ больше не держит товар
+RELEASING_STATUSES = {OrderStatus.CANCELLED, OrderStatus.PAYMENT_FAILED}
+
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def hold_reservation(order: Order, now: Optional[datetime] = None) -> None:
+    """Отметить, что остаток заказа списан под резерв на STOCK_RESERVATION_MINUTES."""
+    order.reservation_status = ReservationStatus.HELD.value
+    order.reserved_until = (now or _utcnow()) + timedelta(minutes=settings.STOCK_RESERVATION_MINUTES)
+
+
+async def _order_quantities(db: AsyncSession, order_ids: Iterable[int]) -> dict[int, int]:
+    result = await db.execute(
+        select(OrderProduct.product_size_id, func.sum(OrderProduct.quantity))
+        .where(OrderProduct.order_id.in_(list(order_ids)))
+        .group_by(OrderProduct.product_size_id)
+    )
+    return {size_id: int(quantity) for size_id, quantity in result.all()}
+
+
+async def _order_color_ids(db: AsyncSession, order_ids: list[int]) -> list[int]:
+    result = await db.execute(
+        select(ProductSize.product_color_id)
+        .join(OrderProduct, OrderProduct.product_size_id == ProductSize.id)
+        .where(OrderProduct.order_id.in_(order_ids))
+        .distinct()
+    )
+    return result.scalars().all()
+
+
+async def _restock(db: AsyncSession, order_ids: list[int]) -> None:
+    """Вернуть остатки строк заказов; размеры обходятся по возрастанию ID, как при списании."""
+    quantities = await _order_quantities(db, order_ids)
+    for size_id in sorted(quantities):
+        await db.execute(
+            update(ProductSize)
+            .where(ProductSize.id == size_id)
+            .values(quantity=ProductSize.quantity + quantities[size_id])
+            .execution_options(synchronize_session="fetch")
+        )
+    await refresh_product_cards(db, color_ids=await _order_color_ids(db, order_ids))
+
+
+async def release_reservation(db: AsyncSession, order: Order) -> bool:
+    """Вернуть остаток удерживаемого резерва; False, если резерва нет."""
+    if order.reservation_status != ReservationStatus.HELD.value:
+        return False
+    await _restock(db, [order.id])
+    order.reservation_status = ReservationStatus.RELEASED.value
+    order.reserved_until = None
+    logger.info(f"Order {order.id}: stock reservation released")
+    return True
+
+
+async def confirm_reservation(db: AsyncSession, order: Order) -> None:
+    """
+    Оплата подтверждает резерв.
+
+    Если резерв уже истёк и остаток вернулся на витрину, товар списывается заново; нехватка
+    не отменяет оплату и только логируется — такой заказ нужно разобрать вручную.
+    """
+    if order.reservation_status == ReservationStatus.RELEASED.value:
+        quantities = await _order_quantities(db, [order.id])
+        for size_id in sorted(quantities):
+            result = await db.execute(
+                update(ProductSize)
+                .where(ProductSize.id == size_id, ProductSize.quantity >= quantities[size_id])
+                .values(quantity=ProductSize.quantity - quantities[size_id])
+                .returning(ProductSize.id)
+                .execution_options(synchronize_session="fetch")
+            )
+            if result.scalar_one_or_none() is None:
+                logger.warning(
+                    f"Order {order.id} paid after its reservation expired: "
+                    f"product size {size_id} is short of {quantities[size_id]}"
+                )
+        await refresh_product_cards(db, color_ids=await _order_color_ids(db, [order.id]))
+    if order.reservation_status is not None:
+        order.reservation_status = ReservationStatus.CONFIRMED.value
+        order.reserved_until = None
+
+
+async def set_order_payment_status(db: AsyncSession, order: Order, new_status: OrderStatus) -> None:
+    """Сменить статус заказа и привести в соответствие его резерв остатков."""
+    # Состояние резерва перечитывается под блокировкой строки: воркер мог успеть его освободить
+    await db.refresh(order, attribute_names=["reservation_status", "reserved_until"], with_for_update=True)
+    if order.status != new_status:
+        await publish_payment_status(db, order.id, new_status)
+    order.status = new_status
+    if new_status == OrderStatus.PAID:
+        await confirm_reservation(db, order)
+    elif new_status in RELEASING_STATUSES:
+        await release_reservation(db, order)
+
+
+async def release_expired_reservations(
+    db: AsyncSession,
+    *,
+    batch_size: Optional[int] = None,
+    now: Optional[datetime] = None,
+) -> int:
+    """
+    Отменить неоплаченные заказы с истёкшим резервом и вернуть их остатки.
+
+    Заказы обрабатываются пачками по индексу (reservation_status, reserved_until), каждая
+    пачка — отдельная транзакция; на Postgres строки, занятые параллельным воркером
+    или вебхуком, пропускаются (SKIP LOCKED). Возвращает число отменённых заказов.
+    """
+    batch_size = batch_size or settings.STOCK_RESERVATION_BATCH_SIZE
+    now = now or _utcnow()
+    released = 0
+    while True:
+        result = await db.execute(
+            select(Order)
+            .where(
+                Order.reservation_status == ReservationStatus.HELD.value,
+                Order.reserved_until < now,
+                Order.status == OrderStatus.NOT_PAID,
+            )
+            .order_by(Order.reserved_until)
+            .limit(batch_size)
+            .with_for_update(skip_locked=True)
+        )
+        orders = result.scalars().all()
+        if not orders:
+            return released
+        await _restock(db, [order.id for order in orders])
+        for order in orders:
+            order.status = OrderStatus.CANCELLED
+            await publish_payment_status(db, order.id, OrderStatus.CANCELLED)
+            order.reservation_status = ReservationStatus.RELEASED.value
+            order.reserved_until = None
+        await db.commit()
+        released += len(orders)
+        logger.info(f"Released {len(orders)} expired stock reservations")
+        if len(orders) < batch_size:
+            return released
@@ -1,6 +1,7 @@
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 from src.models.site_settings import SiteSetting
+from src.services import response_cache
 from typing import Optional
 
 async def get_setting(db: AsyncSession, key: str) -> Optional[SiteSetting]:
@@ -15,6 +16,7 @@ async def set_setting(db: AsyncSession, key: str, value: str) -> SiteSetting:
         setting = SiteSetting(key=key, value=value)
         db.add(setting)
     await db.flush()
+    response_cache.mark_stale(response_cache.setting_key(key))
     await db.commit()
     await db.refresh(setting)
     return setting
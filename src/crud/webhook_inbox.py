@@ -0,0 +1,163 @@
+"""Очередь входящих вебхуков (таблица webhook_inbox).
+
+События одного заказа (order_key) обрабатываются строго по порядку поступления: событие
+берётся в работу, только когда все более ранние события того же заказа завершены или
+признаны мёртвыми.
+"""
+from datetime import datetime, timedelta, timezone
+from typing import Iterable, Optional
+
+from sqlalchemy import and_, delete, exists, or_, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import aliased
+
+from src.config import settings
+from src.models.webhooks import WebhookEvent
+
+# Пауза перед повтором не растёт дольше часа
+MAX_RETRY_DELAY = timedelta(hours=1)
+
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+async def store_webhook_event(db: AsyncSession, provider: str, dedup_key: str, order_key: str, body: str) -> bool:
+    """Сохранить событие; False — такое событие уже было получено (повтор провайдера)."""
+    db.add(WebhookEvent(
+        provider=provider,
+        dedup_key=dedup_key[:200],
+        order_key=order_key[:100],
+        body=body,
+        state=WebhookEvent.PENDING,
+        attempts=0,
+        next_attempt_at=_utcnow(),
+    ))
+    try:
+        await db.commit()
+        return True
+    except IntegrityError:
+        await db.rollback()
+        return False
+
+
+async def claim_webhook_events(
+    db: AsyncSession,
+    *,
+    limit: Optional[int] = None,
+    now: Optional[datetime] = None,
+) -> list[WebhookEvent]:
+    """
+    Взять в работу готовые события — не больше одного на заказ — и увеличить их счётчик попыток.
+
+    Готово событие в статусе pending, чей повтор уже наступил, или брошенное в processing
+    дольше WEBHOOK_LOCK_SECONDS. На Postgres строки, занятые другим воркером, пропускаются.
+    """
+    limit = limit or settings.WEBHOOK_BATCH_SIZE
+    now = now or _utcnow()
+    earlier = aliased(WebhookEvent)
+    unfinished = (WebhookEvent.PENDING, WebhookEvent.PROCESSING)
+    result = await db.execute(
+        select(WebhookEvent)
+        .where(
+            or_(
+                and_(WebhookEvent.state == WebhookEvent.PENDING, WebhookEvent.next_attempt_at <= now),
+                and_(WebhookEvent.state == WebhookEvent.PROCESSING, WebhookEvent.locked_until < now),
+            ),
+            ~exists().where(
+                earlier.order_key == WebhookEvent.order_key,
+                earlier.id < WebhookEvent.id,
+                earlier.state.in_(unfinished),
+            ),
+        )
+        .order_by(WebhookEvent.id)
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+        .execution_options(populate_existing=True)
+    )
+    events = result.scalars().all()
+    for event in events:
+        event.state = WebhookEvent.PROCESSING
+        event.locked_until = now + timedelta(seconds=settings.WEBHOOK_LOCK_SECONDS)
+        event.attempts += 1
+    await db.commit()
+    return events
+
+
+async def complete_webhook_event(db: AsyncSession, event_id: int) -> None:
+    """Отметить событие обработанным; вызывается до commit вместе с изменениями обработчика."""
+    await db.execute(
+        update(WebhookEvent)
+        .where(WebhookEvent.id == event_id)
+        .values(state=WebhookEvent.DONE, processed_at=_utcnow(), locked_until=None, last_error=None)
+    )
+
+
+async def fail_webhook_event(db: AsyncSession, event: WebhookEvent, error: str) -> str:
+    """Запланировать повтор с удвоением паузы или, если попытки исчерпаны, признать событие мёртвым."""
+    now = _utcnow()
+    if event.attempts >= settings.WEBHOOK_MAX_ATTEMPTS:
+        values = {"state": WebhookEvent.DEAD, "processed_at": now}
+    else:
+        delay = min(
+            timedelta(seconds=settings.WEBHOOK_RETRY_BASE_SECONDS * 2 ** (event.attempts - 1)),
+            MAX_RETRY_DELAY,
+        )
+        values = {"state": WebhookEvent.PENDING, "next_attempt_at": now + delay}
+    await db.execute(
+        update(WebhookEvent)
+        .where(WebhookEvent.id == event.id)
+        .values(locked_until=None, last_error=error[:2000], **values)
+    )
+    await db.commit()
+    return values["state"]
+
+
+async def replay_webhook_events(
+    db: AsyncSession,
+    *,
+    ids: Optional[Iterable[int]] = None,
+    provider: Optional[str] = None,
+    states: Iterable[str] = (WebhookEvent.DEAD,),
+    received_after: Optional[datetime] = None,
+) -> int:
+    """
+    Вернуть события в очередь с обнулённым счётчиком попыток.
+
+    По списку ids возвращаются события в любом статусе (в том числе уже обработанные),
+    иначе — события в статусах states, при необходимости с фильтром по провайдеру и дате.
+    """
+    query = update(WebhookEvent)
+    if ids is not None:
+        query = query.where(WebhookEvent.id.in_(list(ids)))
+    else:
+        query = query.where(WebhookEvent.state.in_(list(states)))
+        if provider:
+            query = query.where(WebhookEvent.provider == provider)
+        if received_after:
+            query = query.where(WebhookEvent.received_at >= received_after)
+    result = await db.execute(
+        query.values(
+            state=WebhookEvent.PENDING,
+            attempts=0,
+            next_attempt_at=_utcnow(),
+            locked_until=None,
+            last_error=None,
+            processed_at=None,
+        ).execution_options(synchronize_session=False)
+    )
+    await db.commit()
+    return result.rowcount
+
+
+async def delete_webhook_events_before(db: AsyncSession, processed_before: datetime) -> int:
+    """Удалить обработанные (done) события старше processed_before; мёртвые остаются до replay."""
+    result = await db.execute(
+        delete(WebhookEvent).where(
+            WebhookEvent.state == WebhookEvent.DONE,
+            WebhookEvent.processed_at < processed_before,
+        )
+    )
+    await db.commit()
+    return result.rowcount
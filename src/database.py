@@ -1,3 +1,4 @@
+import json
 import logging
 
 from sqlalchemy import text
@@ -11,18 +12,22 @@ logger = logging.getLogger(__name__)
 from src.models.base import Base
 # Импортируем все модели для создания таблиц
 from src.models.user import User
-from src.models.product import Product
-from src.models.category import Category, ProductCategory
+from src.models.product import Product, ProductCard
+from src.models.category import Category, ProductCategory, CategoryClosure
 from src.models.collection import Collection, CollectionImage, CollectionProduct
 from src.models.orders import Order, OrderProduct
 from src.models.promocode import PromoCode
 from src.models.site_settings import SiteSetting
+from src.models.idempotency import IdempotencyKey
+from src.models.webhooks import WebhookEvent
 
 SQLALCHEMY_DATABASE_URL = settings.get_async_database_url()
 
 engine_kwargs = {
     "echo": False,
     "future": True,
+    # JSON-колонки (карточки витрины) хранят кириллицу как есть: текст уходит в ответ без перекодирования
+    "json_serializer": lambda value: json.dumps(value, ensure_ascii=False, separators=(",", ":")),
 }
 
 if not SQLALCHEMY_DATABASE_URL.startswith("sqlite"):
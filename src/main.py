@@ -19,6 +19,15 @@ from src.routers.payments import router as payments_router
 from src.routers.site_settings import router as settings_router
 from src.routers.webhooks import router as webhooks_router
 from src.routers.promocode import router as promocode_router
+from src.routers.cart import router as cart_router
+from src.services import http_cache
+from src.services.response_cache import ResponseCacheMiddleware
+from src.services.stock_reservations import run_reservation_sweeper
+from src.services.idempotency import run_idempotency_key_cleanup
+from src.services.http_clients import close_http_clients, start_http_clients
+from src.services.payment_reconciler import run_payment_reconciler
+from src.services.payment_events import start_payment_events, stop_payment_events
+from src.services.webhook_inbox import run_webhook_inbox_cleanup, run_webhook_worker
 
 # Настройка логирования
 logging.basicConfig(
@@ -38,6 +47,31 @@ async def _ensure_columns():
     migrations = [
         "ALTER TABLE products ADD COLUMN IF NOT EXISTS size_chart TEXT",
         "ALTER TABLE orders ADD COLUMN IF NOT EXISTS payment_provider VARCHAR(20)",
+        *(
+            f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS updated_at TIMESTAMP DEFAULT now()"
+            for table in ("products", "product_colors", "product_sizes", "product_images", "categories", "collections")
+        ),
+        "ALTER TABLE product_cards ADD COLUMN IF NOT EXISTS label VARCHAR(100)",
+        "ALTER TABLE product_cards ADD COLUMN IF NOT EXISTS hex VARCHAR(7)",
+        "ALTER TABLE product_cards ADD COLUMN IF NOT EXISTS popularity INTEGER NOT NULL DEFAULT 0",
+        "ALTER TABLE product_cards ADD COLUMN IF NOT EXISTS card JSON",
+        *(
+            f"ALTER TABLE order_products ADD COLUMN IF NOT EXISTS {column}"
+            for column in (
+                "product_id INTEGER", "product_color_id INTEGER", "slug VARCHAR(100)", "title VARCHAR(200)",
+                "label VARCHAR(100)", "hex VARCHAR(7)", "size VARCHAR(10)", "price NUMERIC(10, 2)",
+                "discount_price NUMERIC(10, 2)", "unit_price NUMERIC(10, 2)", "currency VARCHAR(3)",
+                "weight DOUBLE PRECISION",
+            )
+        ),
+        "ALTER TABLE orders ADD COLUMN IF NOT EXISTS reservation_status VARCHAR(20)",
+        "ALTER TABLE orders ADD COLUMN IF NOT EXISTS reserved_until TIMESTAMP",
+        "ALTER TABLE orders ADD COLUMN IF NOT EXISTS payment_url VARCHAR(500)",
+        "ALTER TABLE orders ADD COLUMN IF NOT EXISTS payment_expires_at TIMESTAMP",
+        "ALTER TABLE orders ADD COLUMN IF NOT EXISTS payment_amount NUMERIC(10, 2)",
+        "ALTER TABLE orders ADD COLUMN IF NOT EXISTS payment_checked_at TIMESTAMP",
+        "CREATE INDEX IF NOT EXISTS ix_orders_reservation_expiry ON orders (reservation_status, reserved_until)",
+        "CREATE INDEX IF NOT EXISTS ix_orders_payment_check ON orders (status, payment_checked_at)",
     ]
     try:
         async with engine.begin() as conn:
@@ -48,6 +82,60 @@ async def _ensure_columns():
         logger.warning(f"Column auto-sync skipped: {e}")
 
 
+async def _ensure_category_closure():
+    """Fill the category closure table for databases created before it existed."""
+    from sqlalchemy import func, select
+    from src.database import AsyncSessionLocal
+    from src.models.category import Category, CategoryClosure
+    from src.crud.category import rebuild_category_closure
+    try:
+        async with AsyncSessionLocal() as session:
+            categories = await session.scalar(select(func.count(Category.id)))
+            self_links = await session.scalar(
+                select(func.count()).select_from(CategoryClosure).where(CategoryClosure.depth == 0)
+            )
+            if categories != self_links:
+                await rebuild_category_closure(session)
+                logger.info("Category closure table rebuilt")
+    except Exception as e:
+        logger.warning(f"Category closure sync skipped: {e}")
+
+
+async def _ensure_product_cards():
+    """Build storefront product cards for databases created before the read model existed."""
+    from sqlalchemy import func, select
+    from src.database import AsyncSessionLocal
+    from src.models.product import ProductCard, ProductColor
+    from src.crud.product import rebuild_product_cards
+    try:
+        async with AsyncSessionLocal() as session:
+            colors = await session.scalar(select(func.count(ProductColor.id)))
+            cards = await session.scalar(select(func.count(ProductCard.color_id)))
+            # Карточки без цвета или лёгкой проекции собраны до появления этих колонок
+            stale = await session.scalar(
+                select(func.count(ProductCard.color_id))
+                .where(ProductCard.label.is_(None) | ProductCard.card.is_(None))
+            )
+            if colors != cards or stale:
+                await rebuild_product_cards(session)
+                logger.info("Product cards rebuilt")
+    except Exception as e:
+        logger.warning(f"Product cards sync skipped: {e}")
+
+
+async def _ensure_order_line_snapshots():
+    """Fill order line snapshots for orders created before the snapshot columns existed."""
+    from src.database import AsyncSessionLocal
+    from src.crud.orders import backfill_order_line_snapshots
+    try:
+        async with AsyncSessionLocal() as session:
+            filled = await backfill_order_line_snapshots(session)
+            if filled:
+                logger.info(f"Order line snapshots filled: {filled}")
+    except Exception as e:
+        logger.warning(f"Order line snapshots sync skipped: {e}")
+
+
 @asynccontextmanager
 async def lifespan(_: FastAPI):
     await asyncio.sleep(2)
@@ -64,14 +152,39 @@ async def lifespan(_: FastAPI):
             raise
 
     await _ensure_columns()
+    await _ensure_category_closure()
+    await _ensure_product_cards()
+    await _ensure_order_line_snapshots()
 
     if await check_db_connection():
         logger.info("Database connection is healthy")
     else:
         logger.error("Database connection failed")
 
+    # Пулы keep-alive соединений к TBank, PayPal и CDEK живут всё время работы приложения
+    await start_http_clients()
+    # LISTEN на канал статусов оплаты (PAYMENT_EVENTS_BACKEND=postgres)
+    await start_payment_events()
+
+    background_tasks = [
+        # Возврат остатков неоплаченных заказов с истёкшим резервом
+        asyncio.create_task(run_reservation_sweeper()),
+        asyncio.create_task(run_idempotency_key_cleanup()),
+        # Сверка неоплаченных заказов с провайдерами вместо запросов из /payments/status
+        asyncio.create_task(run_payment_reconciler()),
+        # Разбор сохранённых вебхуков TBank и CDEK
+        asyncio.create_task(run_webhook_worker()),
+        asyncio.create_task(run_webhook_inbox_cleanup()),
+    ]
+
     yield
 
+    for task in background_tasks:
+        task.cancel()
+    await asyncio.gather(*background_tasks, return_exceptions=True)
+    await stop_payment_events()
+    await close_http_clients()
+
 
 app = FastAPI(
     title="Psih Shop API",
@@ -82,6 +195,10 @@ app = FastAPI(
     lifespan=lifespan,
 )
 
+# Серверный кэш публичных GET-ответов каталога (инвалидация по Surrogate-Key).
+# Регистрируется до CORS, чтобы CORS-заголовки не попадали в сохранённые ответы
+app.add_middleware(ResponseCacheMiddleware)
+
 # Настройка CORS
 app.add_middleware(
     CORSMiddleware,
@@ -89,14 +206,15 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag", "Last-Modified", "X-Next-Cursor", "X-Total-Count"],
 )
 
-# Middleware для предотвращения кэширования API ответов
+# Политика кэширования задаётся роутом (Cache-Control в ответе); по умолчанию API не кэшируется
 @app.middleware("http")
-async def add_no_cache_header(request: Request, call_next):
+async def apply_cache_policy(request: Request, call_next):
     response = await call_next(request)
-    if request.url.path.startswith("/api"):
-        response.headers["Cache-Control"] = "no-store, no-cache, must-revalidate, max-age=0"
+    if request.url.path.startswith("/api") and "cache-control" not in response.headers:
+        response.headers["Cache-Control"] = http_cache.NO_STORE
         response.headers["Pragma"] = "no-cache"
         response.headers["Expires"] = "0"
     return response
@@ -115,6 +233,7 @@ main_router.include_router(payments_router, tags=["Payments"])
 main_router.include_router(settings_router, tags=["Settings"])
 main_router.include_router(webhooks_router, tags=["Webhooks"])
 main_router.include_router(promocode_router, tags=["PromoCodes"])
+main_router.include_router(cart_router, tags=["Cart"])
 
 app.include_router(main_router)
 
@@ -13,6 +13,7 @@ class Category(Base):
     sort_order = Column(Integer, default=0)
     is_active = Column(Boolean, default=True)
     created_at = Column(DateTime, server_default=func.now())
+    updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
 
 
 class ProductCategory(Base):
@@ -23,3 +24,10 @@ class ProductCategory(Base):
     sort_order = Column(Integer, default=0)
 
 
+class CategoryClosure(Base):
+    """Пары предок/потомок дерева категорий (включая саму категорию с depth=0)."""
+    __tablename__ = "category_closure"
+
+    ancestor_id = Column(Integer, ForeignKey("categories.id", ondelete="CASCADE"), primary_key=True)
+    descendant_id = Column(Integer, ForeignKey("categories.id", ondelete="CASCADE"), primary_key=True, index=True)
+    depth = Column(Integer, nullable=False, default=0)
@@ -26,6 +26,7 @@ class Collection(Base):
     is_featured = Column(Boolean, default=False)
     category = Column(Enum(CollectionCategory), default=CollectionCategory.UNISEX)
     created_at = Column(DateTime, server_default=func.now())
+    updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
 
 
 class CollectionImage(Base):
@@ -0,0 +1,24 @@
+from sqlalchemy import Column, String, Text, Integer, DateTime, UniqueConstraint, func
+from src.models.base import Base
+
+
+class IdempotencyKey(Base):
+    """Ответ на запрос с заголовком Idempotency-Key: повтор получает его без повторной работы."""
+    __tablename__ = "idempotency_keys"
+
+    IN_PROGRESS = "in_progress"
+    COMPLETED = "completed"
+
+    id = Column(Integer, primary_key=True, index=True, autoincrement=True)
+    scope = Column(String(50), nullable=False)  # операция: create_order, payment_init
+    key = Column(String(255), nullable=False)
+    request_hash = Column(String(64), nullable=False)  # sha256 тела запроса и пользователя
+    state = Column(String(20), nullable=False, default=IN_PROGRESS)
+    response_status = Column(Integer, nullable=True)
+    response_body = Column(Text, nullable=True)  # JSON
+    created_at = Column(DateTime, server_default=func.now(), index=True)
+    completed_at = Column(DateTime, nullable=True)
+
+    __table_args__ = (
+        UniqueConstraint("scope", "key", name="uq_idempotency_keys_scope_key"),
+    )
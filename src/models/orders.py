@@ -1,4 +1,5 @@
-from sqlalchemy import Column, Integer, String, Numeric, DateTime, func, Enum, ForeignKey, CheckConstraint, TypeDecorator
+from sqlalchemy import Column, Integer, String, Numeric, Float, DateTime, func, Enum, ForeignKey, CheckConstraint, Index, TypeDecorator
+from sqlalchemy.dialects import sqlite
 from sqlalchemy.orm import relationship
 from src.models.base import Base
 import enum
@@ -34,6 +35,11 @@ class OrderStatusType(TypeDecorator):
         except ValueError:
             return value
 
+class ReservationStatus(str, enum.Enum):
+    HELD = "held"  # остаток списан под неоплаченный заказ до reserved_until
+    CONFIRMED = "confirmed"  # заказ оплачен, остаток продан
+    RELEASED = "released"  # резерв истёк или оплата не прошла, остаток возвращён
+
 class DeliveryMethod(str, enum.Enum):
     CDEK = "cdek"
 
@@ -68,16 +74,36 @@ class Order(Base):
     cdek_number = Column(String(50), nullable=True)
     payment_id = Column(String(50), nullable=True, index=True)
     payment_provider = Column(String(20), nullable=True)
+    # Живая платёжная сессия: повторная инициализация отдаёт её без вызова провайдера
+    payment_url = Column(String(500), nullable=True)
+    payment_expires_at = Column(DateTime, nullable=True)
+    payment_amount = Column(Numeric(10, 2), nullable=True)
+    # Когда статус оплаты последний раз сверялся с провайдером (фоновая сверка и force refresh)
+    payment_checked_at = Column(DateTime, nullable=True)
     access_token = Column(String(64), nullable=False, unique=True, index=True)
     promo_code_id = Column(Integer, ForeignKey("promo_codes.id", ondelete="SET NULL"), nullable=True)
     discount_amount = Column(Numeric(10, 2), default=0)
     comment = Column(String(500), nullable=True)
     user_id = Column(Integer, ForeignKey("users.id", ondelete="SET NULL"), nullable=True, index=True)
     custom_status_id = Column(Integer, ForeignKey("custom_statuses.id", ondelete="SET NULL"), nullable=True, index=True)
-    created_at = Column(DateTime, server_default=func.now())
+    # Резерв остатков неоплаченного заказа; у заказов до появления резервов — NULL
+    reservation_status = Column(String(20), nullable=True)
+    reserved_until = Column(DateTime, nullable=True)
+    # В SQLite CURRENT_TIMESTAMP хранится без микросекунд — сравнения курсора должны
+    # связывать параметр в том же формате, иначе равные created_at не совпадут
+    created_at = Column(
+        DateTime().with_variant(sqlite.DATETIME(truncate_microseconds=True), "sqlite"),
+        server_default=func.now(),
+    )
 
     __table_args__ = (
         CheckConstraint('total_price > 0', name='check_total_price_positive'),
+        # Keyset-пагинация админского списка: (created_at DESC, id DESC)
+        Index("ix_orders_created_at_id", "created_at", "id"),
+        # Поиск истёкших резервов фоновым воркером
+        Index("ix_orders_reservation_expiry", "reservation_status", "reserved_until"),
+        # Выбор неоплаченных заказов для сверки с провайдером
+        Index("ix_orders_payment_check", "status", "payment_checked_at"),
     )
 
     def __repr__(self):
@@ -91,6 +117,19 @@ class OrderProduct(Base):
     order_id = Column(Integer, ForeignKey("orders.id", ondelete="CASCADE"), nullable=False, index=True)
     product_size_id = Column(Integer, ForeignKey("product_sizes.id", ondelete="CASCADE"), nullable=False, index=True)
     quantity = Column(Integer, nullable=False, default=1)
+    # Снимок строки на момент заказа: правки каталога не меняют состав, цены и вес заказа
+    product_id = Column(Integer, nullable=True)
+    product_color_id = Column(Integer, nullable=True)
+    slug = Column(String(100), nullable=True)
+    title = Column(String(200), nullable=True)
+    label = Column(String(100), nullable=True)
+    hex = Column(String(7), nullable=True)
+    size = Column(String(10), nullable=True)
+    price = Column(Numeric(10, 2), nullable=True)  # цена цвета/продукта без скидки
+    discount_price = Column(Numeric(10, 2), nullable=True)
+    unit_price = Column(Numeric(10, 2), nullable=True)  # цена продажи за единицу
+    currency = Column(String(3), nullable=True)
+    weight = Column(Float, nullable=True)  # кг за единицу
 
     __table_args__ = (
         CheckConstraint('quantity > 0', name='check_order_product_quantity_positive'),
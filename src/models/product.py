@@ -1,4 +1,5 @@
-from sqlalchemy import Column, String, Text, Numeric, Boolean, DateTime, func, Enum, ForeignKey, Integer, CheckConstraint, Float
+from sqlalchemy import Column, String, Text, Numeric, Boolean, DateTime, func, Enum, ForeignKey, Integer, CheckConstraint, Float, JSON, Index
+from sqlalchemy import DDL, event
 from sqlalchemy.orm import declarative_base, relationship
 from src.models.base import Base
 import enum
@@ -26,6 +27,7 @@ class Product(Base):
     meta_returns = Column(String(100), nullable=True)
     size_chart = Column(Text, nullable=True)
     created_at = Column(DateTime, server_default=func.now())
+    updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
     sort_order = Column(Integer, default=0)
 
     sections = relationship("ProductSection", back_populates="product", cascade="all, delete-orphan", order_by="ProductSection.sort_order")
@@ -52,6 +54,7 @@ class ProductColor(Base):
     price = Column(Numeric(10, 2), nullable=True)
     discount_price = Column(Numeric(10, 2), nullable=True)
     created_at = Column(DateTime, server_default=func.now())
+    updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
 
 
 class ProductSize(Base):
@@ -63,9 +66,12 @@ class ProductSize(Base):
     quantity = Column(Integer, nullable=False, default=0)
     sort_order = Column(Integer, default=0)
     created_at = Column(DateTime, server_default=func.now())
+    updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
 
     __table_args__ = (
         CheckConstraint('quantity >= 0', name='check_product_size_quantity_non_negative'),
+        # Фильтр и фасет по доступным размерам цвета
+        Index("ix_product_sizes_color_quantity", product_color_id, size, quantity),
     )
 
 
@@ -77,6 +83,7 @@ class ProductImage(Base):
     file = Column(String(200), nullable=False)
     sort_order = Column(Integer, default=0)
     created_at = Column(DateTime, server_default=func.now())
+    updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
 
 
 class ProductSection(Base):
@@ -89,4 +96,87 @@ class ProductSection(Base):
     sort_order = Column(Integer, default=0)
     created_at = Column(DateTime, server_default=func.now())
 
-    product = relationship("Product", back_populates="sections")
\ No newline at end of file
+    product = relationship("Product", back_populates="sections")
+
+
+class ProductCard(Base):
+    """Денормализованная карточка витрины: одна строка на ProductColor с готовым JSON ProductPublic."""
+    __tablename__ = "product_cards"
+
+    color_id = Column(Integer, ForeignKey("product_colors.id", ondelete="CASCADE"), primary_key=True)
+    product_id = Column(Integer, ForeignKey("products.id", ondelete="CASCADE"), nullable=False, index=True)
+    slug = Column(String(100), nullable=False, index=True)
+    status = Column(String(20), nullable=False, index=True)
+    sort_order = Column(Integer, default=0)
+    created_at = Column(DateTime, nullable=True)
+    price = Column(Numeric(10, 2), nullable=False)  # итоговая цена продажи с учётом цвета и скидки
+    label = Column(String(100), nullable=True, index=True)  # название цвета для фасетного фильтра
+    hex = Column(String(7), nullable=True)
+    popularity = Column(Integer, nullable=False, default=0)  # продано единиц в действующих заказах
+    search_text = Column(Text, nullable=False, default="")
+    data = Column(JSON, nullable=False)
+    card = Column(JSON, nullable=True)  # лёгкая проекция data для сетки (view=card)
+    updated_at = Column(DateTime, nullable=False)
+
+    __table_args__ = (
+        # Keyset-пагинация витрины: (sort_order ASC, created_at DESC, color_id DESC)
+        Index("ix_product_cards_listing", sort_order, created_at.desc(), color_id.desc()),
+        # Сортировки листинга категории
+        Index("ix_product_cards_newest", created_at, color_id),
+        Index("ix_product_cards_price", price, color_id),
+        Index("ix_product_cards_popularity", popularity, color_id),
+    )
+
+
+# Полнотекстовый поиск по карточкам. Postgres: генерируемый tsvector (название с весом A,
+# весь текст с весом B, конфигурации russian и english) + pg_trgm для опечаток.
+# SQLite (dev/тесты): внешняя FTS5-таблица, которую синхронизируют триггеры.
+# Те же выражения создаёт миграция 20261017_0011.
+PRODUCT_CARD_SEARCH_DDL = {
+    "postgresql": [
+        "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+        """
+        ALTER TABLE product_cards ADD COLUMN IF NOT EXISTS search_vector tsvector GENERATED ALWAYS AS (
+            setweight(to_tsvector('russian'::regconfig, split_part(search_text, E'\\n', 1)), 'A') ||
+            setweight(to_tsvector('english'::regconfig, split_part(search_text, E'\\n', 1)), 'A') ||
+            setweight(to_tsvector('russian'::regconfig, search_text), 'B') ||
+            setweight(to_tsvector('english'::regconfig, search_text), 'B')
+        ) STORED
+        """,
+        "CREATE INDEX IF NOT EXISTS ix_product_cards_search_vector ON product_cards USING gin (search_vector)",
+        "CREATE INDEX IF NOT EXISTS ix_product_cards_search_trgm ON product_cards USING gin (search_text gin_trgm_ops)",
+    ],
+    "sqlite": [
+        """
+        CREATE VIRTUAL TABLE IF NOT EXISTS product_cards_fts USING fts5(
+            search_text, content='product_cards', content_rowid='color_id',
+            tokenize='unicode61 remove_diacritics 2'
+        )
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS product_cards_fts_ai AFTER INSERT ON product_cards BEGIN
+            INSERT INTO product_cards_fts(rowid, search_text) VALUES (new.color_id, new.search_text);
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS product_cards_fts_ad AFTER DELETE ON product_cards BEGIN
+            INSERT INTO product_cards_fts(product_cards_fts, rowid, search_text) VALUES ('delete', old.color_id, old.search_text);
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS product_cards_fts_au AFTER UPDATE OF search_text ON product_cards BEGIN
+            INSERT INTO product_cards_fts(product_cards_fts, rowid, search_text) VALUES ('delete', old.color_id, old.search_text);
+            INSERT INTO product_cards_fts(rowid, search_text) VALUES (new.color_id, new.search_text);
+        END
+        """,
+    ],
+}
+
+for _dialect, _statements in PRODUCT_CARD_SEARCH_DDL.items():
+    for _statement in _statements:
+        event.listen(ProductCard.__table__, "after_create", DDL(_statement).execute_if(dialect=_dialect))
+event.listen(
+    ProductCard.__table__,
+    "before_drop",
+    DDL("DROP TABLE IF EXISTS product_cards_fts").execute_if(dialect="sqlite"),
+)
@@ -0,0 +1,31 @@
+from sqlalchemy import Column, String, Text, Integer, DateTime, Index, UniqueConstraint, func
+from src.models.base import Base
+
+
+class WebhookEvent(Base):
+    """Входящий вебхук провайдера: сохраняется до ответа провайдеру и обрабатывается воркером."""
+    __tablename__ = "webhook_inbox"
+
+    PENDING = "pending"
+    PROCESSING = "processing"
+    DONE = "done"
+    DEAD = "dead"  # попытки исчерпаны, нужен replay
+
+    id = Column(Integer, primary_key=True, index=True, autoincrement=True)
+    provider = Column(String(20), nullable=False)  # tbank, cdek
+    dedup_key = Column(String(200), nullable=False)  # PaymentId:Status, uuid:code
+    order_key = Column(String(100), nullable=False)  # события одного заказа обрабатываются по порядку
+    body = Column(Text, nullable=False)  # сырое тело запроса
+    state = Column(String(20), nullable=False, default=PENDING)
+    attempts = Column(Integer, nullable=False, default=0)
+    next_attempt_at = Column(DateTime, server_default=func.now())
+    locked_until = Column(DateTime, nullable=True)  # срок захвата воркером (state=processing)
+    last_error = Column(Text, nullable=True)
+    received_at = Column(DateTime, server_default=func.now())
+    processed_at = Column(DateTime, nullable=True)
+
+    __table_args__ = (
+        UniqueConstraint("provider", "dedup_key", name="uq_webhook_inbox_provider_dedup_key"),
+        Index("ix_webhook_inbox_state_next_attempt", "state", "next_attempt_at"),
+        Index("ix_webhook_inbox_order_key_id", "order_key", "id"),
+    )
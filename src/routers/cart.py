@@ -0,0 +1,42 @@
+from fastapi import APIRouter, Depends
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.database import get_db
+from src import crud
+from src.schemas.cart import CartQuoteLine, CartQuoteRequest, CartQuoteResponse
+
+router = APIRouter(prefix="/cart", tags=["Cart"])
+
+
+@router.post("/quote", response_model=CartQuoteResponse, summary="Рассчитать корзину")
+async def quote_cart(data: CartQuoteRequest, db: AsyncSession = Depends(get_db)):
+    """Цены строк, наличие, скидка по промокоду и итог по тем же правилам, что и при создании заказа."""
+    cart = await crud.quote_cart(db, data.items, data.promo_code)
+    lines = [
+        CartQuoteLine(
+            product_size_id=line.product_size.id,
+            product_color_id=line.color.id,
+            product_id=line.product.id,
+            slug=line.color.slug,
+            title=line.color.title,
+            size=line.product_size.size,
+            quantity=line.quantity,
+            unit_price=line.unit_price,
+            line_total=line.line_total,
+            available_quantity=line.product_size.quantity,
+            in_stock=line.in_stock,
+        )
+        for line in cart.lines
+    ]
+    return CartQuoteResponse(
+        lines=lines,
+        missing_size_ids=cart.missing_size_ids,
+        items_total=cart.items_total,
+        delivery_cost=cart.delivery_cost,
+        promo_code=data.promo_code,
+        promo_valid=cart.promo is not None if data.promo_code else None,
+        promo_message=cart.promo_message,
+        discount_amount=cart.discount_amount,
+        total=cart.total,
+        can_checkout=not cart.missing_size_ids and all(line.in_stock for line in cart.lines),
+    )
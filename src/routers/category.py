@@ -1,71 +1,67 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Body
+from fastapi import APIRouter, Depends, HTTPException, status, Body, Query, Request, Response
 from sqlalchemy.ext.asyncio import AsyncSession
-from typing import List
+from typing import List, Optional
 import logging
 
 from src.database import get_db
 from src.auth import get_current_user
 from src import crud
-from src.schemas.category import CategoryCreate
-from src.schemas.product import ProductPublic, ProductMeta
-from src.models.product import ProductStatus
-from src.models.category import Category
-from src.services.catalog import build_product_public
+from src.schemas.category import CategoryCreate, CategoryProductSort
+from src.schemas.product import ProductPublic, ProductView
+from src.services.catalog import card_json, parse_fields, uses_card_view
+from src.services.json_stream import stream_json_list
+from src.services import http_cache, response_cache
 
 router = APIRouter(prefix="/categories", tags=["Categories"])
 logger = logging.getLogger(__name__)
 
 
 @router.get("", summary="Дерево категорий")
-async def list_categories(db: AsyncSession = Depends(get_db)):
+async def list_categories(request: Request, response: Response, db: AsyncSession = Depends(get_db)):
+    total, last_modified = await crud.get_categories_version(db)
+    etag = http_cache.make_etag(total, last_modified)
+    headers = http_cache.validator_headers(etag, last_modified)
+    if http_cache.is_not_modified(request, etag, last_modified):
+        return http_cache.not_modified(headers)
+
     cats = await crud.get_all_categories(db)
+    response.headers.update({**headers, **response_cache.surrogate_key_header([response_cache.CATEGORIES_KEY])})
     return crud.build_tree(cats)
 
 
 @router.get("/{slug}", response_model=List[ProductPublic], summary="Продукты по категории")
-async def products_by_category(slug: str, db: AsyncSession = Depends(get_db)):
+async def products_by_category(
+    slug: str,
+    limit: int = Query(100, ge=1, le=1000, description="Количество записей для возврата"),
+    cursor: Optional[str] = Query(None, description="Курсор следующей страницы из заголовка X-Next-Cursor"),
+    sort: CategoryProductSort = Query(CategoryProductSort.MANUAL, description="Порядок: manual, newest, price_asc, price_desc, popularity"),
+    include_total: bool = Query(False, description="Вернуть общее количество в заголовке X-Total-Count"),
+    view: ProductView = Query(ProductView.FULL, description="card — лёгкая карточка для сетки, full — полный продукт"),
+    fields: Optional[str] = Query(None, description="Поля продукта через запятую, например id,title,price"),
+    db: AsyncSession = Depends(get_db),
+):
     try:
-        from sqlalchemy import select
-        from src.models.product import Product
-        
-        product_colors = await crud.get_products_by_category_slug(db, slug)
-        if not product_colors:
-            return []
-        
-        # Получаем связанные продукты
-        product_ids = list(set([pc.product_id for pc in product_colors]))
-        products_map = {}
-        if product_ids:
-            result = await db.execute(select(Product).where(Product.id.in_(product_ids)))
-            for p in result.scalars().all():
-                products_map[p.id] = p
-        
-        # Получаем размеры, изображения и секции  
-        color_ids = [pc.id for pc in product_colors]
-        sizes_map = await crud.get_sizes_for_products(db, color_ids)
-        images_map = await crud.get_images_for_products(db, color_ids)
-        main_categories_map = await crud.get_main_categories_for_products(db, product_ids)
-        sections_map = await crud.get_sections_for_products(db, product_ids)
-        
-        result: List[ProductPublic] = []
-        for pc in product_colors:
-            try:
-                product = products_map.get(pc.product_id)
-                if not product:
-                    continue
-                    
-                result.append(build_product_public(
-                    product,
-                    pc,
-                    sizes=sizes_map.get(pc.id, []),
-                    images=images_map.get(pc.id, []),
-                    main_category=main_categories_map.get(product.id),
-                    sections=sections_map.get(product.id, []),
-                ))
-            except Exception as e:
-                logger.error(f"Failed to serialize product for category={slug}, color_id={getattr(pc, 'id', None)}: {e}")
-                continue
-        return result
+        selected_fields = parse_fields(fields, view)
+        card_view = uses_card_view(view, selected_fields)
+        category = await crud.get_category_by_slug(db, slug)
+        page = await crud.get_products_by_category_slug(
+            db, slug, limit=limit, cursor=cursor, sort=sort, card_view=card_view
+        )
+        # Листинг несуществующего slug сбрасывается вместе с деревом, когда категорию создадут
+        cache_keys = [response_cache.category_key(category.id) if category else response_cache.CATEGORIES_KEY]
+        cache_keys += [response_cache.product_key(row.product_id) for row in page.items]
+        if sort in (CategoryProductSort.PRICE_ASC, CategoryProductSort.PRICE_DESC, CategoryProductSort.POPULARITY):
+            # Цена и продажи меняют порядок без смены позиции карточки
+            cache_keys.append(response_cache.PRODUCT_FILTERS_KEY)
+        # Тело остаётся списком продуктов, параметры пагинации передаются заголовками
+        headers = response_cache.surrogate_key_header(cache_keys)
+        if page.next_cursor:
+            headers["X-Next-Cursor"] = page.next_cursor
+        if include_total:
+            headers["X-Total-Count"] = str(await crud.get_products_by_category_count(db, slug))
+        return stream_json_list((card_json(row, selected_fields) for row in page.items), headers=headers)
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error getting products for category {slug}: {e}")
         raise HTTPException(
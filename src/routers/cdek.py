@@ -4,7 +4,6 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 from typing import List, Dict, Any, Optional
 import logging
-import httpx
 
 from src.cdek import get_cdek_client, CDEKError
 from src.schemas.cdek import CDEKCity, CDEKOffice, CDEKOfficeList, CDEKOrderUpdate
@@ -16,6 +15,7 @@ from src import crud
 from pydantic import ValidationError, BaseModel, Field
 from src.services.errors import bad_gateway, internal_server_error, not_found
 from src.services.order_access import ensure_admin, ensure_order_access
+from src.services.http_clients import CDEK, get_http_client
 
 logger = logging.getLogger(__name__)
 
@@ -241,22 +241,22 @@ async def _proxy_cdek_pdf(url: str, filename: str) -> StreamingResponse:
     """Download PDF from CDEK (with auth) and proxy it to the client."""
     cdek_client = get_cdek_client()
     token = await cdek_client._get_access_token()
-    async with httpx.AsyncClient() as client:
-        resp = await client.get(
-            url,
-            headers={"Authorization": f"Bearer {token}"},
-            timeout=30.0
-        )
-        if resp.status_code != 200:
-            raise HTTPException(
-                status_code=status.HTTP_502_BAD_GATEWAY,
-                detail="Failed to download PDF from CDEK"
-            )
-        return StreamingResponse(
-            iter([resp.content]),
-            media_type="application/pdf",
-            headers={"Content-Disposition": f'inline; filename="{filename}"'}
+    client = get_http_client(CDEK)
+    resp = await client.get(
+        url,
+        headers={"Authorization": f"Bearer {token}"},
+        timeout=30.0
+    )
+    if resp.status_code != 200:
+        raise HTTPException(
+            status_code=status.HTTP_502_BAD_GATEWAY,
+            detail="Failed to download PDF from CDEK"
         )
+    return StreamingResponse(
+        iter([resp.content]),
+        media_type="application/pdf",
+        headers={"Content-Disposition": f'inline; filename="{filename}"'}
+    )
 
 
 @router.patch(
@@ -1,20 +1,23 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query, UploadFile, File
+from fastapi import APIRouter, Depends, HTTPException, status, Query, UploadFile, File, Response
 from sqlalchemy.ext.asyncio import AsyncSession
-from typing import List
+from typing import List, Optional
 
 from src.database import get_db
 from src.auth import get_current_user
 from src import crud
 from src.schemas.collection import CollectionCreate, CollectionUpdate, CollectionResponse, CollectionListResponse, CollectionImageIn, CollectionProductIn
-from src.schemas.product import ProductPublic
+from src.schemas.product import ProductPublic, ProductView
+from src.services.catalog import card_json, parse_fields, uses_card_view
+from src.services.json_stream import stream_json_list
 from src.services.media import upload_image
-from src.services.catalog import build_product_public
+from src.services import response_cache
 
 router = APIRouter(prefix="/collections", tags=["Collections"])
 
 
 @router.get("", response_model=CollectionListResponse, summary="Получить список коллекций")
 async def get_collections(
+    response: Response,
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=1000),
     db: AsyncSession = Depends(get_db)
@@ -44,6 +47,7 @@ async def get_collections(
             images=[{"id": img.id, "file": img.file, "sort_order": img.sort_order} for img in images]
         ))
     
+    response.headers.update(response_cache.surrogate_key_header([response_cache.COLLECTIONS_KEY]))
     return CollectionListResponse(
         collections=collection_responses,
         total=total,
@@ -55,6 +59,7 @@ async def get_collections(
 @router.get("/{collection_id}", response_model=CollectionResponse, summary="Получить коллекцию по ID")
 async def get_collection(
     collection_id: int,
+    response: Response,
     db: AsyncSession = Depends(get_db)
 ):
     """Получить коллекцию по ID с изображениями."""
@@ -63,6 +68,7 @@ async def get_collection(
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Collection not found")
     
     images = await crud.get_collection_images(db, collection_id)
+    response.headers.update(response_cache.surrogate_key_header([response_cache.collection_key(collection_id)]))
     return CollectionResponse(
         id=collection.id,
         name=collection.name,
@@ -85,50 +91,20 @@ async def get_collection(
 @router.get("/{collection_id}/products", response_model=List[ProductPublic], summary="Получить продукты коллекции")
 async def get_collection_products(
     collection_id: int,
+    view: ProductView = Query(ProductView.FULL, description="card — лёгкая карточка для сетки, full — полный продукт"),
+    fields: Optional[str] = Query(None, description="Поля продукта через запятую, например id,title,price"),
     db: AsyncSession = Depends(get_db)
 ):
     """Получить продукты, принадлежащие коллекции."""
-    from sqlalchemy import select
-    from src.models.product import Product, ProductColor
-    
-    # Получаем базовые продукты из коллекции
-    products = await crud.get_products_by_collection(db, collection_id)
-    if not products:
-        return []
-    
-    # Получаем все цвета для этих продуктов
-    product_ids = [p.id for p in products]
-    result = await db.execute(
-        select(ProductColor).where(ProductColor.product_id.in_(product_ids))
+    selected_fields = parse_fields(fields, view)
+    card_view = uses_card_view(view, selected_fields)
+    cards = await crud.get_products_by_collection(db, collection_id, card_view=card_view)
+    cache_keys = [response_cache.collection_key(collection_id)]
+    cache_keys += [response_cache.product_key(row.product_id) for row in cards]
+    return stream_json_list(
+        (card_json(row, selected_fields) for row in cards),
+        headers=response_cache.surrogate_key_header(cache_keys),
     )
-    product_colors = result.scalars().all()
-    
-    if not product_colors:
-        return []
-    
-    # Получаем размеры и изображения
-    color_ids = [pc.id for pc in product_colors]
-    sizes_map = await crud.get_sizes_for_products(db, color_ids)
-    images_map = await crud.get_images_for_products(db, color_ids)
-    main_categories_map = await crud.get_main_categories_for_products(db, product_ids)
-    
-    # Создаем map продуктов
-    products_map = {p.id: p for p in products}
-
-    public_products = []
-    for pc in product_colors:
-        product = products_map.get(pc.product_id)
-        if not product:
-            continue
-        
-        public_products.append(build_product_public(
-            product,
-            pc,
-            sizes=sizes_map.get(pc.id, []),
-            images=images_map.get(pc.id, []),
-            main_category=main_categories_map.get(product.id),
-        ))
-    return public_products
 
 
 @router.post("", response_model=CollectionResponse, summary="Создать коллекцию", status_code=201)
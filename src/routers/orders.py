@@ -1,4 +1,4 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Response, Header
 from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional
 
@@ -14,6 +14,7 @@ from src.schemas.orders import (
 )
 from src.cdek import get_cdek_client, CDEKError
 from src.services.errors import internal_server_error
+from src.services.idempotency import request_fingerprint, run_idempotent
 
 router = APIRouter(prefix="/orders", tags=["Orders"])
 
@@ -25,39 +26,54 @@ router = APIRouter(prefix="/orders", tags=["Orders"])
 async def create_order(
     order_request: OrderCreateRequest,
     db: AsyncSession = Depends(get_db),
-    current_user: Optional[dict] = Depends(get_optional_current_user)
+    current_user: Optional[dict] = Depends(get_optional_current_user),
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key", description="Ключ повтора: повторный запрос с ним вернёт уже созданный заказ"),
 ):
     if current_user:
         order_request.order.user_id = current_user["id"]
-    
-    try:
-        order = await crud.create_order(
-            db=db,
-            order_data=order_request.order,
-            products=order_request.products
-        )
-        
-        # Возвращаем полную информацию о заказе
-        order_detail = await crud.get_order_detail(db, order.id, include_access_token=True)
-        if not order_detail:
-            raise HTTPException(
-                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                detail="Failed to retrieve created order"
+
+    async def place_order() -> OrderDetail:
+        try:
+            order = await crud.create_order(
+                db=db,
+                order_data=order_request.order,
+                products=order_request.products
             )
-        
-        return order_detail
-    except HTTPException:
-        raise
-    except Exception as e:
-        raise internal_server_error("Failed to create order")
+
+            # Возвращаем полную информацию о заказе
+            order_detail = await crud.get_order_detail(db, order.id, include_access_token=True)
+            if not order_detail:
+                raise HTTPException(
+                    status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                    detail="Failed to retrieve created order"
+                )
+
+            return order_detail
+        except HTTPException:
+            raise
+        except Exception as e:
+            raise internal_server_error("Failed to create order")
+
+    return await run_idempotent(
+        db,
+        scope="create_order",
+        key=idempotency_key,
+        # user_id уже в теле: один ключ от гостя и от пользователя — разные запросы
+        fingerprint=request_fingerprint(order_request.model_dump(mode="json")),
+        handler=place_order,
+        status_code=status.HTTP_201_CREATED,
+    )
 
 @router.get("",
     response_model=List[OrderDetail],
     summary="Получить список заказов",
     description="Получает список всех заказов с полной информацией о товарах. Требуется аутентификация.")
 async def get_orders(
-    skip: int = Query(0, ge=0, description="Количество записей для пропуска"),
+    response: Response,
+    skip: int = Query(0, ge=0, description="Количество записей для пропуска (устарело, используйте cursor)"),
     limit: int = Query(100, ge=1, le=1000, description="Количество записей для возврата"),
+    cursor: Optional[str] = Query(None, description="Курсор следующей страницы из заголовка X-Next-Cursor"),
+    include_total: bool = Query(False, description="Вернуть общее количество в заголовке X-Total-Count"),
     search: Optional[str] = Query(None, description="Search by id, email, phone, status, cdek_status, cdek_number, custom_status"),
     db: AsyncSession = Depends(get_db),
     current_user: dict = Depends(get_current_user)
@@ -69,8 +85,13 @@ async def get_orders(
         )
     
     try:
-        orders = await crud.get_orders_detail(db, skip=skip, limit=limit, search=search)
-        return orders
+        page = await crud.get_orders_detail(db, skip=skip, limit=limit, search=search, cursor=cursor)
+        # Тело остаётся списком заказов, параметры пагинации передаются заголовками
+        if page.next_cursor:
+            response.headers["X-Next-Cursor"] = page.next_cursor
+        if include_total:
+            response.headers["X-Total-Count"] = str(await crud.get_orders_count(db, search=search))
+        return page.items
     except HTTPException:
         raise
     except Exception as e:
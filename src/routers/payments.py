@@ -2,23 +2,33 @@
 Payment Integration Router
 Handles TBank and PayPal payment initialization, webhooks, and capture.
 """
-from fastapi import APIRouter, Depends, HTTPException, status, Request, Query
+from fastapi import APIRouter, Depends, HTTPException, status, Request, Query, Header
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 from pydantic import BaseModel
 from typing import Optional, Dict, Any
+import asyncio
 import httpx
 import hashlib
+import json
 import logging
 import base64
+from datetime import datetime, timedelta, timezone
 
 from src.database import get_db
 from src.auth import get_current_user, get_optional_current_user
 from src.models.orders import Order, OrderProduct, OrderStatus
-from src.models.product import Product, ProductColor, ProductSize
+from src.crud.reservations import set_order_payment_status
 from src.config import settings
 from src.services.errors import internal_server_error, not_found
 from src.services.order_access import ensure_order_access
+from src.services.idempotency import request_fingerprint, run_idempotent
+from src.services.http_clients import PAYPAL, TBANK, get_http_client
+from src.services.token_cache import TokenCache
+from src.services.payment_reconciler import refresh_order_payment
+from src.services import payment_events
+from src.services.webhook_inbox import TBANK as WEBHOOK_TBANK, accept_webhook, webhook_handler
 
 logger = logging.getLogger(__name__)
 
@@ -105,13 +115,13 @@ class TBankClient:
         token = self._generate_token(params)
         params['Token'] = token
 
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                f"{self.api_url}/GetState",
-                json=params,
-                timeout=8.0
-            )
-            return response.json()
+        client = get_http_client(TBANK)
+        response = await client.post(
+            f"{self.api_url}/GetState",
+            json=params,
+            timeout=8.0
+        )
+        return response.json()
 
     async def init_payment(
         self,
@@ -123,7 +133,8 @@ class TBankClient:
         fail_url: Optional[str] = None,
         connection_type: Optional[str] = None,
         extra_data: Optional[Dict[str, Any]] = None,
-        receipt_items: Optional[list] = None
+        receipt_items: Optional[list] = None,
+        redirect_due_date: Optional[datetime] = None,
     ) -> dict:
         """Initialize payment and get payment URL"""
         if not self.terminal_key or not self.secret_key:
@@ -137,6 +148,8 @@ class TBankClient:
             'SuccessURL': success_url or f"{settings.TBANK_SUCCESS_URL}?orderId={order_id}",
             'FailURL': fail_url or f"{settings.TBANK_FAIL_URL}?orderId={order_id}",
         }
+        if redirect_due_date:
+            params['RedirectDueDate'] = redirect_due_date.isoformat(timespec="seconds")
         
         data_obj: Dict[str, Any] = {}
         if email:
@@ -160,14 +173,14 @@ class TBankClient:
         
         logger.info(f"Initializing TBank payment for order {order_id}, amount: {amount}, connection_type: {connection_type}")
         
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                f"{self.api_url}/Init",
-                json=params,
-                timeout=30.0
-            )
-            result = response.json()
-            
+        client = get_http_client(TBANK)
+        response = await client.post(
+            f"{self.api_url}/Init",
+            json=params,
+            timeout=30.0
+        )
+        result = response.json()
+        
         logger.info(
             "TBank Init response for order %s: success=%s, payment_id=%s",
             order_id,
@@ -182,23 +195,35 @@ class PayPalClient:
         self.client_id = settings.PAYPAL_CLIENT_ID
         self.client_secret = settings.PAYPAL_CLIENT_SECRET
         self.api_url = settings.paypal_api_url
+        # OAuth-токен живёт часами: кешируется и обновляется одним запросом на всех
+        self._token = TokenCache(self._fetch_access_token, refresh_margin=300)
 
     async def get_access_token(self) -> str:
+        return await self._token.get()
+
+    async def _fetch_access_token(self) -> tuple[str, float]:
         credentials = base64.b64encode(
             f"{self.client_id}:{self.client_secret}".encode()
         ).decode()
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                f"{self.api_url}/v1/oauth2/token",
-                headers={
-                    "Authorization": f"Basic {credentials}",
-                    "Content-Type": "application/x-www-form-urlencoded",
-                },
-                data={"grant_type": "client_credentials"},
-                timeout=15.0,
-            )
-            response.raise_for_status()
-            return response.json()["access_token"]
+        client = get_http_client(PAYPAL)
+        response = await client.post(
+            f"{self.api_url}/v1/oauth2/token",
+            headers={
+                "Authorization": f"Basic {credentials}",
+                "Content-Type": "application/x-www-form-urlencoded",
+            },
+            data={"grant_type": "client_credentials"},
+            timeout=15.0,
+        )
+        response.raise_for_status()
+        data = response.json()
+        return data["access_token"], data.get("expires_in", 3600)
+
+    def _check_response(self, response: httpx.Response) -> None:
+        if response.status_code == 401:
+            # Токен отозван раньше срока — следующий вызов получит новый
+            self._token.invalidate()
+        response.raise_for_status()
 
     async def create_order(
         self,
@@ -231,62 +256,130 @@ class PayPalClient:
                 }
             },
         }
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                f"{self.api_url}/v2/checkout/orders",
-                headers={
-                    "Authorization": f"Bearer {token}",
-                    "Content-Type": "application/json",
-                },
-                json=payload,
-                timeout=30.0,
-            )
-            response.raise_for_status()
-            return response.json()
+        client = get_http_client(PAYPAL)
+        response = await client.post(
+            f"{self.api_url}/v2/checkout/orders",
+            headers={
+                "Authorization": f"Bearer {token}",
+                "Content-Type": "application/json",
+            },
+            json=payload,
+            timeout=30.0,
+        )
+        self._check_response(response)
+        return response.json()
 
     async def capture_order(self, paypal_order_id: str) -> dict:
         token = await self.get_access_token()
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                f"{self.api_url}/v2/checkout/orders/{paypal_order_id}/capture",
-                headers={
-                    "Authorization": f"Bearer {token}",
-                    "Content-Type": "application/json",
-                },
-                json={},
-                timeout=30.0,
-            )
-            response.raise_for_status()
-            return response.json()
+        client = get_http_client(PAYPAL)
+        response = await client.post(
+            f"{self.api_url}/v2/checkout/orders/{paypal_order_id}/capture",
+            headers={
+                "Authorization": f"Bearer {token}",
+                "Content-Type": "application/json",
+            },
+            json={},
+            timeout=30.0,
+        )
+        self._check_response(response)
+        return response.json()
 
     async def get_order(self, paypal_order_id: str) -> dict:
         token = await self.get_access_token()
-        async with httpx.AsyncClient() as client:
-            response = await client.get(
-                f"{self.api_url}/v2/checkout/orders/{paypal_order_id}",
-                headers={"Authorization": f"Bearer {token}"},
-                timeout=15.0,
-            )
-            response.raise_for_status()
-            return response.json()
+        client = get_http_client(PAYPAL)
+        response = await client.get(
+            f"{self.api_url}/v2/checkout/orders/{paypal_order_id}",
+            headers={"Authorization": f"Bearer {token}"},
+            timeout=15.0,
+        )
+        self._check_response(response)
+        return response.json()
 
 
 # Global client instances
 tbank_client = TBankClient()
 paypal_client = PayPalClient()
 
+# Конечные статусы провайдеров и соответствующие статусы заказа; прочие — оплата ещё идёт
+TBANK_ORDER_STATUSES = {
+    'CONFIRMED': OrderStatus.PAID,
+    'AUTHORIZED': OrderStatus.PAID,
+    'REJECTED': OrderStatus.PAYMENT_FAILED,
+    'CANCELLED': OrderStatus.PAYMENT_FAILED,
+    'AUTH_FAIL': OrderStatus.PAYMENT_FAILED,
+    'DEADLINE_EXPIRED': OrderStatus.PAYMENT_FAILED,
+    'REFUNDED': OrderStatus.REFUNDED,
+    'PARTIAL_REFUNDED': OrderStatus.REFUNDED,
+}
+PAYPAL_ORDER_STATUSES = {
+    'COMPLETED': OrderStatus.PAID,
+    'VOIDED': OrderStatus.PAYMENT_FAILED,
+}
+
+
+async def fetch_provider_status(provider: Optional[str], payment_id: str) -> Optional[OrderStatus]:
+    """Статус заказа по данным провайдера; None, пока оплата не завершена"""
+    if provider == "paypal":
+        pp_status = (await paypal_client.get_order(payment_id)).get("status")
+        logger.info("PayPal GetOrder for payment %s: status=%s", payment_id, pp_status)
+        return PAYPAL_ORDER_STATUSES.get(pp_status)
+    tbank_status = (await tbank_client.get_state(payment_id)).get('Status')
+    logger.info("TBank GetState for payment %s: status=%s", payment_id, tbank_status)
+    return TBANK_ORDER_STATUSES.get(tbank_status)
+
 
 @router.post("/init", response_model=PaymentInitResponse)
 async def init_payment(
     request: PaymentInitRequest,
     db: AsyncSession = Depends(get_db),
-    current_user: Optional[dict] = Depends(get_optional_current_user)
+    current_user: Optional[dict] = Depends(get_optional_current_user),
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key", description="Ключ повтора: повторный запрос вернёт уже созданную оплату"),
 ):
     """
     Initialize payment for an order.
     Returns payment URL for redirect.
     Supports payment_method='card' (TBank) and 'paypal' (PayPal).
+    With Idempotency-Key a retry returns the stored payment instead of calling the provider again.
     """
+    return await run_idempotent(
+        db,
+        scope="payment_init",
+        key=idempotency_key,
+        fingerprint=request_fingerprint(request.model_dump(mode="json"), current_user and current_user["id"]),
+        handler=lambda: _init_payment(request, db, current_user),
+        store_if=lambda response: response.success,
+    )
+
+
+# Ссылка, которой осталось жить меньше этого, считается истёкшей: покупатель не успеет оплатить
+PAYMENT_SESSION_MIN_REMAINING = timedelta(minutes=2)
+
+
+def _live_payment_session(order: Order, provider: str) -> Optional[PaymentInitResponse]:
+    """Сохранённая платёжная сессия заказа, если она того же провайдера, на ту же сумму и ещё жива"""
+    if not order.payment_url or not order.payment_expires_at or order.payment_provider != provider:
+        return None
+    if order.payment_amount is None or order.payment_amount != order.total_price:
+        return None
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    if order.payment_expires_at - PAYMENT_SESSION_MIN_REMAINING <= now:
+        return None
+    return PaymentInitResponse(success=True, payment_url=order.payment_url, payment_id=order.payment_id)
+
+
+def _remember_payment_session(order: Order, provider: str, payment_id: str, url: str, expires_at: datetime) -> None:
+    order.payment_id = payment_id
+    order.payment_provider = provider
+    order.payment_url = url
+    order.payment_expires_at = expires_at.replace(tzinfo=None)
+    order.payment_amount = order.total_price
+
+
+async def _init_payment(
+    request: PaymentInitRequest,
+    db: AsyncSession,
+    current_user: Optional[dict],
+) -> PaymentInitResponse:
     is_paypal = request.payment_method == 'paypal'
 
     if is_paypal:
@@ -319,6 +412,24 @@ async def init_payment(
             detail=f"Order already has status: {order.status.value}",
         )
 
+    provider = "paypal" if is_paypal else "tbank"
+    live_session = _live_payment_session(order, provider)
+    if live_session:
+        logger.info("Reusing %s payment session for order %s: payment_id=%s", provider, order.id, order.payment_id)
+        return live_session
+
+    # Ссылка не живёт дольше резерва: после reserved_until заказ отменяется и остаток возвращается
+    now = datetime.now(timezone.utc)
+    session_expires_at = now + timedelta(minutes=settings.PAYMENT_SESSION_TTL_MINUTES)
+    if order.reserved_until:
+        reserved_until = order.reserved_until.replace(tzinfo=timezone.utc)
+        if reserved_until <= now:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Order reservation has expired",
+            )
+        session_expires_at = min(session_expires_at, reserved_until)
+
     try:
         description = f"Заказ #{order.id}"
 
@@ -351,8 +462,7 @@ async def init_payment(
                     break
 
             if paypal_order_id and approve_link:
-                order.payment_id = paypal_order_id
-                order.payment_provider = "paypal"
+                _remember_payment_session(order, "paypal", paypal_order_id, approve_link, session_expires_at)
                 await db.commit()
                 logger.info("PayPal order created for order %s: paypal_id=%s", order.id, paypal_order_id)
                 return PaymentInitResponse(
@@ -379,43 +489,23 @@ async def init_payment(
         )
         order_products = order_products_result.scalars().all()
 
-        if order_products:
-            size_ids = [op.product_size_id for op in order_products]
-            sizes_result = await db.execute(select(ProductSize).where(ProductSize.id.in_(size_ids)))
-            sizes = {ps.id: ps for ps in sizes_result.scalars().all()}
-
-            color_ids = [sizes[op.product_size_id].product_color_id for op in order_products if op.product_size_id in sizes]
-            colors_result = await db.execute(select(ProductColor).where(ProductColor.id.in_(color_ids)))
-            colors = {pc.id: pc for pc in colors_result.scalars().all()}
+        # Цены и названия берутся из снимка строк заказа, а не из текущего каталога
+        for op in order_products:
+            if op.unit_price is None:
+                logger.warning("Order %s: OrderProduct %s has no snapshot, skipped in receipt", order.id, op.id)
+                continue
+            price_kopecks = int(float(op.unit_price) * 100)
+            item_amount = price_kopecks * op.quantity
 
-            product_ids = [colors[cid].product_id for cid in color_ids if cid in colors]
-            products_result = await db.execute(select(Product).where(Product.id.in_(product_ids)))
-            products = {p.id: p for p in products_result.scalars().all()}
-
-            for op in order_products:
-                ps = sizes.get(op.product_size_id)
-                if not ps:
-                    continue
-                pc = colors.get(ps.product_color_id)
-                if not pc:
-                    continue
-                prod = products.get(pc.product_id)
-                if not prod:
-                    continue
-
-                price = prod.discount_price if prod.discount_price is not None else prod.price
-                price_kopecks = int(float(price) * 100)
-                item_amount = price_kopecks * op.quantity
-
-                receipt_items.append({
-                    'Name': f"{pc.title} ({ps.size})"[:64],
-                    'Price': price_kopecks,
-                    'Quantity': op.quantity,
-                    'Amount': item_amount,
-                    'Tax': 'none',
-                    'PaymentMethod': 'full_payment',
-                    'PaymentObject': 'commodity'
-                })
+            receipt_items.append({
+                'Name': f"{op.title} ({op.size})"[:64],
+                'Price': price_kopecks,
+                'Quantity': op.quantity,
+                'Amount': item_amount,
+                'Tax': 'none',
+                'PaymentMethod': 'full_payment',
+                'PaymentObject': 'commodity'
+            })
 
         delivery_cost_kopecks = 30000
         receipt_items.append({
@@ -466,12 +556,14 @@ async def init_payment(
             fail_url=request.fail_url,
             connection_type=connection_type,
             extra_data=request.data,
-            receipt_items=receipt_items
+            receipt_items=receipt_items,
+            redirect_due_date=session_expires_at,
         )
 
         if response.get('Success') and response.get('PaymentURL'):
-            order.payment_id = str(response.get('PaymentId'))
-            order.payment_provider = "tbank"
+            _remember_payment_session(
+                order, "tbank", str(response.get('PaymentId')), response.get('PaymentURL'), session_expires_at
+            )
             await db.commit()
 
             return PaymentInitResponse(
@@ -505,65 +597,68 @@ async def payment_webhook(
     """
     Handle TBank payment notifications (webhooks).
     TBank calls this endpoint when payment status changes.
+    The notification is stored in the webhook inbox and acknowledged at once;
+    the order is updated by the webhook worker (process_tbank_notification).
     """
+    raw_body = await request.body()
     try:
-        body = await request.json()
-        logger.info(
-            "Received TBank webhook for order=%s payment_id=%s status=%s success=%s",
-            body.get("OrderId"),
-            body.get("PaymentId"),
-            body.get("Status"),
-            body.get("Success"),
-        )
-        
-        # Verify token
-        if not tbank_client.verify_notification_token(body):
-            logger.warning("Invalid webhook token")
-            return {"error": "Invalid token"}
-        
-        # Get order by OrderId
-        order_id = int(body.get('OrderId', 0))
-        result = await db.execute(select(Order).where(Order.id == order_id))
-        order = result.scalar_one_or_none()
-        
-        if not order:
-            logger.warning(f"Order not found: {order_id}")
-            return "OK"  # Return OK to avoid retries
-        
-        # Update payment_id if not set
-        payment_id = str(body.get('PaymentId'))
-        if not order.payment_id:
-            order.payment_id = payment_id
-        
-        # Map TBank status to our status
-        tbank_status = body.get('Status')
-        success = body.get('Success', False)
-        
-        logger.info(f"Order {order_id}: TBank status={tbank_status}, success={success}")
-        
-        if tbank_status in ['CONFIRMED', 'AUTHORIZED']:
-            # Payment successful
-            order.status = OrderStatus.PAID
-            logger.info(f"Order {order_id} marked as PAID")
-            
-        elif tbank_status in ['REJECTED', 'CANCELLED', 'AUTH_FAIL', 'DEADLINE_EXPIRED']:
-            # Payment failed
-            order.status = OrderStatus.PAYMENT_FAILED
-            logger.info(f"Order {order_id} payment failed: {tbank_status}")
-            
-        elif tbank_status in ['REFUNDED', 'PARTIAL_REFUNDED']:
-            # Refund
-            order.status = OrderStatus.REFUNDED
-            logger.info(f"Order {order_id} refunded")
-        
-        await db.commit()
-        
-        # TBank expects "OK" response
-        return "OK"
-        
-    except Exception as e:
-        logger.error(f"Webhook error: {str(e)}", exc_info=True)
+        body = json.loads(raw_body)
+    except ValueError:
+        logger.warning("TBank webhook: invalid JSON body")
         return "OK"  # Return OK to avoid retries
+    logger.info(
+        "Received TBank webhook for order=%s payment_id=%s status=%s success=%s",
+        body.get("OrderId"),
+        body.get("PaymentId"),
+        body.get("Status"),
+        body.get("Success"),
+    )
+
+    # Verify token
+    if not tbank_client.verify_notification_token(body):
+        logger.warning("Invalid webhook token")
+        return {"error": "Invalid token"}
+
+    # Ошибка записи в inbox уходит провайдеру как 500: TBank повторит уведомление
+    await accept_webhook(
+        db,
+        WEBHOOK_TBANK,
+        dedup_key=f"{body.get('PaymentId')}:{body.get('Status')}",
+        order_key=f"order:{body.get('OrderId')}",
+        body=raw_body.decode("utf-8"),
+    )
+
+    # TBank expects "OK" response
+    return "OK"
+
+
+@webhook_handler(WEBHOOK_TBANK)
+async def process_tbank_notification(db: AsyncSession, body: dict) -> None:
+    """Apply a stored TBank notification to its order (called by the webhook worker)."""
+    # Get order by OrderId
+    order_id = int(body.get('OrderId', 0))
+    result = await db.execute(select(Order).where(Order.id == order_id))
+    order = result.scalar_one_or_none()
+
+    if not order:
+        logger.warning(f"Order not found: {order_id}")
+        return
+
+    # Update payment_id if not set
+    payment_id = str(body.get('PaymentId'))
+    if not order.payment_id:
+        order.payment_id = payment_id
+
+    # Map TBank status to our status
+    tbank_status = body.get('Status')
+    success = body.get('Success', False)
+
+    logger.info(f"Order {order_id}: TBank status={tbank_status}, success={success}")
+
+    new_status = TBANK_ORDER_STATUSES.get(tbank_status)
+    if new_status is not None:
+        await set_order_payment_status(db, order, new_status)
+        logger.info(f"Order {order_id} marked as {new_status.value}: {tbank_status}")
 
 
 @router.post("/paypal/capture", response_model=PayPalCaptureResponse)
@@ -617,13 +712,13 @@ async def paypal_capture(
         )
 
         if pp_status == "COMPLETED":
-            order.status = OrderStatus.PAID
+            await set_order_payment_status(db, order, OrderStatus.PAID)
             if not order.payment_id:
                 order.payment_id = request.paypal_token
             await db.commit()
             return PayPalCaptureResponse(success=True, is_paid=True)
         else:
-            order.status = OrderStatus.PAYMENT_FAILED
+            await set_order_payment_status(db, order, OrderStatus.PAYMENT_FAILED)
             await db.commit()
             return PayPalCaptureResponse(
                 success=False,
@@ -642,12 +737,14 @@ async def paypal_capture(
 async def get_payment_status(
     order_id: int,
     access_token: Optional[str] = Query(None, description="Access token for guest orders"),
+    refresh: bool = Query(False, description="Сверить статус с провайдером (не чаще раза в PAYMENT_STATUS_REFRESH_SECONDS на заказ)"),
     db: AsyncSession = Depends(get_db),
     current_user: Optional[dict] = Depends(get_optional_current_user),
 ):
     """Get payment status for an order (public endpoint for post-payment redirect).
-    If status is still not_paid but payment_id exists, queries the payment
-    provider directly to avoid depending solely on webhook delivery timing.
+    The status is read from the database: webhooks and the background payment
+    reconciler keep it up to date. With refresh=true a still not_paid order is
+    checked with the provider inline, at most once per PAYMENT_STATUS_REFRESH_SECONDS.
 
     Access check is lenient: if it fails we still return the status,
     because the user may arrive from a payment redirect without auth context
@@ -668,42 +765,13 @@ async def get_payment_status(
                 f"(user may be arriving from payment redirect)"
             )
 
-        cached_order_id = order.id
         final_status = order.status
         final_payment_id = order.payment_id
-        provider = order.payment_provider
 
-        if final_status == OrderStatus.NOT_PAID and final_payment_id:
+        if refresh and final_status == OrderStatus.NOT_PAID and final_payment_id:
             try:
-                if provider == "paypal":
-                    pp_resp = await paypal_client.get_order(final_payment_id)
-                    pp_status = pp_resp.get("status")
-                    logger.info("PayPal GetOrder for order %s: status=%s", order_id, pp_status)
-                    if pp_status == "COMPLETED":
-                        order.status = OrderStatus.PAID
-                        final_status = OrderStatus.PAID
-                    elif pp_status in ("VOIDED",):
-                        order.status = OrderStatus.PAYMENT_FAILED
-                        final_status = OrderStatus.PAYMENT_FAILED
-                else:
-                    tbank_response = await tbank_client.get_state(final_payment_id)
-                    logger.info(f"TBank GetState for order {order_id}: {tbank_response}")
-                    tbank_status_val = tbank_response.get('Status')
-                    if tbank_status_val in ['CONFIRMED', 'AUTHORIZED']:
-                        order.status = OrderStatus.PAID
-                        final_status = OrderStatus.PAID
-                        logger.info(f"Order {order_id} updated to PAID via GetState")
-                    elif tbank_status_val in ['REJECTED', 'CANCELLED', 'AUTH_FAIL', 'DEADLINE_EXPIRED']:
-                        order.status = OrderStatus.PAYMENT_FAILED
-                        final_status = OrderStatus.PAYMENT_FAILED
-                        logger.info(f"Order {order_id} updated to PAYMENT_FAILED via GetState: {tbank_status_val}")
-                    elif tbank_status_val in ['REFUNDED', 'PARTIAL_REFUNDED']:
-                        order.status = OrderStatus.REFUNDED
-                        final_status = OrderStatus.REFUNDED
-                        logger.info(f"Order {order_id} updated to REFUNDED via GetState: {tbank_status_val}")
-
-                if final_status != OrderStatus.NOT_PAID:
-                    await db.commit()
+                if await refresh_order_payment(db, order.id, order.payment_provider, final_payment_id):
+                    final_status = await db.scalar(select(Order.status).where(Order.id == order_id))
             except Exception as e:
                 logger.warning(f"Payment provider status check failed for order {order_id}: {e}")
                 try:
@@ -712,7 +780,7 @@ async def get_payment_status(
                     pass
 
         return {
-            "order_id": cached_order_id,
+            "order_id": order_id,
             "status": final_status.value if hasattr(final_status, 'value') else str(final_status),
             "payment_id": final_payment_id,
             "is_paid": final_status == OrderStatus.PAID
@@ -727,3 +795,64 @@ async def get_payment_status(
             detail="Failed to check payment status"
         )
 
+
+def _status_event(order_id: int, order_status: str) -> str:
+    data = {"order_id": order_id, "status": order_status, "is_paid": order_status == OrderStatus.PAID.value}
+    return f"event: status\ndata: {json.dumps(data)}\n\n"
+
+
+@router.get("/status/{order_id}/events")
+async def stream_payment_status(
+    order_id: int,
+    access_token: Optional[str] = Query(None, description="Access token for guest orders"),
+    db: AsyncSession = Depends(get_db),
+    current_user: Optional[dict] = Depends(get_optional_current_user),
+):
+    """Server-Sent Events stream of the order's payment status.
+
+    Sends the current status at once and then every change pushed by the webhook,
+    PayPal capture or the payment reconciler. The stream ends once the order leaves
+    not_paid or after PAYMENT_EVENTS_MAX_WAIT_SECONDS (the client reconnects);
+    while idle a keep-alive comment is sent every PAYMENT_EVENTS_KEEPALIVE_SECONDS.
+    Access check is lenient, as in get_payment_status.
+    """
+    # Подписка до чтения статуса: смена между чтением и подпиской не потеряется
+    subscription = payment_events.subscribe(order_id)
+    try:
+        result = await db.execute(select(Order).where(Order.id == order_id))
+        order = result.scalar_one_or_none()
+        if not order:
+            raise not_found("Order not found")
+        try:
+            ensure_order_access(order, current_user=current_user, access_token=access_token)
+        except HTTPException:
+            logger.info(f"Payment status stream access check skipped for order {order_id}")
+    except Exception:
+        subscription.close()
+        raise
+    current_status = order.status.value
+    # Сессия get_db закрывается только после конца потока: возвращаем соединение в пул сразу,
+    # иначе каждый открытый поток держит его (idle in transaction) до PAYMENT_EVENTS_MAX_WAIT_SECONDS
+    await db.close()
+
+    async def events():
+        with subscription:
+            yield _status_event(order_id, current_status)
+            if current_status != OrderStatus.NOT_PAID.value:
+                return
+            loop = asyncio.get_running_loop()
+            deadline = loop.time() + settings.PAYMENT_EVENTS_MAX_WAIT_SECONDS
+            while (remaining := deadline - loop.time()) > 0:
+                new_status = await subscription.get(min(settings.PAYMENT_EVENTS_KEEPALIVE_SECONDS, remaining))
+                if new_status is None:
+                    yield ": keep-alive\n\n"
+                    continue
+                yield _status_event(order_id, new_status)
+                if new_status != OrderStatus.NOT_PAID.value:
+                    return
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
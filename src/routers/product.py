@@ -1,7 +1,9 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query, Body
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Body, Request, Response
 from fastapi import UploadFile, File
+from fastapi.responses import JSONResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional
+from decimal import Decimal
 from sqlalchemy import select
 from sqlalchemy.exc import IntegrityError
 import logging
@@ -10,13 +12,15 @@ from src.database import get_db
 from src.auth import get_current_user
 from src import crud
 from src.schemas.product import (
-    ProductCreate, ProductUpdate, ProductList, ProductPublic, ProductMeta,
-    ProductColorIn, ProductSizeIn, ProductColorUpdate, ProductDetail, ProductColorDetail,
-    ProductSectionCreate, ProductSectionUpdate, ProductSectionOut
+    ProductCreate, ProductUpdate, ProductList, ProductPublic,
+    ProductColorIn, ProductSizeIn, ProductColorUpdate, ProductDetail,
+    ProductSectionCreate, ProductSectionUpdate, ProductSectionOut, ProductFilters, ProductView
 )
 from src.models.product import ProductStatus, Product, ProductColor, ProductSection
 from src.utils import slugify
-from src.services.catalog import build_product_public
+from src.services.catalog import build_product_detail, card_json, parse_fields, uses_card_view
+from src.services.json_stream import stream_json_list, stream_json_object
+from src.services import http_cache, response_cache
 from src.services.media import upload_image as upload_image_to_storage
 from src.utils import copy_image_in_minio
 from pydantic import BaseModel
@@ -30,57 +34,61 @@ router = APIRouter(prefix="/products", tags=["Products"])
     summary="Получить список продуктов",
     description="Получает список всех продуктов с пагинацией и фильтрацией")
 async def get_products(
-    skip: int = Query(0, ge=0, description="Количество записей для пропуска"),
+    request: Request,
+    skip: int = Query(0, ge=0, description="Количество записей для пропуска (устарело, используйте cursor)"),
     limit: int = Query(100, ge=1, le=1000, description="Количество записей для возврата"),
+    cursor: Optional[str] = Query(None, description="Курсор следующей страницы из next_cursor"),
+    include_total: bool = Query(False, description="Посчитать общее количество продуктов под фильтром"),
     product_status: Optional[ProductStatus] = Query(None, alias="status", description="Фильтр по статусу продукта"),
     search: Optional[str] = Query(None, description="Поиск по названию или описанию"),
+    price_min: Optional[Decimal] = Query(None, ge=0, description="Минимальная цена продажи"),
+    price_max: Optional[Decimal] = Query(None, ge=0, description="Максимальная цена продажи"),
+    sizes: List[str] = Query([], alias="size", description="Размеры в наличии (можно несколько)"),
+    colors: List[str] = Query([], alias="color", description="Название цвета или HEX (можно несколько)"),
+    category: Optional[str] = Query(None, description="Slug категории, включая подкатегории"),
+    collection_id: Optional[int] = Query(None, description="ID коллекции"),
+    facets: bool = Query(False, description="Вернуть счётчики по размерам, цветам и диапазон цен"),
+    view: ProductView = Query(ProductView.FULL, description="card — лёгкая карточка для сетки, full — полный продукт"),
+    fields: Optional[str] = Query(None, description="Поля продукта через запятую, например id,title,price"),
     db: AsyncSession = Depends(get_db)
 ):
     """Получить список продуктов с фильтрацией"""
+    selected_fields = parse_fields(fields, view)
+    card_view = uses_card_view(view, selected_fields)
+    filters = ProductFilters(
+        status=product_status, search=search, price_min=price_min, price_max=price_max,
+        sizes=sizes, colors=colors, category=category, collection_id=collection_id,
+    )
     try:
-        product_colors = await crud.get_products(db, skip=skip, limit=limit, status=product_status, search=search)
-        total = await crud.get_products_count(db, status=product_status, search=search)
-        
-        # Получаем связанные продукты
-        product_ids = list(set([pc.product_id for pc in product_colors]))
-        products_map = {}
-        if product_ids:
-            result = await db.execute(select(Product).where(Product.id.in_(product_ids)))
-            for p in result.scalars().all():
-                products_map[p.id] = p
-        
-        # Получаем размеры, изображения и аккордеоны
-        color_ids = [pc.id for pc in product_colors]
-        sizes_map = await crud.get_sizes_for_products(db, color_ids)
-        images_map = await crud.get_images_for_products(db, color_ids)
-        main_categories_map = await crud.get_main_categories_for_products(db, product_ids)
-        sections_map = await crud.get_sections_for_products(db, product_ids)
-        
-        public_products = []
-        for pc in product_colors:
-            try:
-                product = products_map.get(pc.product_id)
-                if not product:
-                    continue
-                    
-                public_products.append(build_product_public(
-                    product,
-                    pc,
-                    sizes=sizes_map.get(pc.id, []),
-                    images=images_map.get(pc.id, []),
-                    main_category=main_categories_map.get(product.id),
-                    sections=sections_map.get(product.id, []),
-                ))
-            except Exception as e:
-                logger.error(f"CRITICAL: Failed to validate product {getattr(pc, 'slug', 'unknown')}: {str(e)}")
-                continue
-
-        return ProductList(
-            products=public_products,
-            total=total,
-            skip=skip,
-            limit=limit
+        # Дешёвый валидатор до загрузки страницы: какие карточки под фильтром и когда менялась последняя.
+        # Остатки, цены и позиции пересобирают карточку, поэтому страница и фасеты меняются вместе с ним
+        matching, members, last_modified = await crud.get_products_version(db, filters)
+        etag = http_cache.make_etag(view.value, fields, matching, members, last_modified)
+        headers = http_cache.validator_headers(etag, last_modified)
+        if http_cache.is_not_modified(request, etag, last_modified):
+            return http_cache.not_modified(headers)
+
+        total = matching if include_total else None
+        facet_counts = (await crud.get_product_facets(db, filters)).model_dump(mode="json") if facets else None
+        page = await crud.get_products(
+            db, skip=skip, limit=limit, filters=filters, cursor=cursor, card_view=card_view
+        )
+
+        # Карточки хранятся готовым JSON в формате ProductPublic — текст из БД уходит в тело потоком
+        cache_keys = [response_cache.PRODUCTS_KEY, *(response_cache.product_key(row.product_id) for row in page.items)]
+        if facets or filters.model_dump(exclude_defaults=True).keys() - {"status"}:
+            cache_keys.append(response_cache.PRODUCT_FILTERS_KEY)
+        extra = {"total": total, "skip": skip, "limit": limit, "next_cursor": page.next_cursor}
+        if facets:
+            extra["facets"] = facet_counts
+        return stream_json_object(
+            "products",
+            (card_json(row, selected_fields) for row in page.items),
+            extra,
+            headers={**headers, **response_cache.surrogate_key_header(cache_keys)},
         )
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error getting products: {e}")
         raise HTTPException(
@@ -97,32 +105,57 @@ async def get_product_by_slug(
     db: AsyncSession = Depends(get_db)
 ):
     """Получить продукт по slug"""
-    product_color = await crud.get_product_by_slug(db, slug)
-    if not product_color:
+    bundle = await crud.load_product_detail(db, color_slug=slug)
+    if not bundle:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Product not found"
         )
-    
-    product = await crud.get_product_by_id(db, product_color.product_id)
-    if not product:
+    return JSONResponse(
+        content=bundle.selected.data,
+        headers=response_cache.surrogate_key_header([response_cache.product_key(bundle.product.id)]),
+    )
+
+# Верхняя граница числа ID в одном батч-запросе
+MAX_BATCH_IDS = 300
+
+def _parse_ids(values: List[str], name: str) -> list[int]:
+    """ID из повторяющегося параметра и/или списка через запятую"""
+    try:
+        return [int(part) for value in values for part in value.split(",") if part.strip()]
+    except ValueError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"{name} must be integers")
+
+@router.get("/batch",
+    response_model=List[ProductPublic],
+    summary="Получить продукты пачкой",
+    description="Карточки продуктов по ID цветов (избранное) или ID размеров (строки корзины) за один запрос")
+async def get_products_batch(
+    color_ids: List[str] = Query([], description="ID цветов: 1,2,3 или повтор параметра"),
+    size_ids: List[str] = Query([], description="ID размеров: 1,2,3 или повтор параметра"),
+    view: ProductView = Query(ProductView.FULL, description="card — лёгкая карточка для сетки, full — полный продукт"),
+    fields: Optional[str] = Query(None, description="Поля продукта через запятую, например id,title,price"),
+    db: AsyncSession = Depends(get_db)
+):
+    """Получить продукты по списку ID цветов или размеров"""
+    parsed_color_ids = _parse_ids(color_ids, "color_ids")
+    parsed_size_ids = _parse_ids(size_ids, "size_ids")
+    if len(parsed_color_ids) + len(parsed_size_ids) > MAX_BATCH_IDS:
         raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Product not found"
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"At most {MAX_BATCH_IDS} ids per request"
         )
-    
-    sizes_map = await crud.get_sizes_for_products(db, [product_color.id])
-    images = await crud.list_product_images(db, product_color.id)
-    main_category = await crud.get_product_main_category(db, product.id)
-    sections = await crud.list_product_sections(db, product.id)
-    
-    return build_product_public(
-        product,
-        product_color,
-        sizes=sizes_map.get(product_color.id, []),
-        images=images,
-        main_category=main_category,
-        sections=sections,
+    selected_fields = parse_fields(fields, view)
+    card_view = uses_card_view(view, selected_fields)
+
+    cards = await crud.get_product_cards_batch(
+        db, color_ids=parsed_color_ids, size_ids=parsed_size_ids, card_view=card_view
+    )
+    # Ненайденный ID может появиться позже: ответ сбрасывается и вместе с листингами
+    cache_keys = [response_cache.PRODUCTS_KEY, *(response_cache.product_key(row.product_id) for row in cards)]
+    return stream_json_list(
+        (card_json(row, selected_fields) for row in cards),
+        headers=response_cache.surrogate_key_header(cache_keys),
     )
 
 # --- Product management ---
@@ -688,93 +721,26 @@ async def remove_product_collection(
     description="Получает детальную информацию о продукте по его ID со всеми цветами, изображениями и размерами")
 async def get_product_by_id(
     product_id: int,
+    response: Response,
     db: AsyncSession = Depends(get_db)
 ):
     """Получить продукт по ID со всеми цветами"""
-    product = await crud.get_product_by_id(db, product_id)
-    if not product:
+    bundle = await crud.load_product_detail(db, product_id=product_id)
+    if not bundle:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Product not found"
         )
     
-    # Получаем все цвета продукта
-    colors = await crud.list_product_colors(db, product_id)
-    main_category = await crud.get_product_main_category(db, product_id)
-    sections = await crud.list_product_sections(db, product_id)
-    
-    # Конвертируем секции
-    validated_sections = [ProductSectionOut.model_validate(s) for s in sections]
-
-    if not colors:
-        # Если нет цветов, возвращаем продукт с пустым списком цветов
-        return ProductDetail(
-            id=product.id,
-            title=None,
-            description=product.description,
-            price=product.price,
-            discount_price=product.discount_price,
-            currency=product.currency,
-            weight=product.weight,
-            composition=product.composition,
-            fit=product.fit,
-            status=product.status,
-            is_pre_order=product.is_pre_order,
-            main_category=main_category,
-            meta_care=product.meta_care,
-            meta_shipping=product.meta_shipping,
-            meta_returns=product.meta_returns,
-            size_chart=product.size_chart,
-            colors=[],
-            custom_sections=validated_sections
-        )
-    
-    # Получаем все ID цветов для загрузки изображений и размеров
-    color_ids = [color.id for color in colors]
-    
-    # Загружаем изображения и размеры для всех цветов
-    images_map = await crud.get_images_for_products(db, color_ids)
-    sizes_map = await crud.get_sizes_for_products(db, color_ids)
-    
-    # Формируем список цветов с изображениями и размерами
-    colors_detail = []
-    for color in colors:
-        images = images_map.get(color.id, [])
-        sizes = sizes_map.get(color.id, [])
-        
-        colors_detail.append(ProductColorDetail(
-            id=color.id,
-            color_id=color.id,
-            slug=color.slug,
-            title=color.title,
-            label=color.label,
-            hex=color.hex,
-            price=color.price,
-            discount_price=color.discount_price,
-            images=[{"file": i.file, "alt": None, "w": None, "h": None, "color": None, "sort_order": i.sort_order} for i in images],
-            sizes=sizes
-        ))
-    
-    title = colors_detail[0].title if colors_detail else None
-    return ProductDetail(
-        id=product.id,
-        title=title,
-        description=product.description,
-        price=product.price,
-        discount_price=product.discount_price,
-        currency=product.currency,
-        weight=product.weight,
-        composition=product.composition,
-        fit=product.fit,
-        status=product.status,
-        is_pre_order=product.is_pre_order,
-        main_category=main_category,
-        meta_care=product.meta_care,
-        meta_shipping=product.meta_shipping,
-        meta_returns=product.meta_returns,
-        size_chart=product.size_chart,
-        colors=colors_detail,
-        custom_sections=validated_sections
+    response.headers.update(response_cache.surrogate_key_header([response_cache.product_key(product_id)]))
+
+    main_category, sections = None, []
+    if not bundle.cards:
+        # Без цветов нет и карточек, из которых берутся категория и секции
+        main_category = await crud.get_product_main_category(db, product_id)
+        sections = await crud.list_product_sections(db, product_id)
+    return build_product_detail(
+        bundle.product, bundle.colors, bundle.cards, main_category=main_category, sections=sections
     )
 
 @router.get("/{category_slug}/{slug}", 
@@ -786,52 +752,13 @@ async def get_product_by_category_and_slug(
     slug: str,
     db: AsyncSession = Depends(get_db)
 ):
-    product_color = await crud.get_product_by_category_and_slug(db, category_slug, slug)
-    if not product_color:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Product not found"
-        )
-    
-    product = await crud.get_product_by_id(db, product_color.product_id)
-    if not product:
+    bundle = await crud.load_product_detail(db, color_slug=slug, category_slug=category_slug)
+    if not bundle:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Product not found"
         )
-    
-    sizes_map = await crud.get_sizes_for_products(db, [product_color.id])
-    images = await crud.list_product_images(db, product_color.id)
-    main_category = await crud.get_product_main_category(db, product.id)
-    sections = await crud.list_product_sections(db, product.id)
-    
-    validated_sections = []
-    if hasattr(ProductSectionOut, "model_validate"):
-        validated_sections = [ProductSectionOut.model_validate(s) for s in sections]
-    else:
-        validated_sections = [ProductSectionOut.from_orm(s) for s in sections]
-    
-    return ProductPublic(
-        id=product_color.id,
-        product_id=product.id,
-        color_id=product_color.id,
-        slug=product_color.slug,
-        title=product_color.title,
-        categoryPath=[category_slug],
-        main_category=main_category,
-        price=product.price,
-        discount_price=product.discount_price,
-        currency=product.currency or "RUB",
-        weight=product.weight,
-        label=product_color.label or "Default",
-        hex=product_color.hex or "#000000",
-        sizes=sizes_map.get(product_color.id, []),
-        composition=product.composition,
-        fit=product.fit,
-        description=product.description,
-        images=[{"file": i.file, "alt": None, "w": None, "h": None, "color": None, "sort_order": i.sort_order} for i in images],
-        meta=ProductMeta(care=product.meta_care, shipping=product.meta_shipping, returns=product.meta_returns),
-        status=product.status or ProductStatus.IN_STOCK,
-        created_at=product_color.created_at,
-        custom_sections=validated_sections
+    return JSONResponse(
+        content={**bundle.selected.data, "categoryPath": [category_slug]},
+        headers=response_cache.surrogate_key_header([response_cache.product_key(bundle.product.id)]),
     )
@@ -1,10 +1,11 @@
-from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File
+from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Request, Response
 from sqlalchemy.ext.asyncio import AsyncSession
 from src.database import get_db
 from src.auth import get_current_user
 from src.crud.site_settings import get_setting, set_setting
 from src.schemas.site_settings import SiteSettingPublic, SiteSettingUpdate
 from src.services.media import upload_image
+from src.services import http_cache, response_cache
 import json
 from pydantic import BaseModel
 
@@ -15,10 +16,16 @@ class NewsletterSubscribeRequest(BaseModel):
 router = APIRouter(prefix="/settings", tags=["Settings"])
 
 @router.get("/{key}", response_model=SiteSettingPublic)
-async def get_site_setting(key: str, db: AsyncSession = Depends(get_db)):
+async def get_site_setting(key: str, request: Request, response: Response, db: AsyncSession = Depends(get_db)):
     setting = await get_setting(db, key)
     if not setting:
         raise HTTPException(status_code=404, detail="Setting not found")
+    # updated_at в SQLite хранится с точностью до секунды, поэтому в ETag входит и значение
+    etag = http_cache.make_etag(setting.id, setting.updated_at, setting.value)
+    headers = http_cache.validator_headers(etag, setting.updated_at)
+    if http_cache.is_not_modified(request, etag, setting.updated_at):
+        return http_cache.not_modified(headers)
+    response.headers.update({**headers, **response_cache.surrogate_key_header([response_cache.setting_key(key)])})
     return setting
 
 @router.put("/{key}", response_model=SiteSettingPublic)
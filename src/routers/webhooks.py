@@ -1,12 +1,14 @@
 from fastapi import APIRouter, Depends, Request, HTTPException, status
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
+import json
 import logging
 import ipaddress
 
 from src.database import get_db
 from src.models.orders import Order
 from src.config import settings
+from src.services.webhook_inbox import CDEK, accept_webhook, webhook_handler
 
 logger = logging.getLogger(__name__)
 
@@ -52,9 +54,10 @@ async def cdek_order_status_webhook(
         logger.warning(f"CDEK webhook: forbidden IP {client_ip}")
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Forbidden")
     
+    raw_body = await request.body()
     try:
-        body = await request.json()
-    except Exception:
+        body = json.loads(raw_body)
+    except ValueError:
         logger.warning("CDEK webhook: invalid JSON body")
         return "OK"
     
@@ -76,16 +79,25 @@ async def cdek_order_status_webhook(
         logger.warning(f"CDEK webhook: order_uuid is not int: {order_uuid}")
         return "OK"
     
-    try:
-        result = await db.execute(select(Order).where(Order.cdek_uuid == order_uuid))
-        order = result.scalar_one_or_none()
-        if not order:
-            logger.warning(f"CDEK webhook: order not found: {order_uuid}")
-            return "OK"
-        
-        order.cdek_status = status_code
-        await db.commit()
-    except Exception as e:
-        logger.error(f"CDEK webhook error: {str(e)}", exc_info=True)
-    
+    # Событие сохраняется в inbox и обрабатывается воркером; ошибка записи — 500, CDEK повторит
+    await accept_webhook(
+        db,
+        CDEK,
+        dedup_key=f"{order_uuid}:{status_code}",
+        order_key=f"cdek:{order_uuid}",
+        body=raw_body.decode("utf-8"),
+    )
     return "OK"
+
+
+@webhook_handler(CDEK)
+async def process_cdek_order_status(db: AsyncSession, body: dict) -> None:
+    """Обновить cdek_status заказа по сохранённому вебхуку (вызывается воркером inbox)."""
+    order_uuid = body.get("uuid")
+    result = await db.execute(select(Order).where(Order.cdek_uuid == order_uuid))
+    order = result.scalar_one_or_none()
+    if not order:
+        logger.warning(f"CDEK webhook: order not found: {order_uuid}")
+        return
+    
+    order.cdek_status = (body.get("attributes") or {}).get("code")
@@ -0,0 +1,36 @@
+from pydantic import BaseModel, Field
+from typing import Optional, List
+from decimal import Decimal
+from src.schemas.orders import OrderProductCreate
+
+
+class CartQuoteRequest(BaseModel):
+    items: List[OrderProductCreate] = Field(..., min_length=1, max_length=300, description="Строки корзины")
+    promo_code: Optional[str] = Field(None, max_length=50, description="Промокод")
+
+
+class CartQuoteLine(BaseModel):
+    product_size_id: int
+    product_color_id: int
+    product_id: int
+    slug: str
+    title: str
+    size: str
+    quantity: int
+    unit_price: Decimal  # цена продажи с учётом цвета и скидки
+    line_total: Decimal
+    available_quantity: int
+    in_stock: bool
+
+
+class CartQuoteResponse(BaseModel):
+    lines: List[CartQuoteLine]
+    missing_size_ids: List[int] = Field(default_factory=list, description="Размеры, которых больше нет в каталоге")
+    items_total: Decimal
+    delivery_cost: Decimal
+    promo_code: Optional[str] = None
+    promo_valid: Optional[bool] = None  # None, если промокод не передан
+    promo_message: Optional[str] = None
+    discount_amount: Decimal
+    total: Decimal
+    can_checkout: bool  # все размеры найдены и в наличии
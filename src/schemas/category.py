@@ -1,5 +1,14 @@
 from pydantic import BaseModel, ConfigDict, Field
 from typing import Optional, List
+import enum
+
+
+class CategoryProductSort(str, enum.Enum):
+    MANUAL = "manual"  # ProductCategory.sort_order, как расставил админ
+    NEWEST = "newest"
+    PRICE_ASC = "price_asc"
+    PRICE_DESC = "price_desc"
+    POPULARITY = "popularity"
 
 
 class CategoryCreate(BaseModel):
@@ -79,6 +79,8 @@ class OrderProductDetail(BaseModel):
     currency: str
     size: str
     quantity: int
+    unit_price: Optional[Decimal] = None
+    weight: Optional[float] = None
 
     model_config = ConfigDict(from_attributes=True)
 
@@ -3,6 +3,7 @@ from datetime import datetime
 from typing import Optional, List
 from decimal import Decimal
 from src.models.product import ProductStatus
+import enum
 
 class ProductSectionBase(BaseModel):
     title: str = Field(..., max_length=200, description="Заголовок аккордеона")
@@ -159,11 +160,47 @@ class ProductSizeIn(BaseModel):
     size: str
     quantity: int = Field(default=0, ge=0, description="Количество (должно быть >= 0)")
 
+class ProductView(str, enum.Enum):
+    CARD = "card"  # сетка каталога: название, цена, размеры, основное фото
+    FULL = "full"  # полный ProductPublic
+
+class ProductFilters(BaseModel):
+    """Фильтры витрины. Пустые значения не ограничивают выборку."""
+    status: Optional[ProductStatus] = None
+    search: Optional[str] = None
+    price_min: Optional[Decimal] = Field(None, ge=0)
+    price_max: Optional[Decimal] = Field(None, ge=0)
+    sizes: List[str] = Field(default_factory=list)  # хотя бы один из размеров в наличии
+    colors: List[str] = Field(default_factory=list)  # название цвета или HEX
+    category: Optional[str] = None  # slug категории, включая подкатегории
+    collection_id: Optional[int] = None
+
+class SizeFacet(BaseModel):
+    value: str
+    count: int
+
+class ColorFacet(BaseModel):
+    label: str
+    hex: str
+    count: int
+
+class PriceFacet(BaseModel):
+    min: Optional[Decimal] = None
+    max: Optional[Decimal] = None
+
+class ProductFacets(BaseModel):
+    """Счётчики карточек по каждому измерению без учёта фильтра по самому измерению"""
+    sizes: List[SizeFacet] = Field(default_factory=list)
+    colors: List[ColorFacet] = Field(default_factory=list)
+    price: PriceFacet = Field(default_factory=PriceFacet)
+
 class ProductList(BaseModel):
     products: list[ProductPublic]
-    total: int
+    total: Optional[int] = None  # только при include_total=true
     skip: int
     limit: int
+    next_cursor: Optional[str] = None
+    facets: Optional[ProductFacets] = None  # только при facets=true
 
 class ProductColorDetail(BaseModel):
     """Детальная информация о цвете продукта"""
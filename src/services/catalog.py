@@ -1,8 +1,12 @@
+import json
 import logging
-from typing import Iterable, Sequence
+from typing import Iterable, Optional, Sequence
 
 from src.models.product import Product, ProductColor, ProductStatus
-from src.schemas.product import ProductMeta, ProductPublic, ProductSectionOut
+from src.schemas.product import (
+    ProductColorDetail, ProductDetail, ProductMeta, ProductPublic, ProductSectionOut, ProductView,
+)
+from src.services.errors import bad_request
 
 logger = logging.getLogger(__name__)
 
@@ -70,3 +74,98 @@ def build_product_public(
         created_at=getattr(color, "created_at", None),
         custom_sections=validate_sections(sections),
     )
+
+
+def build_product_detail(
+    product: Product,
+    colors: Sequence[ProductColor],
+    cards: dict,
+    *,
+    main_category: object = None,
+    sections: Sequence[object] = (),
+) -> ProductDetail:
+    """ProductDetail из базового продукта и готовых карточек его цветов.
+
+    Категория и секции берутся из карточек; для продукта без цветов их передаёт вызывающий.
+    """
+    colors_detail = []
+    for color in colors:
+        data = cards[color.id].data if color.id in cards else {}
+        if data:
+            main_category = data.get("main_category")
+            sections = data.get("custom_sections", [])
+        colors_detail.append(ProductColorDetail(
+            id=color.id,
+            color_id=color.id,
+            slug=color.slug,
+            title=color.title,
+            label=color.label,
+            hex=color.hex,
+            price=color.price,
+            discount_price=color.discount_price,
+            images=data.get("images", []),
+            sizes=data.get("sizes", []),
+        ))
+
+    return ProductDetail(
+        id=product.id,
+        title=colors_detail[0].title if colors_detail else None,
+        description=product.description,
+        price=product.price,
+        discount_price=product.discount_price,
+        currency=product.currency,
+        weight=product.weight,
+        composition=product.composition,
+        fit=product.fit,
+        status=product.status,
+        is_pre_order=product.is_pre_order,
+        main_category=main_category,
+        meta_care=product.meta_care,
+        meta_shipping=product.meta_shipping,
+        meta_returns=product.meta_returns,
+        size_chart=product.size_chart,
+        colors=colors_detail,
+        custom_sections=validate_sections(sections),
+    )
+
+
+# Поля лёгкой карточки для сетки каталога: без описания, состава, секций и лишних фото
+CARD_VIEW_FIELDS = (
+    "id", "product_id", "color_id", "slug", "title", "main_category",
+    "price", "discount_price", "currency", "label", "hex", "sizes", "images", "status",
+)
+
+
+def build_card_view(public: dict) -> dict:
+    """Проекция ProductPublic (в JSON-виде) для листингов: только основное фото."""
+    card = {field: public.get(field) for field in CARD_VIEW_FIELDS}
+    card["images"] = public.get("images", [])[:1]
+    return card
+
+
+def parse_fields(fields: Optional[str], view: ProductView) -> Optional[list[str]]:
+    """Разобрать fields=a,b,c; неизвестные поля — 400."""
+    if not fields:
+        return None
+    requested = list(dict.fromkeys(field.strip() for field in fields.split(",") if field.strip()))
+    allowed = CARD_VIEW_FIELDS if view == ProductView.CARD else ProductPublic.model_fields
+    unknown = [field for field in requested if field not in allowed]
+    if unknown:
+        raise bad_request(f"Unknown fields for view={view.value}: {', '.join(unknown)}")
+    return requested or None
+
+
+def uses_card_view(view: ProductView, fields: Optional[list[str]]) -> bool:
+    """Хватает ли лёгкой карточки: тогда полный JSON из БД не читается вовсе."""
+    if view == ProductView.CARD:
+        return True
+    # images в лёгкой карточке урезаны до основного фото, поэтому их берём из полной
+    return fields is not None and all(field in CARD_VIEW_FIELDS and field != "images" for field in fields)
+
+
+def card_json(row, fields: Optional[list[str]] = None) -> str:
+    """JSON карточки для ответа: текст из БД как есть, при fields= — только выбранные поля."""
+    if fields is None:
+        return row.payload
+    payload = json.loads(row.payload)
+    return json.dumps({field: payload.get(field) for field in fields}, ensure_ascii=False, separators=(",", ":"))
@@ -0,0 +1,70 @@
+"""Долгоживущие HTTP-клиенты платёжных и логистических провайдеров.
+
+На каждого провайдера (TBank, PayPal, CDEK) — один ``httpx.AsyncClient`` с пулом keep-alive
+соединений: запросы переиспользуют уже установленные TCP/TLS-соединения вместо рукопожатия
+на каждый вызов. Клиенты создаются в lifespan приложения и закрываются при остановке;
+вне lifespan (скрипты, тесты) клиент создаётся лениво при первом обращении.
+HTTP/2 включается, если установлен пакет ``h2`` (``httpx[http2]``).
+"""
+import importlib.util
+import logging
+
+import httpx
+
+from src.config import settings
+
+logger = logging.getLogger(__name__)
+
+TBANK = "tbank"
+PAYPAL = "paypal"
+CDEK = "cdek"
+PROVIDERS = (TBANK, PAYPAL, CDEK)
+
+_clients: dict[str, httpx.AsyncClient] = {}
+
+
+def http2_available() -> bool:
+    return settings.HTTP2_ENABLED and importlib.util.find_spec("h2") is not None
+
+
+def _provider_settings(provider: str) -> tuple[int, float]:
+    prefix = provider.upper()
+    return (
+        getattr(settings, f"{prefix}_HTTP_MAX_CONNECTIONS"),
+        getattr(settings, f"{prefix}_HTTP_TIMEOUT"),
+    )
+
+
+def build_http_client(provider: str) -> httpx.AsyncClient:
+    """Новый пул соединений с лимитами и таймаутами провайдера."""
+    max_connections, timeout = _provider_settings(provider)
+    return httpx.AsyncClient(
+        http2=http2_available(),
+        limits=httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_connections,
+            keepalive_expiry=settings.HTTP_KEEPALIVE_SECONDS,
+        ),
+        timeout=httpx.Timeout(timeout, connect=settings.HTTP_CONNECT_TIMEOUT),
+    )
+
+
+def get_http_client(provider: str) -> httpx.AsyncClient:
+    """Общий клиент провайдера; закрытый или ещё не созданный клиент создаётся заново."""
+    client = _clients.get(provider)
+    if client is None or client.is_closed:
+        client = _clients[provider] = build_http_client(provider)
+    return client
+
+
+async def start_http_clients() -> None:
+    for provider in PROVIDERS:
+        get_http_client(provider)
+    logger.info(f"Provider HTTP clients started (http2={http2_available()})")
+
+
+async def close_http_clients() -> None:
+    clients = list(_clients.values())
+    _clients.clear()
+    for client in clients:
+        await client.aclose()
@@ -0,0 +1,172 @@
+"""Idempotency-Key для POST-запросов с побочными эффектами (заказ, инициализация оплаты).
+
+Первый запрос с ключом занимает его в таблице idempotency_keys и сохраняет ответ (2xx и 4xx).
+Повтор с тем же телом получает сохранённый ответ, с другим телом — 422. Параллельный дубль
+ждёт завершения первого: в том же процессе — по событию, между процессами — опросом БД.
+Сбой (5xx, исключение) освобождает ключ, и повтор выполняет запрос заново.
+"""
+import asyncio
+import hashlib
+import json
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Any, Awaitable, Callable, Optional
+
+from fastapi import HTTPException, status
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, Response
+
+from src.config import settings
+from src.crud.idempotency import (
+    claim_idempotency_key, complete_idempotency_key, delete_idempotency_keys_before,
+    get_idempotency_key, release_idempotency_key,
+)
+from src.database import AsyncSessionLocal
+from src.models.idempotency import IdempotencyKey
+from src.services.errors import bad_request
+
+logger = logging.getLogger(__name__)
+
+MAX_KEY_LENGTH = 255
+# Интервал опроса БД, когда ключ занят другим процессом
+POLL_INTERVAL_SECONDS = 0.1
+REPLAYED_HEADER = "Idempotent-Replayed"
+
+# Выполняющиеся в этом процессе запросы: дубли ждут событие вместо опроса БД
+_inflight: dict[tuple[str, str], asyncio.Event] = {}
+
+
+def request_fingerprint(*parts: Any) -> str:
+    """sha256 канонического JSON частей запроса (тело, пользователь)"""
+    raw = json.dumps(jsonable_encoder(parts), sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def _is_expired(record: IdempotencyKey, now: datetime) -> bool:
+    if record.created_at is None:
+        return False
+    if record.state == IdempotencyKey.COMPLETED:
+        return record.created_at < now - timedelta(hours=settings.IDEMPOTENCY_KEY_TTL_HOURS)
+    return record.created_at < now - timedelta(seconds=settings.IDEMPOTENCY_LOCK_SECONDS)
+
+
+def _replay(record: IdempotencyKey) -> Response:
+    return Response(
+        content=record.response_body,
+        status_code=record.response_status,
+        media_type="application/json",
+        headers={REPLAYED_HEADER: "true"},
+    )
+
+
+async def _wait_for_owner(scope: str, key: str, timeout: float) -> None:
+    event = _inflight.get((scope, key))
+    if event is None:
+        await asyncio.sleep(min(POLL_INTERVAL_SECONDS, timeout))
+        return
+    try:
+        await asyncio.wait_for(event.wait(), timeout)
+    except asyncio.TimeoutError:
+        pass
+
+
+async def run_idempotent(
+    db,
+    *,
+    scope: str,
+    key: Optional[str],
+    fingerprint: str,
+    handler: Callable[[], Awaitable[Any]],
+    status_code: int = status.HTTP_200_OK,
+    store_if: Optional[Callable[[Any], bool]] = None,
+) -> Any:
+    """
+    Выполнить handler не больше одного раза на (scope, key).
+
+    Без ключа возвращает результат handler как есть; с ключом — JSON-ответ,
+    сохранённый для повторов. Результат, для которого store_if ложно (например,
+    неуспешный ответ платёжной системы), не сохраняется: ключ освобождается для повтора.
+    """
+    if key is None:
+        return await handler()
+    if not key.strip() or len(key) > MAX_KEY_LENGTH:
+        raise bad_request(f"Idempotency-Key must be 1-{MAX_KEY_LENGTH} characters")
+
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + settings.IDEMPOTENCY_WAIT_SECONDS
+    existing = await claim_idempotency_key(db, scope, key, fingerprint)
+    while existing is not None:
+        if existing.request_hash != fingerprint:
+            raise HTTPException(
+                status_code=422,
+                detail="Idempotency-Key was already used with a different request",
+            )
+        if _is_expired(existing, _utcnow()):
+            logger.warning(f"Idempotency key {scope}/{key} expired in state {existing.state}, reclaiming")
+            await release_idempotency_key(db, scope, key)
+        elif existing.state == IdempotencyKey.COMPLETED:
+            return _replay(existing)
+        else:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                raise HTTPException(
+                    status_code=status.HTTP_409_CONFLICT,
+                    detail="A request with this Idempotency-Key is still in progress",
+                )
+            await _wait_for_owner(scope, key, remaining)
+            existing = await get_idempotency_key(db, scope, key)
+            if existing is not None:
+                continue
+        existing = await claim_idempotency_key(db, scope, key, fingerprint)
+
+    event = asyncio.Event()
+    _inflight[(scope, key)] = event
+    stored = False
+    try:
+        try:
+            result = await handler()
+        except HTTPException as e:
+            if e.status_code >= 500:
+                raise
+            # Ошибка клиента (нет товара, неверный заказ) воспроизводится для повторов
+            await db.rollback()
+            body = json.dumps(jsonable_encoder({"detail": e.detail}))
+            await complete_idempotency_key(db, scope, key, e.status_code, body)
+            stored = True
+            raise
+        if store_if is not None and not store_if(result):
+            return result
+        content = jsonable_encoder(result)
+        await complete_idempotency_key(db, scope, key, status_code, json.dumps(content))
+        stored = True
+        return JSONResponse(content=content, status_code=status_code)
+    finally:
+        if not stored:
+            try:
+                await db.rollback()
+                await release_idempotency_key(db, scope, key)
+            except Exception as e:
+                logger.error(f"Failed to release idempotency key {scope}/{key}: {e}")
+        _inflight.pop((scope, key), None)
+        event.set()
+
+
+async def run_idempotency_key_cleanup(interval: float = 3600) -> None:
+    """Раз в interval секунд удалять ключи старше IDEMPOTENCY_KEY_TTL_HOURS."""
+    while True:
+        try:
+            async with AsyncSessionLocal() as db:
+                deleted = await delete_idempotency_keys_before(
+                    db, _utcnow() - timedelta(hours=settings.IDEMPOTENCY_KEY_TTL_HOURS)
+                )
+                if deleted:
+                    logger.info(f"Deleted {deleted} expired idempotency keys")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Idempotency key cleanup failed: {e}", exc_info=True)
+        await asyncio.sleep(interval)
@@ -0,0 +1,41 @@
+"""Потоковая отдача JSON-листингов из готового текста карточек.
+
+Карточки витрины хранятся в БД уже сериализованными (``product_cards.data``), поэтому листинг
+склеивает их текст в тело ответа как есть: без ORM-объектов, json.loads и повторного json.dumps.
+"""
+import json
+from typing import Iterable, Iterator, Optional
+
+from fastapi.responses import StreamingResponse
+
+# Размер куска, которым тело уходит в сокет
+CHUNK_SIZE = 64 * 1024
+
+
+def json_array_chunks(items: Iterable[str], *, prefix: str = "", suffix: str = "") -> Iterator[bytes]:
+    """Байты ``prefix[item,item,...]suffix`` кусками примерно по CHUNK_SIZE."""
+    buffer = [prefix, "["]
+    size = len(prefix) + 1
+    for index, item in enumerate(items):
+        if index:
+            buffer.append(",")
+        buffer.append(item)
+        size += len(item) + 1
+        if size >= CHUNK_SIZE:
+            yield "".join(buffer).encode("utf-8")
+            buffer, size = [], 0
+    buffer += ["]", suffix]
+    yield "".join(buffer).encode("utf-8")
+
+
+def stream_json_list(items: Iterable[str], headers: Optional[dict] = None) -> StreamingResponse:
+    """Ответ-массив из уже сериализованных JSON-элементов."""
+    return StreamingResponse(json_array_chunks(items), media_type="application/json", headers=headers)
+
+
+def stream_json_object(key: str, items: Iterable[str], extra: dict, headers: Optional[dict] = None) -> StreamingResponse:
+    """Ответ-объект ``{key: [...], **extra}``; массив склеивается из готовых JSON-элементов."""
+    prefix = json.dumps(key) + ":"
+    suffix = "".join(f",{json.dumps(name)}:{json.dumps(value, default=str)}" for name, value in extra.items())
+    chunks = json_array_chunks(items, prefix="{" + prefix, suffix=suffix + "}")
+    return StreamingResponse(chunks, media_type="application/json", headers=headers)
@@ -0,0 +1,84 @@
+"""Keyset-пагинация: непрозрачные курсоры и условия "строго после" для составного порядка."""
+import base64
+import json
+from dataclasses import dataclass
+from datetime import datetime
+from decimal import Decimal
+from typing import Any, Callable, Generic, Optional, Sequence, TypeVar
+
+from sqlalchemy import DateTime, Numeric, and_, or_
+from sqlalchemy.sql.elements import ColumnElement
+
+from src.services.errors import bad_request
+
+T = TypeVar("T")
+
+# Порядок листинга: (колонка, по убыванию). Колонки должны быть NOT NULL по смыслу,
+# последняя — уникальная, чтобы порядок был строгим
+KeysetOrder = Sequence[tuple[ColumnElement, bool]]
+
+
+@dataclass
+class Page(Generic[T]):
+    items: list[T]
+    next_cursor: Optional[str]
+
+
+def _encode_value(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        # Цена в курсоре хранится строкой, чтобы не терять точность на float
+        return str(value)
+    return value
+
+
+def _decode_value(column: ColumnElement, value: Any) -> Any:
+    if value is None:
+        return None
+    if isinstance(column.type, DateTime):
+        return datetime.fromisoformat(value)
+    if isinstance(column.type, Numeric) and column.type.asdecimal:
+        return Decimal(value)
+    return value
+
+
+def encode_cursor(values: Sequence[Any]) -> str:
+    payload = [_encode_value(value) for value in values]
+    raw = json.dumps(payload, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: Optional[str], order: KeysetOrder) -> Optional[list[Any]]:
+    """Разобрать курсор под заданный порядок; 400, если курсор битый или от другого листинга."""
+    if not cursor:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        values = json.loads(raw)
+        if not isinstance(values, list) or len(values) != len(order):
+            raise ValueError("cursor length mismatch")
+        return [_decode_value(column, value) for (column, _), value in zip(order, values)]
+    except (ValueError, TypeError, ArithmeticError):
+        raise bad_request("Invalid cursor")
+
+
+def keyset_order_by(order: KeysetOrder) -> list[ColumnElement]:
+    return [column.desc() if descending else column.asc() for column, descending in order]
+
+
+def keyset_after(order: KeysetOrder, values: Sequence[Any]) -> ColumnElement:
+    """(a, b, c) строго после значений курсора с учётом направления каждой колонки."""
+    clauses = []
+    for index, (column, descending) in enumerate(order):
+        equal_prefix = [prefix == value for (prefix, _), value in zip(order[:index], values[:index])]
+        step = column < values[index] if descending else column > values[index]
+        clauses.append(and_(*equal_prefix, step))
+    return or_(*clauses)
+
+
+def build_page(rows: Sequence[T], limit: int, key: Callable[[T], Sequence[Any]]) -> Page[T]:
+    """Страница из limit + 1 выбранных строк: лишняя строка означает, что есть продолжение."""
+    items = list(rows[:limit])
+    next_cursor = encode_cursor(key(items[-1])) if len(rows) > limit and items else None
+    return Page(items=items, next_cursor=next_cursor)
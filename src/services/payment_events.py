@@ -0,0 +1,142 @@
+"""Pub/sub смены статуса оплаты заказа для SSE-потока ``/payments/status/{order_id}/events``.
+
+Write-пути публикуют смену статуса через ``publish_payment_status`` внутри своей транзакции,
+подписчики получают событие только после commit:
+  memory   — доставка подписчикам этого процесса из события after_commit сессии;
+  postgres — ``pg_notify`` в транзакции (Postgres рассылает его при commit), каждый воркер
+             слушает канал отдельным соединением (LISTEN) и раздаёт события своим подписчикам.
+"""
+import asyncio
+import json
+import logging
+from typing import Optional
+
+from sqlalchemy import event, text
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from src.config import settings
+from src.models.orders import OrderStatus
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = "payment_status"
+# Ключ session.info с событиями, ждущими commit (memory-бэкенд)
+_PENDING_KEY = "payment_status_events"
+# Пауза перед переподключением LISTEN-соединения
+RECONNECT_SECONDS = 5.0
+
+# Очереди подписчиков по ID заказа
+_subscribers: dict[int, set[asyncio.Queue]] = {}
+
+
+class PaymentStatusSubscription:
+    """Подписка на статус одного заказа; закрыть через ``close`` (или ``with``)."""
+
+    def __init__(self, order_id: int):
+        self.order_id = order_id
+        self.queue: asyncio.Queue = asyncio.Queue()
+        _subscribers.setdefault(order_id, set()).add(self.queue)
+
+    async def get(self, timeout: float) -> Optional[str]:
+        """Следующий статус или None, если за timeout секунд его не было."""
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    def close(self) -> None:
+        queues = _subscribers.get(self.order_id)
+        if queues is not None:
+            queues.discard(self.queue)
+            if not queues:
+                del _subscribers[self.order_id]
+
+    def __enter__(self) -> "PaymentStatusSubscription":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+def subscribe(order_id: int) -> PaymentStatusSubscription:
+    return PaymentStatusSubscription(order_id)
+
+
+def deliver(order_id: int, status: str) -> None:
+    """Раздать статус подписчикам этого процесса."""
+    for queue in _subscribers.get(order_id, ()):
+        queue.put_nowait(status)
+
+
+async def publish_payment_status(db: AsyncSession, order_id: int, status: OrderStatus) -> None:
+    """Опубликовать смену статуса; подписчики получат её после commit транзакции db."""
+    if settings.PAYMENT_EVENTS_BACKEND == "postgres":
+        payload = json.dumps({"order_id": order_id, "status": status.value})
+        await db.execute(text("SELECT pg_notify(:channel, :payload)"), {"channel": CHANNEL, "payload": payload})
+    else:
+        db.info.setdefault(_PENDING_KEY, {})[order_id] = status.value
+
+
+@event.listens_for(Session, "after_commit")
+def _deliver_committed(session: Session) -> None:
+    for order_id, status in session.info.pop(_PENDING_KEY, {}).items():
+        deliver(order_id, status)
+
+
+@event.listens_for(Session, "after_rollback")
+def _drop_rolled_back(session: Session) -> None:
+    session.info.pop(_PENDING_KEY, None)
+
+
+# --- Postgres LISTEN ---
+_listener: Optional[asyncio.Task] = None
+
+
+def _on_notify(connection, pid, channel, payload: str) -> None:
+    try:
+        message = json.loads(payload)
+        deliver(int(message["order_id"]), message["status"])
+    except (ValueError, KeyError, TypeError) as e:
+        logger.warning(f"Malformed {CHANNEL} notification {payload!r}: {e}")
+
+
+async def _listen() -> None:
+    """Держать LISTEN-соединение к Postgres, переподключаясь при обрыве."""
+    import asyncpg
+
+    from src.database import engine
+
+    dsn = engine.url.set(drivername="postgresql").render_as_string(hide_password=False)
+    while True:
+        connection = None
+        try:
+            connection = await asyncpg.connect(dsn)
+            closed = asyncio.Event()
+            connection.add_termination_listener(lambda _: closed.set())
+            await connection.add_listener(CHANNEL, _on_notify)
+            logger.info(f"Listening for {CHANNEL} notifications")
+            await closed.wait()
+            logger.warning(f"{CHANNEL} listener connection closed, reconnecting")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"{CHANNEL} listener failed: {e}")
+        finally:
+            if connection is not None and not connection.is_closed():
+                await connection.close()
+        await asyncio.sleep(RECONNECT_SECONDS)
+
+
+async def start_payment_events() -> None:
+    global _listener
+    if settings.PAYMENT_EVENTS_BACKEND == "postgres" and _listener is None:
+        _listener = asyncio.create_task(_listen())
+
+
+async def stop_payment_events() -> None:
+    global _listener
+    if _listener is not None:
+        _listener.cancel()
+        await asyncio.gather(_listener, return_exceptions=True)
+        _listener = None
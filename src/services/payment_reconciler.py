@@ -0,0 +1,93 @@
+"""Фоновая сверка статусов оплаты с TBank и PayPal.
+
+Вместо запроса к провайдеру на каждый опрос страницы успешной оплаты воркер раз в
+PAYMENT_RECONCILE_INTERVAL_SECONDS берёт пачку неоплаченных заказов с payment_id,
+опрашивает провайдеров не более чем PAYMENT_RECONCILE_CONCURRENCY запросами одновременно
+и записывает изменившиеся статусы одной транзакцией.
+"""
+import asyncio
+import logging
+from typing import Optional
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.config import settings
+from src.crud.payment_checks import apply_payment_statuses, claim_payment_checks, claim_payment_refresh
+from src.database import AsyncSessionLocal
+from src.models.orders import OrderStatus
+from src.services import response_cache
+
+logger = logging.getLogger(__name__)
+
+
+async def _fetch_provider_status(provider: Optional[str], payment_id: str) -> Optional[OrderStatus]:
+    # Клиенты провайдеров живут в роутере оплаты, который сам импортирует этот модуль
+    from src.routers.payments import fetch_provider_status
+
+    return await fetch_provider_status(provider, payment_id)
+
+
+async def check_payments(
+    checks: list[tuple[int, Optional[str], str]],
+    *,
+    concurrency: Optional[int] = None,
+) -> dict[int, OrderStatus]:
+    """Опросить провайдеров по (id заказа, провайдер, payment_id); ошибки пропускают заказ до следующего прохода."""
+    semaphore = asyncio.Semaphore(concurrency or settings.PAYMENT_RECONCILE_CONCURRENCY)
+
+    async def check(order_id: int, provider: Optional[str], payment_id: str) -> Optional[OrderStatus]:
+        async with semaphore:
+            try:
+                return await _fetch_provider_status(provider, payment_id)
+            except Exception as e:
+                logger.warning(f"Payment status check failed for order {order_id}: {e}")
+                return None
+
+    results = await asyncio.gather(*(check(*row) for row in checks))
+    return {row[0]: new_status for row, new_status in zip(checks, results) if new_status is not None}
+
+
+async def reconcile_pending_payments(db: AsyncSession, *, batch_size: Optional[int] = None) -> int:
+    """Один проход сверки пачками; возвращает число заказов, получивших новый статус."""
+    batch_size = batch_size or settings.PAYMENT_RECONCILE_BATCH_SIZE
+    updated = 0
+    while True:
+        checks = await claim_payment_checks(db, batch_size=batch_size)
+        if not checks:
+            return updated
+        changed = await apply_payment_statuses(db, await check_payments(checks))
+        updated += changed
+        logger.info(f"Payment reconciliation: checked {len(checks)} orders, updated {changed}")
+        if len(checks) < batch_size:
+            return updated
+
+
+async def refresh_order_payment(db: AsyncSession, order_id: int, provider: Optional[str], payment_id: str) -> bool:
+    """
+    Внеочередная сверка одного заказа (force refresh статуса).
+
+    False, если заказ сверяли недавно и провайдер не опрашивался; True — статус сверен
+    (и записан, если оплата завершилась).
+    """
+    if not await claim_payment_refresh(db, order_id):
+        return False
+    new_status = await _fetch_provider_status(provider, payment_id)
+    if new_status is not None:
+        await apply_payment_statuses(db, {order_id: new_status})
+    return True
+
+
+async def run_payment_reconciler(interval: Optional[float] = None) -> None:
+    """Раз в interval секунд сверять неоплаченные заказы; ошибки прохода не останавливают цикл."""
+    interval = interval or settings.PAYMENT_RECONCILE_INTERVAL_SECONDS
+    while True:
+        try:
+            # Смена статуса двигает остатки и карточки; вне запроса кэш ответов сбрасываем сами
+            async with response_cache.collect_stale_keys():
+                async with AsyncSessionLocal() as db:
+                    await reconcile_pending_payments(db)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Payment reconciliation failed: {e}", exc_info=True)
+        await asyncio.sleep(interval)
@@ -0,0 +1,106 @@
+"""Правила цены корзины: общие для расчёта заказа, предварительного расчёта и карточек витрины."""
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from decimal import Decimal
+from typing import Optional, Sequence
+
+from src.models.product import Product, ProductColor, ProductSize
+from src.models.promocode import DiscountType, PromoCode
+
+DELIVERY_COST = Decimal("300.00")
+
+
+def unit_price(product: Product, color: ProductColor) -> Decimal:
+    """Цена продажи цвета: цена и скидка цвета перекрывают цену продукта, скидка — цену."""
+    price = color.price if color.price is not None else product.price
+    discount = color.discount_price if color.discount_price is not None else product.discount_price
+    return Decimal(str(discount if discount is not None else price))
+
+
+def promo_rejection(promo: Optional[PromoCode]) -> Optional[str]:
+    """Причина, по которой промокод нельзя применить, или None."""
+    if not promo:
+        return "Промокод не найден"
+    if not promo.is_active:
+        return "Промокод неактивен"
+    if promo.expires_at and promo.expires_at < datetime.now(timezone.utc).replace(tzinfo=None):
+        return "Срок действия промокода истек"
+    if promo.max_uses and promo.used_count >= promo.max_uses:
+        return "Промокод исчерпан"
+    return None
+
+
+def promo_discount(promo: PromoCode, items_total: Decimal) -> Decimal:
+    """Скидка по промокоду считается от стоимости товаров без доставки."""
+    if promo.discount_type == DiscountType.PERCENTAGE:
+        return (items_total * promo.discount_value / Decimal("100")).quantize(Decimal("0.01"))
+    return min(promo.discount_value, items_total)
+
+
+@dataclass
+class PricedLine:
+    product_size: ProductSize
+    color: ProductColor
+    product: Product
+    quantity: int
+    unit_price: Decimal
+    available: int  # остаток размера до этой строки (за вычетом предыдущих строк того же размера)
+
+    @property
+    def line_total(self) -> Decimal:
+        return self.unit_price * self.quantity
+
+    @property
+    def in_stock(self) -> bool:
+        return self.available >= self.quantity
+
+
+@dataclass
+class CartPrice:
+    lines: list[PricedLine]
+    items_total: Decimal
+    delivery_cost: Decimal
+    discount_amount: Decimal = Decimal("0.00")
+    promo: Optional[PromoCode] = None
+    promo_message: Optional[str] = None
+    missing_size_ids: list[int] = field(default_factory=list)
+
+    @property
+    def total(self) -> Decimal:
+        return self.items_total + self.delivery_cost - self.discount_amount
+
+
+def price_cart(
+    items: Sequence[tuple[int, int]],
+    sizes: dict[int, ProductSize],
+    colors: dict[int, ProductColor],
+    products: dict[int, Product],
+    *,
+    promo_code: Optional[str] = None,
+    promo: Optional[PromoCode] = None,
+) -> CartPrice:
+    """Посчитать корзину из пар (product_size_id, quantity) по загруженным сущностям."""
+    lines: list[PricedLine] = []
+    missing: list[int] = []
+    remaining = {size_id: product_size.quantity for size_id, product_size in sizes.items()}
+    for size_id, quantity in items:
+        product_size = sizes.get(size_id)
+        if product_size is None:
+            missing.append(size_id)
+            continue
+        color = colors[product_size.product_color_id]
+        product = products[color.product_id]
+        lines.append(PricedLine(
+            product_size, color, product, quantity, unit_price(product, color), available=remaining[size_id]
+        ))
+        remaining[size_id] -= quantity
+
+    items_total = sum((line.line_total for line in lines), Decimal("0.00"))
+    cart = CartPrice(lines=lines, items_total=items_total, delivery_cost=DELIVERY_COST, missing_size_ids=missing)
+    if promo_code:
+        cart.promo_message = promo_rejection(promo)
+        if cart.promo_message is None:
+            cart.promo = promo
+            cart.discount_amount = promo_discount(promo, items_total)
+            cart.promo_message = "Промокод применен"
+    return cart
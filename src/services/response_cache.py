@@ -0,0 +1,349 @@
+"""Кэш ответов публичного каталога с инвалидацией по surrogate-ключам.
+
+Роуты помечают кэшируемые ответы заголовком ``Surrogate-Key`` (см. ``surrogate_key_header``),
+middleware сохраняет анонимные GET-ответы под ключом path+query и снимает заголовок перед отдачей.
+Write-пути в crud вызывают ``mark_stale`` — ключи копятся в рамках запроса и
+сбрасываются из кэша до того, как клиент получит ответ на мутацию.
+"""
+import json
+import logging
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Iterable, Optional
+
+from src.config import settings
+from src.services import http_cache
+
+logger = logging.getLogger(__name__)
+
+SURROGATE_KEY_HEADER = "Surrogate-Key"
+_SURROGATE_KEY_HEADER_RAW = SURROGATE_KEY_HEADER.lower().encode("latin-1")
+
+PRODUCTS_KEY = "products"
+CATEGORIES_KEY = "categories"
+COLLECTIONS_KEY = "collections"
+# Отфильтрованные листинги и фасеты зависят от всех карточек, а не только от попавших на страницу
+PRODUCT_FILTERS_KEY = "product-filters"
+
+
+def product_key(product_id: int) -> str:
+    return f"product:{product_id}"
+
+
+def category_key(category_id: int) -> str:
+    return f"category:{category_id}"
+
+
+def collection_key(collection_id: int) -> str:
+    return f"collection:{collection_id}"
+
+
+def setting_key(key: str) -> str:
+    return f"setting:{key}"
+
+
+def surrogate_key_header(keys: Iterable[str]) -> dict[str, str]:
+    """Заголовок, которым роут разрешает кэшировать ответ и тегирует его."""
+    return {SURROGATE_KEY_HEADER: " ".join(sorted(set(keys)))}
+
+
+@dataclass
+class CachedResponse:
+    status: int
+    headers: list[tuple[bytes, bytes]]
+    body: bytes
+
+
+class ResponseCacheBackend:
+    """Интерфейс хранилища кэша ответов."""
+
+    async def get(self, key: str) -> Optional[CachedResponse]:
+        raise NotImplementedError
+
+    async def set(self, key: str, response: CachedResponse, tags: Iterable[str], ttl: int) -> None:
+        raise NotImplementedError
+
+    async def purge(self, tags: Iterable[str]) -> int:
+        raise NotImplementedError
+
+    async def clear(self) -> None:
+        raise NotImplementedError
+
+
+class InMemoryCacheBackend(ResponseCacheBackend):
+    """LRU в памяти процесса. При нескольких воркерах каждый держит свою копию."""
+
+    def __init__(self, max_entries: int = 2048):
+        self.max_entries = max_entries
+        self._entries: OrderedDict[str, tuple[float, CachedResponse, frozenset[str]]] = OrderedDict()
+        self._tags: dict[str, set[str]] = {}
+
+    async def get(self, key: str) -> Optional[CachedResponse]:
+        item = self._entries.get(key)
+        if item is None:
+            return None
+        expires_at, response, _ = item
+        if expires_at < time.monotonic():
+            self._drop(key)
+            return None
+        self._entries.move_to_end(key)
+        return response
+
+    async def set(self, key: str, response: CachedResponse, tags: Iterable[str], ttl: int) -> None:
+        self._drop(key)
+        tags = frozenset(tags)
+        self._entries[key] = (time.monotonic() + ttl, response, tags)
+        for tag in tags:
+            self._tags.setdefault(tag, set()).add(key)
+        while len(self._entries) > self.max_entries:
+            self._drop(next(iter(self._entries)))
+
+    async def purge(self, tags: Iterable[str]) -> int:
+        keys: set[str] = set()
+        for tag in tags:
+            keys.update(self._tags.get(tag, ()))
+        for key in keys:
+            self._drop(key)
+        return len(keys)
+
+    async def clear(self) -> None:
+        self._entries.clear()
+        self._tags.clear()
+
+    def _drop(self, key: str) -> None:
+        item = self._entries.pop(key, None)
+        if item is None:
+            return
+        for tag in item[2]:
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
+
+
+class RedisCacheBackend(ResponseCacheBackend):
+    """Общий кэш для нескольких воркеров (Redis-совместимый сервер, пакет ``redis``)."""
+
+    def __init__(self, url: str, prefix: str = "psih:response-cache:"):
+        try:
+            from redis import asyncio as redis_asyncio
+        except ImportError as exc:
+            raise RuntimeError("RESPONSE_CACHE_BACKEND=redis requires the 'redis' package") from exc
+        self._redis = redis_asyncio.from_url(url)
+        self.prefix = prefix
+
+    def _entry_key(self, key: str) -> str:
+        return f"{self.prefix}entry:{key}"
+
+    def _tag_key(self, tag: str) -> str:
+        return f"{self.prefix}tag:{tag}"
+
+    async def get(self, key: str) -> Optional[CachedResponse]:
+        meta, body = await self._redis.hmget(self._entry_key(key), "meta", "body")
+        if meta is None or body is None:
+            return None
+        meta = json.loads(meta)
+        headers = [(k.encode("latin-1"), v.encode("latin-1")) for k, v in meta["headers"]]
+        return CachedResponse(status=meta["status"], headers=headers, body=body)
+
+    async def set(self, key: str, response: CachedResponse, tags: Iterable[str], ttl: int) -> None:
+        meta = json.dumps({
+            "status": response.status,
+            "headers": [(k.decode("latin-1"), v.decode("latin-1")) for k, v in response.headers],
+        })
+        entry_key = self._entry_key(key)
+        async with self._redis.pipeline(transaction=True) as pipe:
+            pipe.hset(entry_key, mapping={"meta": meta, "body": response.body})
+            pipe.expire(entry_key, ttl)
+            for tag in tags:
+                pipe.sadd(self._tag_key(tag), key)
+                pipe.expire(self._tag_key(tag), ttl)
+            await pipe.execute()
+
+    async def purge(self, tags: Iterable[str]) -> int:
+        tag_keys = [self._tag_key(tag) for tag in tags]
+        if not tag_keys:
+            return 0
+        keys: set[bytes] = set()
+        for tag_key in tag_keys:
+            keys.update(await self._redis.smembers(tag_key))
+        entry_keys = [self._entry_key(k.decode()) for k in keys]
+        await self._redis.delete(*entry_keys, *tag_keys)
+        return len(keys)
+
+    async def clear(self) -> None:
+        async for key in self._redis.scan_iter(match=f"{self.prefix}*"):
+            await self._redis.delete(key)
+
+
+_backend: Optional[ResponseCacheBackend] = None
+
+
+def get_cache_backend() -> ResponseCacheBackend:
+    global _backend
+    if _backend is None:
+        if settings.RESPONSE_CACHE_BACKEND == "redis":
+            if not settings.REDIS_URL:
+                raise RuntimeError("RESPONSE_CACHE_BACKEND=redis requires REDIS_URL")
+            _backend = RedisCacheBackend(settings.REDIS_URL)
+        else:
+            _backend = InMemoryCacheBackend(settings.RESPONSE_CACHE_MAX_ENTRIES)
+    return _backend
+
+
+# --- Инвалидация ---
+_stale_keys: ContextVar[Optional[set[str]]] = ContextVar("response_cache_stale_keys", default=None)
+
+
+def mark_stale(*keys: str) -> None:
+    """Запомнить ключи, которые нужно сбросить после завершения текущей мутации."""
+    pending = _stale_keys.get()
+    if pending is not None:
+        pending.update(keys)
+
+
+async def purge_keys(keys: Iterable[str]) -> None:
+    keys = set(keys)
+    if not keys or not settings.RESPONSE_CACHE_ENABLED:
+        return
+    try:
+        purged = await get_cache_backend().purge(keys)
+        logger.debug("Response cache purged %s entries for %s", purged, sorted(keys))
+    except Exception as e:
+        logger.error(f"Response cache purge failed for {sorted(keys)}: {e}")
+
+
+@asynccontextmanager
+async def collect_stale_keys():
+    """Собирать ключи из ``mark_stale`` внутри блока и сбросить их на выходе.
+
+    Нужен для фоновых задач; HTTP-запросы оборачивает ``ResponseCacheMiddleware``.
+    """
+    pending: set[str] = set()
+    token = _stale_keys.set(pending)
+    try:
+        yield pending
+    finally:
+        _stale_keys.reset(token)
+        await purge_keys(pending)
+
+
+class ResponseCacheMiddleware:
+    """ASGI-кэш анонимных GET-ответов, помеченных заголовком ``Surrogate-Key``."""
+
+    def __init__(self, app, prefix: str = "/api"):
+        self.app = app
+        self.prefix = prefix
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not settings.RESPONSE_CACHE_ENABLED:
+            await self.app(scope, receive, send)
+            return
+        if scope["method"] == "GET":
+            if scope["path"].startswith(self.prefix) and not self._is_authenticated(scope):
+                await self._cached_get(scope, receive, send)
+            else:
+                await self.app(scope, receive, _strip_surrogate_key(send))
+            return
+        await self._mutation(scope, receive, send)
+
+    @staticmethod
+    def _is_authenticated(scope) -> bool:
+        return any(name == b"authorization" for name, _ in scope["headers"])
+
+    async def _cached_get(self, scope, receive, send):
+        key = scope["path"]
+        if scope.get("query_string"):
+            key = f"{key}?{scope['query_string'].decode('latin-1')}"
+        backend = get_cache_backend()
+        try:
+            cached = await backend.get(key)
+        except Exception as e:
+            logger.error(f"Response cache read failed for {key}: {e}")
+            cached = None
+        if cached is not None:
+            if await self._send_not_modified(scope, cached, send):
+                return
+            await send({
+                "type": "http.response.start",
+                "status": cached.status,
+                "headers": cached.headers + [(b"x-cache", b"HIT")],
+            })
+            await send({"type": "http.response.body", "body": cached.body})
+            return
+
+        state: dict = {"tags": None, "body": []}
+
+        async def capture(message):
+            if message["type"] == "http.response.start":
+                headers = []
+                for name, value in message.get("headers", []):
+                    if name.lower() == _SURROGATE_KEY_HEADER_RAW:
+                        state["tags"] = value.decode("latin-1").split()
+                    else:
+                        headers.append((name, value))
+                if message["status"] != 200:
+                    state["tags"] = None
+                state["status"] = message["status"]
+                state["headers"] = headers
+                message = {**message, "headers": headers + [(b"x-cache", b"MISS")]}
+            elif message["type"] == "http.response.body" and state["tags"] is not None:
+                state["body"].append(message.get("body", b""))
+                if not message.get("more_body", False):
+                    response = CachedResponse(state["status"], state["headers"], b"".join(state["body"]))
+                    try:
+                        await backend.set(key, response, state["tags"], settings.RESPONSE_CACHE_TTL_SECONDS)
+                    except Exception as e:
+                        logger.error(f"Response cache write failed for {key}: {e}")
+            await send(message)
+
+        await self.app(scope, receive, capture)
+
+    @staticmethod
+    async def _send_not_modified(scope, cached: CachedResponse, send) -> bool:
+        """Ответить 304 из кэша, если клиент прислал совпадающий If-None-Match."""
+        if_none_match = next((v for n, v in scope["headers"] if n == b"if-none-match"), None)
+        etag = next((v for n, v in cached.headers if n.lower() == b"etag"), None)
+        if if_none_match is None or etag is None:
+            return False
+        if not http_cache.etag_matches(if_none_match.decode("latin-1"), etag.decode("latin-1")):
+            return False
+        validators = {b"etag", b"cache-control", b"last-modified"}
+        await send({
+            "type": "http.response.start",
+            "status": 304,
+            "headers": [(n, v) for n, v in cached.headers if n.lower() in validators] + [(b"x-cache", b"HIT")],
+        })
+        await send({"type": "http.response.body", "body": b""})
+        return True
+
+    async def _mutation(self, scope, receive, send):
+        pending: set[str] = set()
+        token = _stale_keys.set(pending)
+
+        async def purge_before_response(message):
+            # Мутация уже закоммичена: сбрасываем кэш до того, как клиент увидит ответ
+            if message["type"] == "http.response.start" and pending:
+                keys = set(pending)
+                pending.clear()
+                await purge_keys(keys)
+            await send(message)
+
+        try:
+            await self.app(scope, receive, purge_before_response)
+        finally:
+            _stale_keys.reset(token)
+            await purge_keys(pending)
+
+
+def _strip_surrogate_key(send):
+    async def wrapped(message):
+        if message["type"] == "http.response.start":
+            headers = [(n, v) for n, v in message.get("headers", []) if n.lower() != _SURROGATE_KEY_HEADER_RAW]
+            message = {**message, "headers": headers}
+        await send(message)
+    return wrapped
@@ -0,0 +1,76 @@
+"""Поиск по карточкам витрины: выбор реализации по диалекту БД.
+
+Каждая реализация добавляет к запросу по ``product_cards`` условие поиска и возвращает
+выражение релевантности (больше — лучше), по которому сортируется выдача.
+"""
+import re
+from typing import Optional
+
+from sqlalchemy import Float, Select, column, func, literal_column, or_, table, text, type_coerce
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.sql.elements import ColumnElement
+
+from src.models.product import ProductCard
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+class PostgresProductSearch:
+    """tsvector (russian + english) с GIN-индексом и pg_trgm для опечаток и частичных слов."""
+
+    def apply(self, query: Select, term: str) -> tuple[Select, ColumnElement]:
+        search_vector = literal_column("product_cards.search_vector")
+        ts_query = func.websearch_to_tsquery(text("'russian'::regconfig"), term).op("||")(
+            func.websearch_to_tsquery(text("'english'::regconfig"), term)
+        )
+        matches_text = search_vector.op("@@")(ts_query)
+        # term <% search_text: слово из текста похоже на запрос (индекс gin_trgm_ops)
+        matches_trigram = type_coerce(term, ProductCard.search_text.type).op("<%")(ProductCard.search_text)
+        rank = type_coerce(
+            func.ts_rank(search_vector, ts_query) + func.word_similarity(term, ProductCard.search_text),
+            Float,
+        )
+        return query.where(or_(matches_text, matches_trigram)), rank
+
+
+_SQLITE_FTS_TABLE = table("product_cards_fts", column("rowid"))
+
+
+class SqliteProductSearch:
+    """FTS5 для локальной разработки и тестов: префиксный поиск по словам, ранжирование bm25."""
+
+    def apply(self, query: Select, term: str) -> tuple[Select, ColumnElement]:
+        fts = literal_column("product_cards_fts")
+        # Каждое слово запроса — отдельная фраза с префиксным совпадением, слова через AND
+        match = " ".join(f'"{token}"*' for token in _TOKEN_RE.findall(term))
+        query = query.join_from(
+            ProductCard, _SQLITE_FTS_TABLE, _SQLITE_FTS_TABLE.c.rowid == ProductCard.color_id
+        ).where(fts.op("MATCH")(match))
+        # bm25 возвращает отрицательные значения: чем меньше, тем релевантнее
+        rank = type_coerce(-func.bm25(fts), Float)
+        return query, rank
+
+
+class LikeProductSearch:
+    """Запасной вариант для прочих диалектов: подстрока без индекса."""
+
+    def apply(self, query: Select, term: str) -> tuple[Select, ColumnElement]:
+        return query.where(ProductCard.search_text.ilike(f"%{term}%")), None
+
+
+_BACKENDS = {
+    "postgresql": PostgresProductSearch(),
+    "sqlite": SqliteProductSearch(),
+}
+
+
+def normalize_search(search: Optional[str]) -> Optional[str]:
+    """Пустой запрос или запрос без слов поиском не считается."""
+    if not search or not _TOKEN_RE.search(search):
+        return None
+    return search.strip()
+
+
+def apply_product_search(db: AsyncSession, query: Select, term: str) -> tuple[Select, Optional[ColumnElement]]:
+    backend = _BACKENDS.get(db.bind.dialect.name, LikeProductSearch())
+    return backend.apply(query, term)
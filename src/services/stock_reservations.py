@@ -0,0 +1,32 @@
+"""Фоновый воркер, возвращающий на витрину остатки неоплаченных заказов с истёкшим резервом."""
+import asyncio
+import logging
+from datetime import datetime
+from typing import Optional
+
+from src.config import settings
+from src.crud.reservations import release_expired_reservations
+from src.database import AsyncSessionLocal
+from src.services import response_cache
+
+logger = logging.getLogger(__name__)
+
+
+async def sweep_expired_reservations(now: Optional[datetime] = None) -> int:
+    """Один проход воркера; вне HTTP-запроса ключи кэша ответов сбрасываются здесь же."""
+    async with response_cache.collect_stale_keys():
+        async with AsyncSessionLocal() as db:
+            return await release_expired_reservations(db, now=now)
+
+
+async def run_reservation_sweeper(interval: Optional[float] = None) -> None:
+    """Раз в interval секунд освобождать истёкшие резервы; ошибки прохода не останавливают цикл."""
+    interval = interval or settings.STOCK_RESERVATION_SWEEP_SECONDS
+    while True:
+        try:
+            await sweep_expired_reservations()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Stock reservation sweep failed: {e}", exc_info=True)
+        await asyncio.sleep(interval)
@@ -0,0 +1,46 @@
+"""Кеш OAuth-токенов провайдеров с single-flight обновлением.
+
+Токен живёт до ``expires_in`` минус запас; когда он истекает, параллельные запросы ждут
+одного общего обновления, а не запрашивают токен каждый сам.
+"""
+import asyncio
+import time
+from typing import Awaitable, Callable, Optional
+
+# fetch возвращает (токен, expires_in в секундах)
+TokenFetcher = Callable[[], Awaitable[tuple[str, float]]]
+
+
+class TokenCache:
+    def __init__(self, fetch: TokenFetcher, *, refresh_margin: float = 300.0):
+        self._fetch = fetch
+        self._refresh_margin = refresh_margin
+        self._token: Optional[str] = None
+        self._expires_at = 0.0
+        self._refresh: Optional[asyncio.Task] = None
+
+    def _valid(self) -> bool:
+        return self._token is not None and time.monotonic() < self._expires_at
+
+    async def get(self) -> str:
+        """Действующий токен; при необходимости — одно общее обновление на всех ожидающих."""
+        if self._valid():
+            return self._token
+        refresh = self._refresh
+        if refresh is None or refresh.done() or refresh.get_loop() is not asyncio.get_running_loop():
+            refresh = self._refresh = asyncio.create_task(self._do_refresh())
+        # shield: отмена одного ожидающего не отменяет обновление для остальных
+        return await asyncio.shield(refresh)
+
+    async def _do_refresh(self) -> str:
+        token, expires_in = await self._fetch()
+        # Короткоживущий токен кешируется хотя бы на половину срока
+        margin = min(self._refresh_margin, expires_in / 2)
+        self._token = token
+        self._expires_at = time.monotonic() + expires_in - margin
+        return token
+
+    def invalidate(self) -> None:
+        """Сбросить токен, например после 401 от провайдера."""
+        self._token = None
+        self._expires_at = 0.0
@@ -0,0 +1,128 @@
+"""Входящие вебхуки провайдеров: быстрый ответ и надёжная обработка.
+
+Роут проверяет подпись/источник, сохраняет сырое тело в webhook_inbox с ключом дедупликации
+и сразу отвечает провайдеру. Если сохранить не удалось, роут отвечает ошибкой, и провайдер
+повторит доставку. Пул воркеров разбирает очередь: события одного заказа — строго по порядку,
+разных заказов — параллельно (WEBHOOK_WORKERS). Обработчик и отметка о завершении
+фиксируются одной транзакцией; при ошибке событие повторяется с растущей паузой, после
+WEBHOOK_MAX_ATTEMPTS попыток становится dead и ждёт replay (``python replay_webhooks.py``).
+Обработанные события удаляются через WEBHOOK_INBOX_RETENTION_DAYS дней.
+"""
+import asyncio
+import json
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Any, Awaitable, Callable, Optional
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.config import settings
+from src.crud.webhook_inbox import (
+    claim_webhook_events, complete_webhook_event, delete_webhook_events_before, fail_webhook_event,
+    store_webhook_event,
+)
+from src.database import AsyncSessionLocal
+from src.models.webhooks import WebhookEvent
+from src.services import response_cache
+
+logger = logging.getLogger(__name__)
+
+TBANK = "tbank"
+CDEK = "cdek"
+
+WebhookHandler = Callable[[AsyncSession, dict[str, Any]], Awaitable[None]]
+
+# Обработчики по провайдеру; регистрируются роутерами через webhook_handler
+_handlers: dict[str, WebhookHandler] = {}
+# Будит воркер этого процесса, когда роут сохранил новое событие
+_wakeup: Optional[asyncio.Event] = None
+
+
+def webhook_handler(provider: str) -> Callable[[WebhookHandler], WebhookHandler]:
+    """Декоратор: обработчик тела вебхука провайдера. Не делает commit — это делает воркер."""
+    def register(handler: WebhookHandler) -> WebhookHandler:
+        _handlers[provider] = handler
+        return handler
+    return register
+
+
+async def accept_webhook(db: AsyncSession, provider: str, *, dedup_key: str, order_key: str, body: str) -> bool:
+    """Сохранить вебхук в очередь; False — дубль уже полученного события."""
+    stored = await store_webhook_event(db, provider, dedup_key, order_key, body)
+    if stored and _wakeup is not None:
+        _wakeup.set()
+    elif not stored:
+        logger.info(f"Duplicate {provider} webhook {dedup_key} ignored")
+    return stored
+
+
+async def process_webhook_event(event: WebhookEvent) -> bool:
+    """Обработать одно взятое в работу событие; True — успешно."""
+    # Обработчик может двигать остатки (оплата, отмена): ключи кэша ответов сбрасываются на выходе
+    async with response_cache.collect_stale_keys(), AsyncSessionLocal() as db:
+        try:
+            handler = _handlers[event.provider]
+            await handler(db, json.loads(event.body))
+            await complete_webhook_event(db, event.id)
+            await db.commit()
+            return True
+        except Exception as e:
+            await db.rollback()
+            state = await fail_webhook_event(db, event, f"{type(e).__name__}: {e}")
+            log = logger.error if state == WebhookEvent.DEAD else logger.warning
+            log(f"{event.provider} webhook {event.id} failed (attempt {event.attempts}, now {state}): {e}")
+            return False
+
+
+async def process_pending_webhooks(*, workers: Optional[int] = None) -> int:
+    """Разбирать очередь, пока есть готовые события; возвращает число обработанных."""
+    semaphore = asyncio.Semaphore(workers or settings.WEBHOOK_WORKERS)
+
+    async def run(event: WebhookEvent) -> bool:
+        async with semaphore:
+            return await process_webhook_event(event)
+
+    processed = 0
+    while True:
+        async with AsyncSessionLocal() as db:
+            events = await claim_webhook_events(db)
+        if not events:
+            return processed
+        # В пачке не больше одного события на заказ: порядок внутри заказа сохраняется
+        # Неудачные события уходят на повтор с паузой и в следующую пачку не попадут
+        processed += sum(await asyncio.gather(*(run(event) for event in events)))
+
+
+async def run_webhook_worker(poll_interval: Optional[float] = None) -> None:
+    """Фоновый разбор webhook_inbox: по сигналу от роута и раз в poll_interval секунд (повторы, другие воркеры)."""
+    global _wakeup
+    poll_interval = poll_interval or settings.WEBHOOK_POLL_SECONDS
+    _wakeup = asyncio.Event()
+    while True:
+        _wakeup.clear()
+        try:
+            await process_pending_webhooks()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Webhook inbox processing failed: {e}", exc_info=True)
+        try:
+            await asyncio.wait_for(_wakeup.wait(), poll_interval)
+        except asyncio.TimeoutError:
+            pass
+
+
+async def run_webhook_inbox_cleanup(interval: float = 3600) -> None:
+    """Раз в interval секунд удалять обработанные события старше WEBHOOK_INBOX_RETENTION_DAYS."""
+    while True:
+        try:
+            async with AsyncSessionLocal() as db:
+                cutoff = datetime.now(timezone.utc) - timedelta(days=settings.WEBHOOK_INBOX_RETENTION_DAYS)
+                deleted = await delete_webhook_events_before(db, cutoff.replace(tzinfo=None))
+                if deleted:
+                    logger.info(f"Deleted {deleted} processed webhook events")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Webhook inbox cleanup failed: {e}", exc_info=True)
+        await asyncio.sleep(interval)
@@ -20,14 +20,18 @@ from typing import Optional
 import httpx
 import pytest
 from httpx import ASGITransport
+from sqlalchemy import event
 
 from src.main import app
+from src.crud.category import rebuild_category_closure
+from src.crud.product import rebuild_product_cards
 from src.database import AsyncSessionLocal, engine
 from src.models.base import Base
 from src.models.category import Category, ProductCategory
 from src.models.collection import Collection, CollectionCategory, CollectionProduct
 from src.models.product import Product, ProductColor, ProductSize
 from src.models.user import User
+from src.services.response_cache import get_cache_backend
 from src.utils import get_password_hash
 
 TEST_USER_EMAIL = "user@example.com"
@@ -42,6 +46,8 @@ async def reset_database(monkeypatch):
     from src.routers import product as product_router
     from src.routers import site_settings as settings_router
 
+    await get_cache_backend().clear()
+
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.drop_all)
         await conn.run_sync(Base.metadata.create_all)
@@ -123,6 +129,8 @@ async def reset_database(monkeypatch):
         session.add(CollectionProduct(collection_id=collection.id, product_id=product.id, sort_order=0))
 
         await session.commit()
+        await rebuild_category_closure(session)
+        await rebuild_product_cards(session)
 
     async def fake_upload_image(file):
         return f"http://testserver/media/{file.filename}"
@@ -188,6 +196,19 @@ async def auth_headers(auth_token: Optional[str]) -> dict:
     return {}
 
 
+@pytest.fixture
+def query_counter():
+    """Собирает SQL-запросы, выполненные через движок за время теста."""
+    statements: list[str] = []
+
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine.sync_engine, "before_cursor_execute", _before_cursor_execute)
+    yield statements
+    event.remove(engine.sync_engine, "before_cursor_execute", _before_cursor_execute)
+
+
 @pytest.fixture
 async def db_session():
     async with AsyncSessionLocal() as session:
@@ -0,0 +1,72 @@
+"""
+Тесты предварительного расчёта корзины
+"""
+import pytest
+import httpx
+
+ORDER_CONTACTS = {
+    "email": "guest@example.com",
+    "first_name": "Guest",
+    "last_name": "User",
+    "phone": "+1234567890",
+    "city": "Moscow",
+    "postal_code": "123456",
+    "address": "Test Address 123",
+}
+
+
+async def _seed_size(client: httpx.AsyncClient) -> dict:
+    product = (await client.get("/api/products")).json()["products"][0]
+    return {"color_id": product["id"], "size_id": product["sizes"][0]["id"]}
+
+
+@pytest.mark.asyncio
+async def test_cart_quote_matches_created_order(client: httpx.AsyncClient, auth_headers: dict, db_session):
+    """Итог расчёта совпадает с суммой созданного заказа: цена цвета, промокод и доставка"""
+    from src.crud.promocode import create_promo_code
+    from src.models.promocode import DiscountType
+    from src.schemas.promocode import PromoCodeCreate
+
+    seed = await _seed_size(client)
+    await client.put(f"/api/products/colors/{seed['color_id']}", json={"discount_price": "80.00"}, headers=auth_headers)
+    await create_promo_code(db_session, PromoCodeCreate(code="SALE10", discount_type=DiscountType.PERCENTAGE, discount_value=10))
+
+    items = [{"product_size_id": seed["size_id"], "quantity": 2}]
+    quote = await client.post("/api/cart/quote", json={"items": items, "promo_code": "sale10"})
+    assert quote.status_code == 200
+    data = quote.json()
+    assert data["lines"][0]["unit_price"] == "80.00"
+    assert data["lines"][0]["line_total"] == "160.00"
+    assert data["items_total"] == "160.00"
+    assert data["discount_amount"] == "16.00"
+    assert data["total"] == "444.00"
+    assert data["promo_valid"] is True
+    assert data["can_checkout"] is True
+
+    order = await client.post("/api/orders", json={"order": {**ORDER_CONTACTS, "promo_code": "sale10"}, "products": items})
+    assert order.status_code == 201
+    assert order.json()["total_price"] == data["total"]
+
+
+@pytest.mark.asyncio
+async def test_cart_quote_reports_stock_and_missing_sizes(client: httpx.AsyncClient, query_counter):
+    """Нехватка остатка, удалённые размеры и неверный промокод не ломают расчёт"""
+    seed = await _seed_size(client)
+    items = [
+        {"product_size_id": seed["size_id"], "quantity": 6},
+        {"product_size_id": seed["size_id"], "quantity": 6},
+        {"product_size_id": 999999, "quantity": 1},
+    ]
+    query_counter.clear()
+    response = await client.post("/api/cart/quote", json={"items": items, "promo_code": "NOPE"})
+    assert response.status_code == 200
+    # Размеры, цвета, продукты и промокод — по одному запросу на всю корзину
+    assert len(query_counter) == 4
+
+    data = response.json()
+    assert [line["in_stock"] for line in data["lines"]] == [True, False]
+    assert data["missing_size_ids"] == [999999]
+    assert data["promo_valid"] is False
+    assert data["promo_message"] == "Промокод не найден"
+    assert data["discount_amount"] == "0.00"
+    assert data["can_checkout"] is False
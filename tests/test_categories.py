@@ -78,3 +78,158 @@ async def test_delete_category(client: httpx.AsyncClient, auth_token: str):
     # Может быть 204 (если админ и категория существует) или 403/404
     assert response.status_code in [204, 403, 404]
 
+
+
+@pytest.mark.asyncio
+async def test_category_subtree_products(client: httpx.AsyncClient, auth_headers: dict, db_session):
+    """Продукты подкатегорий видны в родительской категории, удаление чистит closure"""
+    from sqlalchemy import select
+    from src.models.category import CategoryClosure
+
+    parent = await client.post(
+        "/api/categories",
+        headers=auth_headers,
+        json={"name": "Tops", "slug": "tops", "level": 0, "sort_order": 0, "is_active": True},
+    )
+    assert parent.status_code == 201
+    child = await client.post(
+        "/api/categories",
+        headers=auth_headers,
+        json={
+            "name": "Shirts",
+            "slug": "shirts",
+            "parent_id": parent.json()["id"],
+            "level": 1,
+            "sort_order": 0,
+            "is_active": True,
+        },
+    )
+    assert child.status_code == 201
+    child_id = child.json()["id"]
+
+    response = await client.post(
+        "/api/products/base/1/categories",
+        headers=auth_headers,
+        json={"category_id": child_id},
+    )
+    assert response.status_code == 204
+
+    response = await client.get("/api/categories/tops")
+    assert response.status_code == 200
+    assert [p["slug"] for p in response.json()] == ["seed-product"]
+
+    response = await client.delete(f"/api/categories/{child_id}", headers=auth_headers)
+    assert response.status_code == 204
+
+    rows = await db_session.execute(
+        select(CategoryClosure).where(
+            (CategoryClosure.ancestor_id == child_id) | (CategoryClosure.descendant_id == child_id)
+        )
+    )
+    assert rows.scalars().all() == []
+    response = await client.get("/api/categories/tops")
+    assert response.json() == []
+
+
+@pytest.mark.asyncio
+async def test_category_products_paginated_and_sorted(client: httpx.AsyncClient, db_session):
+    """Листинг категории отдаётся страницами в ручном порядке, по цене и по популярности"""
+    from sqlalchemy import select
+    from src.crud.product import rebuild_product_cards
+    from src.models.category import Category, ProductCategory
+    from src.models.product import Product, ProductColor, ProductSize
+
+    category = (await db_session.execute(select(Category).where(Category.slug == "outerwear"))).scalar_one()
+    prices = ["30.00", "10.00", "20.00", "50.00"]
+    for index, price in enumerate(prices):
+        product = Product(description=f"Sorted {index}", price=price, weight=0.3, currency="RUB")
+        db_session.add(product)
+        await db_session.flush()
+        color = ProductColor(product_id=product.id, slug=f"sorted-{index}", title=f"Sorted {index}", label="Red", hex="#FF0000")
+        db_session.add(color)
+        await db_session.flush()
+        db_session.add(ProductSize(product_color_id=color.id, size="S", quantity=5))
+        db_session.add(ProductCategory(product_id=product.id, category_id=category.id, sort_order=index + 1))
+    await db_session.commit()
+    await rebuild_product_cards(db_session)
+
+    async def walk(query: str) -> list[str]:
+        slugs, cursor = [], None
+        while True:
+            url = f"/api/categories/outerwear?limit=2&{query}" + (f"&cursor={cursor}" if cursor else "")
+            response = await client.get(url)
+            assert response.status_code == 200
+            slugs += [p["slug"] for p in response.json()]
+            cursor = response.headers.get("x-next-cursor")
+            if not cursor:
+                return slugs
+
+    assert await walk("") == ["seed-product", "sorted-0", "sorted-1", "sorted-2", "sorted-3"]
+    assert await walk("sort=price_asc") == ["sorted-1", "sorted-2", "sorted-0", "sorted-3", "seed-product"]
+    assert await walk("sort=price_desc") == ["seed-product", "sorted-3", "sorted-0", "sorted-2", "sorted-1"]
+
+    first = await client.get("/api/categories/outerwear?limit=2&include_total=true")
+    assert first.headers["x-total-count"] == "5"
+    assert len(first.json()) == 2
+
+    target = (await client.get("/api/categories/outerwear?sort=price_desc&limit=2")).json()[1]
+    order = await client.post(
+        "/api/orders",
+        json={
+            "order": {
+                "email": "guest@example.com",
+                "first_name": "Guest",
+                "last_name": "User",
+                "phone": "+1234567890",
+                "city": "Moscow",
+                "postal_code": "123456",
+                "address": "Test Address 123",
+            },
+            "products": [{"product_size_id": target["sizes"][0]["id"], "quantity": 3}],
+        },
+    )
+    assert order.status_code == 201
+    popular = (await client.get("/api/categories/outerwear?sort=popularity")).json()
+    assert popular[0]["slug"] == "sorted-3"
+
+    assert (await client.get("/api/categories/outerwear?cursor=broken")).status_code == 400
+
+
+@pytest.mark.asyncio
+async def test_category_product_linked_twice_in_subtree_listed_once(client: httpx.AsyncClient, db_session):
+    """Продукт, привязанный к категории и её подкатегории, отдаётся в листинге один раз"""
+    from sqlalchemy import select
+    from src.crud.category import rebuild_category_closure
+    from src.models.category import Category, ProductCategory
+    from src.models.product import ProductColor
+
+    parent = (await db_session.execute(select(Category).where(Category.slug == "outerwear"))).scalar_one()
+    child = Category(name="Coats", slug="coats", parent_id=parent.id, level=1, sort_order=0, is_active=True)
+    db_session.add(child)
+    await db_session.flush()
+    seed = (await db_session.execute(select(ProductColor).where(ProductColor.slug == "seed-product"))).scalar_one()
+    db_session.add(ProductCategory(product_id=seed.product_id, category_id=child.id, sort_order=5))
+    await db_session.commit()
+    await rebuild_category_closure(db_session)
+
+    response = await client.get("/api/categories/outerwear?include_total=true")
+    assert [p["slug"] for p in response.json()] == ["seed-product"]
+    assert response.headers["x-total-count"] == "1"
+
+
+@pytest.mark.asyncio
+async def test_popularity_ignores_legacy_uppercase_cancelled_orders(client: httpx.AsyncClient, db_session):
+    """Отменённые заказы со статусом в верхнем регистре не учитываются в продажах"""
+    from sqlalchemy import text
+    from src.crud.product import get_sales_for_colors
+
+    order = (await client.post("/api/orders", json={
+        "order": {"email": "legacy@example.com", "first_name": "Legacy", "last_name": "User"},
+        "products": [{"product_size_id": 1, "quantity": 2}],
+    })).json()
+    color_id = (await client.get("/api/products")).json()["products"][0]["id"]
+    assert await get_sales_for_colors(db_session, [color_id]) == {color_id: 2}
+
+    await db_session.execute(text("UPDATE orders SET status = 'CANCELLED' WHERE id = :id"), {"id": order["id"]})
+    await db_session.commit()
+    assert await get_sales_for_colors(db_session, [color_id]) == {}
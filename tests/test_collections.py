@@ -97,6 +97,22 @@ async def test_update_collection(client: httpx.AsyncClient, auth_token: str):
     assert response.status_code in [200, 403, 404]
 
 
+@pytest.mark.asyncio
+async def test_update_existing_collection(client: httpx.AsyncClient, auth_headers: dict):
+    """PUT существующей коллекции возвращает обновлённые данные, а чтение видит изменения"""
+    collection_id = (await client.get("/api/collections?skip=0&limit=1")).json()["collections"][0]["id"]
+    await client.get(f"/api/collections/{collection_id}")  # прогреваем кэш ответа
+
+    response = await client.put(
+        f"/api/collections/{collection_id}",
+        headers=auth_headers,
+        json={"description": "Updated description"},
+    )
+    assert response.status_code == 200
+    assert response.json()["description"] == "Updated description"
+    assert (await client.get(f"/api/collections/{collection_id}")).json()["description"] == "Updated description"
+
+
 @pytest.mark.asyncio
 async def test_delete_collection(client: httpx.AsyncClient, auth_token: str):
     """Тест удаления коллекции (только для админов)"""
@@ -154,3 +170,24 @@ async def test_delete_collection_image(client: httpx.AsyncClient, auth_token: st
     # Может быть 204 (если админ и изображение существует) или 403/404
     assert response.status_code in [204, 403, 404]
 
+
+
+@pytest.mark.asyncio
+async def test_collection_membership_purges_product_listing(client: httpx.AsyncClient, auth_headers: dict):
+    """Добавление и удаление продукта из коллекции сбрасывает кэш выборки /api/products?collection_id="""
+    def slugs(response):
+        return [p["slug"] for p in response.json()["products"]]
+
+    listing = await client.get("/api/products?collection_id=1")
+    assert slugs(listing) == ["seed-product"]
+    product_id = listing.json()["products"][0]["product_id"]
+
+    response = await client.delete(f"/api/products/base/{product_id}/collections/1", headers=auth_headers)
+    assert response.status_code == 204
+    assert slugs(await client.get("/api/products?collection_id=1")) == []
+
+    response = await client.post(
+        f"/api/products/base/{product_id}/collections", headers=auth_headers, json={"collection_id": 1},
+    )
+    assert response.status_code == 204
+    assert slugs(await client.get("/api/products?collection_id=1")) == ["seed-product"]
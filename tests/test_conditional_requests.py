@@ -0,0 +1,122 @@
+"""
+Тесты условных запросов (ETag / Last-Modified) к каталогу
+"""
+import pytest
+import httpx
+
+
+@pytest.mark.asyncio
+async def test_products_list_not_modified_until_catalog_changes(client: httpx.AsyncClient, auth_headers: dict):
+    """Список продуктов отвечает 304, пока карточки не изменились"""
+    # Авторизованные запросы минуют серверный кэш и доходят до роута
+    first = await client.get("/api/products", headers=auth_headers)
+    etag = first.headers["etag"]
+    assert first.headers["cache-control"] == "public, no-cache"
+
+    cached = await client.get("/api/products", headers={**auth_headers, "If-None-Match": etag})
+    assert cached.status_code == 304
+    assert cached.content == b""
+    assert cached.headers["etag"] == etag
+
+    color_id = first.json()["products"][0]["id"]
+    await client.put(f"/api/products/colors/{color_id}", json={"title": "Changed"}, headers=auth_headers)
+
+    changed = await client.get("/api/products", headers={**auth_headers, "If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.headers["etag"] != etag
+    assert changed.json()["products"][0]["title"] == "Changed"
+
+
+@pytest.mark.asyncio
+async def test_products_not_modified_skips_page_query(client: httpx.AsyncClient, auth_headers: dict, query_counter):
+    """304 на список продуктов отвечается одним запросом-валидатором, без страницы, счётчика и фасетов"""
+    url = "/api/products?facets=true&include_total=true&size=M"
+    first = await client.get(url, headers=auth_headers)
+    assert first.json()["total"] == 1
+
+    query_counter.clear()
+    cached = await client.get(url, headers={**auth_headers, "If-None-Match": first.headers["etag"]})
+    assert cached.status_code == 304
+    assert len([statement for statement in query_counter if "product_cards" in statement]) == 1
+
+    await client.put("/api/products/sizes/1?quantity=0", headers=auth_headers)
+    changed = await client.get(url, headers={**auth_headers, "If-None-Match": first.headers["etag"]})
+    assert changed.status_code == 200
+    assert changed.json()["total"] == 0
+
+
+
+@pytest.mark.asyncio
+async def test_products_etag_tracks_collection_membership(client: httpx.AsyncClient, auth_headers: dict, db_session):
+    """Замена продукта в коллекции меняет ETag выборки, хотя количество и время карточек те же"""
+    from src.crud.product import rebuild_product_cards
+    from src.models.product import Product, ProductColor, ProductSize
+
+    product = Product(description="Swap", price="10.00", weight=0.3, currency="RUB")
+    db_session.add(product)
+    await db_session.flush()
+    color = ProductColor(product_id=product.id, slug="swap", title="Swap", label="Red", hex="#FF0000")
+    db_session.add(color)
+    await db_session.flush()
+    db_session.add(ProductSize(product_color_id=color.id, size="S", quantity=1))
+    await db_session.commit()
+    await rebuild_product_cards(db_session)  # карточки обоих продуктов получают одно updated_at
+
+    url = "/api/products?collection_id=1"
+    first = await client.get(url, headers=auth_headers)
+    seed_id = first.json()["products"][0]["product_id"]
+    assert "last-modified" in first.headers
+    since = {"If-Modified-Since": first.headers["last-modified"]}
+    assert (await client.get(url, headers={**auth_headers, **since})).status_code == 304
+
+    await client.post(f"/api/products/base/{product.id}/collections", json={"collection_id": 1}, headers=auth_headers)
+    await client.delete(f"/api/products/base/{seed_id}/collections/1", headers=auth_headers)
+
+    swapped = await client.get(url, headers={**auth_headers, "If-None-Match": first.headers["etag"]})
+    assert swapped.status_code == 200
+    assert [p["slug"] for p in swapped.json()["products"]] == ["swap"]
+
+@pytest.mark.asyncio
+async def test_response_cache_hit_honours_if_none_match(client: httpx.AsyncClient):
+    """Серверный кэш тоже отвечает 304 на совпадающий If-None-Match"""
+    first = await client.get("/api/products")
+    hit = await client.get("/api/products", headers={"If-None-Match": first.headers["etag"]})
+    assert hit.status_code == 304
+    assert hit.headers["x-cache"] == "HIT"
+
+
+@pytest.mark.asyncio
+async def test_categories_tree_if_modified_since(client: httpx.AsyncClient, auth_headers: dict):
+    """Дерево категорий поддерживает If-Modified-Since"""
+    first = await client.get("/api/categories")
+    last_modified = first.headers["last-modified"]
+
+    cached = await client.get("/api/categories", headers={**auth_headers, "If-Modified-Since": last_modified})
+    assert cached.status_code == 304
+
+    await client.post("/api/categories", json={"name": "New", "slug": "new", "level": 0}, headers=auth_headers)
+    refreshed = await client.get("/api/categories", headers={**auth_headers, "If-None-Match": first.headers["etag"]})
+    assert refreshed.status_code == 200
+    assert [c["slug"] for c in refreshed.json()] == ["new", "outerwear"]
+
+
+@pytest.mark.asyncio
+async def test_setting_etag_tracks_value(client: httpx.AsyncClient, auth_headers: dict):
+    """ETag настройки меняется вместе со значением"""
+    await client.put("/api/settings/banner", json={"value": "\"a\""}, headers=auth_headers)
+    first = await client.get("/api/settings/banner")
+    etag = first.headers["etag"]
+    assert (await client.get("/api/settings/banner", headers={"If-None-Match": etag})).status_code == 304
+
+    await client.put("/api/settings/banner", json={"value": "\"b\""}, headers=auth_headers)
+    changed = await client.get("/api/settings/banner", headers={"If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.json()["value"] == "\"b\""
+
+
+@pytest.mark.asyncio
+async def test_routes_without_policy_stay_no_store(client: httpx.AsyncClient):
+    """Роуты без собственной политики по-прежнему не кэшируются"""
+    response = await client.get("/api/products/1/colors")
+    assert response.headers["cache-control"].startswith("no-store")
+    assert response.headers["pragma"] == "no-cache"
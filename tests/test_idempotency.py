@@ -0,0 +1,97 @@
+"""
+Тесты Idempotency-Key для создания заказа и инициализации оплаты
+"""
+import asyncio
+
+import pytest
+import httpx
+
+from src.config import settings
+from src.routers import payments as payments_router
+
+
+def _order_payload(quantity: int = 1) -> dict:
+    return {
+        "order": {"email": "retry@example.com", "first_name": "Retry", "last_name": "User"},
+        "products": [{"product_size_id": 1, "quantity": quantity}],
+    }
+
+
+async def _stock(client: httpx.AsyncClient, auth_headers: dict) -> int:
+    return (await client.get("/api/products", headers=auth_headers)).json()["products"][0]["sizes"][0]["quantity"]
+
+
+@pytest.mark.asyncio
+async def test_order_retry_with_same_key_returns_stored_order(client: httpx.AsyncClient, auth_headers: dict):
+    """Повтор с тем же ключом возвращает тот же заказ и не списывает остаток второй раз"""
+    before = await _stock(client, auth_headers)
+    headers = {"Idempotency-Key": "order-retry-1"}
+
+    first = await client.post("/api/orders", json=_order_payload(2), headers=headers)
+    retry = await client.post("/api/orders", json=_order_payload(2), headers=headers)
+    assert first.status_code == retry.status_code == 201
+    assert retry.json() == first.json()
+    assert retry.headers["idempotent-replayed"] == "true"
+    assert "idempotent-replayed" not in first.headers
+    assert await _stock(client, auth_headers) == before - 2
+
+    # Тот же ключ с другим телом — ошибка клиента, а не чужой заказ
+    conflict = await client.post("/api/orders", json=_order_payload(3), headers=headers)
+    assert conflict.status_code == 422
+
+    # Без ключа каждый запрос — новый заказ
+    other = await client.post("/api/orders", json=_order_payload(2))
+    assert other.json()["id"] != first.json()["id"]
+
+
+@pytest.mark.asyncio
+async def test_concurrent_duplicates_wait_for_first_request(client: httpx.AsyncClient, auth_headers: dict):
+    """Параллельные дубли дожидаются первого запроса и получают его ответ"""
+    before = await _stock(client, auth_headers)
+    headers = {"Idempotency-Key": "order-burst"}
+
+    responses = await asyncio.gather(
+        *(client.post("/api/orders", json=_order_payload(), headers=headers) for _ in range(5))
+    )
+    assert {response.status_code for response in responses} == {201}
+    assert len({response.json()["id"] for response in responses}) == 1
+    assert await _stock(client, auth_headers) == before - 1
+
+
+@pytest.mark.asyncio
+async def test_client_error_is_replayed(client: httpx.AsyncClient):
+    """Ответ 4xx тоже сохраняется: повтор не выполняет заказ заново"""
+    headers = {"Idempotency-Key": "order-too-many"}
+    first = await client.post("/api/orders", json=_order_payload(1000), headers=headers)
+    retry = await client.post("/api/orders", json=_order_payload(1000), headers=headers)
+    assert first.status_code == retry.status_code == 400
+    assert retry.json() == first.json()
+
+
+@pytest.mark.asyncio
+async def test_payment_init_retry_skips_provider_call(client: httpx.AsyncClient, monkeypatch):
+    """Повтор инициализации оплаты не вызывает платёжную систему второй раз"""
+    order = (await client.post("/api/orders", json=_order_payload())).json()
+    calls = []
+
+    async def fake_init_payment(**kwargs):
+        calls.append(kwargs)
+        if len(calls) == 1:
+            return {"Success": False, "Message": "Temporary error"}
+        return {"Success": True, "PaymentURL": "https://pay.test/redirect", "PaymentId": 777}
+
+    monkeypatch.setattr(settings, "TBANK_TERMINAL_KEY", "terminal")
+    monkeypatch.setattr(settings, "TBANK_SECRET_KEY", "secret")
+    monkeypatch.setattr(payments_router.tbank_client, "init_payment", fake_init_payment)
+
+    body = {"order_id": order["id"], "access_token": order["access_token"]}
+    headers = {"Idempotency-Key": "pay-1"}
+    # Неуспешный ответ провайдера не сохраняется: повтор с тем же ключом пробует снова
+    failed = await client.post("/api/payments/init", json=body, headers=headers)
+    assert failed.json()["success"] is False
+    first = await client.post("/api/payments/init", json=body, headers=headers)
+    retry = await client.post("/api/payments/init", json=body, headers=headers)
+
+    assert first.json() == retry.json()
+    assert retry.json()["payment_url"] == "https://pay.test/redirect"
+    assert len(calls) == 2
@@ -133,6 +133,66 @@ async def test_create_order_insufficient_quantity(client: httpx.AsyncClient):
                 assert "Insufficient quantity" in response.json()["detail"]
 
 
+@pytest.mark.asyncio
+async def test_concurrent_orders_do_not_oversell(client: httpx.AsyncClient):
+    """Конкурентные заказы одного размера списывают остаток атомарно, без перепродажи"""
+    import asyncio
+
+    size = (await client.get("/api/products")).json()["products"][0]["sizes"][0]
+
+    async def place(index: int) -> httpx.Response:
+        return await client.post("/api/orders", json={
+            "order": {"email": f"rush{index}@example.com", "first_name": "Rush", "last_name": "User"},
+            "products": [{"product_size_id": size["id"], "quantity": 3}],
+        })
+
+    responses = await asyncio.gather(*(place(index) for index in range(8)))
+    statuses = sorted(response.status_code for response in responses)
+    assert statuses == [201] * 3 + [400] * 5
+    rejected = next(response for response in responses if response.status_code == 400)
+    assert "Insufficient quantity" in rejected.json()["detail"]
+
+    remaining = (await client.get("/api/products")).json()["products"][0]["sizes"][0]["quantity"]
+    assert remaining == size["quantity"] - 9
+
+
+@pytest.mark.asyncio
+async def test_expired_reservation_returns_stock(client: httpx.AsyncClient, auth_headers: dict, db_session):
+    """Истёкший резерв неоплаченного заказа возвращает остаток; поздняя оплата списывает его снова"""
+    from datetime import datetime, timedelta
+    from src.crud.reservations import release_expired_reservations
+
+    size = (await client.get("/api/products")).json()["products"][0]["sizes"][0]
+
+    async def place(email: str) -> int:
+        response = await client.post("/api/orders", json={
+            "order": {"email": email, "first_name": "Hold", "last_name": "User"},
+            "products": [{"product_size_id": size["id"], "quantity": 4}],
+        })
+        assert response.status_code == 201
+        return response.json()["id"]
+
+    async def stock() -> int:
+        return (await client.get("/api/products", headers=auth_headers)).json()["products"][0]["sizes"][0]["quantity"]
+
+    abandoned = await place("abandoned@example.com")
+    paid = await place("paid@example.com")
+    await client.put(f"/api/orders/{paid}", json={"status": "paid"}, headers=auth_headers)
+    assert await stock() == size["quantity"] - 8
+
+    # До истечения срока резерв держится
+    assert await release_expired_reservations(db_session) == 0
+    later = datetime.utcnow() + timedelta(days=1)
+    assert await release_expired_reservations(db_session, now=later) == 1
+    assert await stock() == size["quantity"] - 4
+    order = (await client.get(f"/api/orders/{abandoned}", headers=auth_headers)).json()
+    assert order["status"] == "cancelled"
+
+    # Оплата, пришедшая после освобождения резерва, снова списывает товар
+    await client.put(f"/api/orders/{abandoned}", json={"status": "paid"}, headers=auth_headers)
+    assert await stock() == size["quantity"] - 8
+
+
 @pytest.mark.asyncio
 async def test_create_order_invalid_product_size(client: httpx.AsyncClient):
     """Тест создания заказа с несуществующим размером продукта"""
@@ -194,6 +254,102 @@ async def test_get_orders_list(client: httpx.AsyncClient, auth_token: str):
         assert "products" in order
 
 
+@pytest.mark.asyncio
+async def test_get_orders_cursor_pagination(client: httpx.AsyncClient, auth_headers: dict):
+    """Курсор и общее количество заказов передаются заголовками"""
+    size_id = (await client.get("/api/products")).json()["products"][0]["sizes"][0]["id"]
+    for index in range(3):
+        response = await client.post("/api/orders", json={
+            "order": {
+                "email": f"cursor{index}@example.com",
+                "first_name": "Cursor",
+                "last_name": "User",
+                "phone": "+1234567890",
+                "city": "Moscow",
+                "postal_code": "123456",
+                "address": "Test Address 123",
+            },
+            "products": [{"product_size_id": size_id, "quantity": 1}],
+        })
+        assert response.status_code == 201
+
+    first = await client.get("/api/orders?limit=2&include_total=true", headers=auth_headers)
+    assert first.headers["x-total-count"] == "3"
+    cursor = first.headers["x-next-cursor"]
+    second = await client.get(f"/api/orders?limit=2&cursor={cursor}", headers=auth_headers)
+    assert "x-next-cursor" not in second.headers
+    assert "x-total-count" not in second.headers
+
+    emails = [o["email"] for o in first.json() + second.json()]
+    assert emails == ["cursor2@example.com", "cursor1@example.com", "cursor0@example.com"]
+
+
+@pytest.mark.asyncio
+async def test_get_orders_list_query_count_is_constant(client: httpx.AsyncClient, auth_headers: dict, query_counter):
+    """Детали заказов на странице собираются за постоянное число запросов"""
+    size_id = (await client.get("/api/products")).json()["products"][0]["sizes"][0]["id"]
+    custom_status = (await client.post("/api/custom-statuses", json={"name": "Packed"}, headers=auth_headers)).json()
+    for index in range(5):
+        response = await client.post("/api/orders", json={
+            "order": {
+                "email": f"batch{index}@example.com",
+                "first_name": "Batch",
+                "last_name": "User",
+                "phone": "+1234567890",
+                "city": "Moscow",
+                "postal_code": "123456",
+                "address": "Test Address 123",
+            },
+            "products": [{"product_size_id": size_id, "quantity": 1}],
+        })
+        order_id = response.json()["id"]
+        await client.put(f"/api/orders/{order_id}", json={"custom_status_id": custom_status["id"]}, headers=auth_headers)
+
+    query_counter.clear()
+    one = await client.get("/api/orders?limit=1", headers=auth_headers)
+    one_count = len(query_counter)
+    query_counter.clear()
+    five = await client.get("/api/orders?limit=5", headers=auth_headers)
+    assert len(query_counter) == one_count
+
+    assert len(one.json()) == 1
+    orders = five.json()
+    assert [o["email"] for o in orders] == [f"batch{index}@example.com" for index in reversed(range(5))]
+    assert all(o["custom_status_name"] == "Packed" for o in orders)
+    assert all(o["products"][0]["slug"] == "seed-product" for o in orders)
+
+
+@pytest.mark.asyncio
+async def test_order_lines_keep_snapshot_after_catalog_edit(client: httpx.AsyncClient, auth_headers: dict):
+    """Цена, название и вес строки заказа фиксируются при создании и не следуют за каталогом"""
+    product = (await client.get("/api/products")).json()["products"][0]
+    response = await client.post("/api/orders", json={
+        "order": {
+            "email": "snapshot@example.com",
+            "first_name": "Snap",
+            "last_name": "Shot",
+            "phone": "+1234567890",
+            "city": "Moscow",
+            "postal_code": "123456",
+            "address": "Test Address 123",
+        },
+        "products": [{"product_size_id": product["sizes"][0]["id"], "quantity": 2}],
+    })
+    order_id = response.json()["id"]
+
+    await client.put(
+        f"/api/products/colors/{product['id']}", json={"title": "Renamed", "price": "555.00"}, headers=auth_headers
+    )
+
+    line = (await client.get(f"/api/orders/{order_id}", headers=auth_headers)).json()["products"][0]
+    assert line["title"] == product["title"]
+    assert line["label"] == "Black"
+    assert line["size"] == "M"
+    assert line["quantity"] == 2
+    assert float(line["unit_price"]) == 100.0
+    assert line["weight"] == product["weight"]
+
+
 @pytest.mark.asyncio
 async def test_get_orders_list_unauthorized(client: httpx.AsyncClient):
     """Тест получения списка заказов без аутентификации"""
@@ -404,3 +560,24 @@ async def test_update_order_invalid_status(client: httpx.AsyncClient, auth_token
                     # Должна быть ошибка валидации
                     assert update_response.status_code == 422
 
+
+
+@pytest.mark.asyncio
+async def test_reservation_sweeper_purges_cached_listing(client: httpx.AsyncClient):
+    """Возврат остатка фоновым воркером сбрасывает закэшированный публичный листинг"""
+    from datetime import datetime, timedelta
+    from src.services.stock_reservations import sweep_expired_reservations
+
+    async def public_stock() -> int:
+        return (await client.get("/api/products")).json()["products"][0]["sizes"][0]["quantity"]
+
+    before = await public_stock()
+    response = await client.post("/api/orders", json={
+        "order": {"email": "sweep@example.com", "first_name": "Sweep", "last_name": "User"},
+        "products": [{"product_size_id": 1, "quantity": 3}],
+    })
+    assert response.status_code == 201
+    assert await public_stock() == before - 3
+
+    assert await sweep_expired_reservations(now=datetime.utcnow() + timedelta(days=1)) == 1
+    assert await public_stock() == before
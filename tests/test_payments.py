@@ -0,0 +1,232 @@
+"""
+Тесты инициализации оплаты
+"""
+import asyncio
+import json
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+import pytest
+import httpx
+from sqlalchemy import select, update
+
+from src.config import settings
+from src.database import engine
+from src.models.orders import Order, OrderStatus
+from src.routers import payments as payments_router
+
+
+@pytest.fixture
+def tbank_calls(monkeypatch) -> list:
+    calls = []
+
+    async def fake_init_payment(**kwargs):
+        calls.append(kwargs)
+        return {"Success": True, "PaymentURL": f"https://pay.test/{len(calls)}", "PaymentId": 1000 + len(calls)}
+
+    monkeypatch.setattr(settings, "TBANK_TERMINAL_KEY", "terminal")
+    monkeypatch.setattr(settings, "TBANK_SECRET_KEY", "secret")
+    monkeypatch.setattr(payments_router.tbank_client, "init_payment", fake_init_payment)
+    return calls
+
+
+@pytest.mark.asyncio
+async def test_payment_init_reuses_live_session(client: httpx.AsyncClient, db_session, tbank_calls: list):
+    """Пока платёжная ссылка жива и сумма не менялась, провайдер не вызывается повторно"""
+    order = (await client.post("/api/orders", json={
+        "order": {"email": "pay@example.com", "first_name": "Pay", "last_name": "User"},
+        "products": [{"product_size_id": 1, "quantity": 1}],
+    })).json()
+    body = {"order_id": order["id"], "access_token": order["access_token"]}
+
+    first = (await client.post("/api/payments/init", json=body)).json()
+    reload = (await client.post("/api/payments/init", json=body)).json()
+    assert first == reload == {"success": True, "payment_url": "https://pay.test/1", "payment_id": "1001", "error": None}
+    assert len(tbank_calls) == 1
+    assert tbank_calls[0]["redirect_due_date"] is not None
+
+    # Истёкшая сессия создаётся заново
+    await db_session.execute(
+        update(Order).where(Order.id == order["id"]).values(payment_expires_at=datetime.utcnow() + timedelta(seconds=30))
+    )
+    await db_session.commit()
+    expired = (await client.post("/api/payments/init", json=body)).json()
+    assert expired["payment_url"] == "https://pay.test/2"
+
+    # Изменившаяся сумма заказа тоже требует новой сессии
+    await db_session.execute(update(Order).where(Order.id == order["id"]).values(total_price=Decimal("150.00")))
+    await db_session.commit()
+    changed = (await client.post("/api/payments/init", json=body)).json()
+    assert changed["payment_url"] == "https://pay.test/3"
+    assert tbank_calls[-1]["amount"] == 15000
+    assert len(tbank_calls) == 3
+
+
+@pytest.mark.asyncio
+async def test_provider_calls_share_pooled_client(monkeypatch):
+    """Запросы к провайдеру идут через один долгоживущий клиент, а не новый на каждый вызов"""
+    from src.services import http_clients
+
+    clients = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(200, json={"Success": True, "Status": "CONFIRMED"})
+
+    def build(provider: str) -> httpx.AsyncClient:
+        clients.append(provider)
+        return httpx.AsyncClient(transport=httpx.MockTransport(handler))
+
+    monkeypatch.setattr(http_clients, "_clients", {})
+    monkeypatch.setattr(http_clients, "build_http_client", build)
+
+    for _ in range(3):
+        assert (await payments_router.tbank_client.get_state("1"))["Status"] == "CONFIRMED"
+    assert clients == ["tbank"]
+
+    # После остановки приложения клиент закрыт и при следующем обращении создаётся заново
+    await http_clients.close_http_clients()
+    await payments_router.tbank_client.get_state("1")
+    assert clients == ["tbank", "tbank"]
+    await http_clients.close_http_clients()
+
+
+@pytest.mark.asyncio
+async def test_paypal_token_is_cached_and_refreshed_once(monkeypatch):
+    """Параллельные вызовы PayPal делят один запрос токена, повторные — берут его из кеша"""
+    from src.services import http_clients
+
+    token_requests = []
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        if request.url.path == "/v1/oauth2/token":
+            token_requests.append(request)
+            await asyncio.sleep(0.01)
+            return httpx.Response(200, json={"access_token": f"token-{len(token_requests)}", "expires_in": 32400})
+        if request.headers["Authorization"] == "Bearer revoked":
+            return httpx.Response(401)
+        return httpx.Response(200, json={"id": request.url.path.rsplit("/", 1)[-1], "status": "APPROVED"})
+
+    monkeypatch.setattr(http_clients, "_clients", {"paypal": httpx.AsyncClient(transport=httpx.MockTransport(handler))})
+    paypal = payments_router.PayPalClient()
+
+    orders = await asyncio.gather(*(paypal.get_order(f"PP{index}") for index in range(10)))
+    assert [order["id"] for order in orders] == [f"PP{index}" for index in range(10)]
+    await paypal.get_order("PP-again")
+    assert len(token_requests) == 1
+
+    # 401 сбрасывает кеш: следующий вызов запрашивает новый токен
+    paypal._token._token = "revoked"
+    with pytest.raises(httpx.HTTPStatusError):
+        await paypal.get_order("PP-revoked")
+    await paypal.get_order("PP-after")
+    assert len(token_requests) == 2
+    await http_clients.close_http_clients()
+
+
+@pytest.mark.asyncio
+async def test_payment_status_reads_db_and_reconciler_updates_it(client: httpx.AsyncClient, db_session, monkeypatch):
+    """Статус читается из БД; провайдера опрашивает фоновая сверка и редкий force refresh"""
+    from src.services.payment_reconciler import reconcile_pending_payments
+
+    states = {}
+    in_flight = []
+
+    async def fake_get_state(payment_id: str) -> dict:
+        in_flight.append(payment_id)
+        await asyncio.sleep(0.01)
+        assert len(in_flight) <= 2
+        in_flight.remove(payment_id)
+        states.setdefault(payment_id, 0)
+        states[payment_id] += 1
+        return {"Status": "CONFIRMED" if payment_id.startswith("paid") else "NEW"}
+
+    monkeypatch.setattr(payments_router.tbank_client, "get_state", fake_get_state)
+    monkeypatch.setattr(settings, "PAYMENT_RECONCILE_CONCURRENCY", 2)
+
+    orders = []
+    for payment_id in ("new-1", "paid-1", "paid-2", "paid-3"):
+        order = (await client.post("/api/orders", json={
+            "order": {"email": "poll@example.com", "first_name": "Poll", "last_name": "User"},
+            "products": [{"product_size_id": 1, "quantity": 1}],
+        })).json()
+        await db_session.execute(
+            update(Order).where(Order.id == order["id"]).values(payment_id=payment_id, payment_provider="tbank")
+        )
+        await db_session.commit()
+        orders.append(order)
+
+    url = f"/api/payments/status/{orders[0]['id']}"
+    assert (await client.get(url)).json()["status"] == "not_paid"
+    assert states == {}
+
+    # Force refresh опрашивает провайдера не чаще раза в PAYMENT_STATUS_REFRESH_SECONDS
+    assert (await client.get(url, params={"refresh": "true"})).json()["status"] == "not_paid"
+    await client.get(url, params={"refresh": "true"})
+    assert states == {"new-1": 1}
+
+    # Недавно сверенный заказ сверка пропускает, остальные опрашиваются не более чем по два
+    assert await reconcile_pending_payments(db_session) == 3
+    assert states == {"new-1": 1, "paid-1": 1, "paid-2": 1, "paid-3": 1}
+    paid = (await client.get(f"/api/payments/status/{orders[1]['id']}")).json()
+    assert paid["status"] == "paid" and paid["is_paid"] is True
+
+
+@pytest.mark.asyncio
+async def test_payment_status_stream_pushes_status_change(client: httpx.AsyncClient, db_session):
+    """SSE-поток отдаёт текущий статус и сразу после commit — новый, затем закрывается"""
+    from src.crud.reservations import set_order_payment_status
+    from src.services import payment_events
+
+    order = (await client.post("/api/orders", json={
+        "order": {"email": "sse@example.com", "first_name": "Sse", "last_name": "User"},
+        "products": [{"product_size_id": 1, "quantity": 1}],
+    })).json()
+    stream = asyncio.create_task(client.get(
+        f"/api/payments/status/{order['id']}/events", params={"access_token": order["access_token"]}
+    ))
+    while order["id"] not in payment_events._subscribers:
+        await asyncio.sleep(0.01)
+    await asyncio.sleep(0.05)
+    # Ожидающий поток не держит соединение из пула
+    assert engine.pool.checkedout() == 0
+
+    db_order = await db_session.get(Order, order["id"])
+    await set_order_payment_status(db_session, db_order, OrderStatus.PAID)
+    # До commit подписчики ничего не получают
+    assert all(queue.empty() for queue in payment_events._subscribers[order["id"]])
+    await db_session.commit()
+
+    response = await asyncio.wait_for(stream, timeout=5)
+    assert response.headers["content-type"].startswith("text/event-stream")
+    events = [block for block in response.text.split("\n\n") if block.startswith("event: status")]
+    assert [json.loads(event.split("data: ", 1)[1])["status"] for event in events] == ["not_paid", "paid"]
+    assert order["id"] not in payment_events._subscribers
+
+
+@pytest.mark.asyncio
+async def test_payment_session_does_not_outlive_reservation(client: httpx.AsyncClient, db_session, tbank_calls: list):
+    """Срок платёжной ссылки и RedirectDueDate не позже reserved_until заказа"""
+    order = (await client.post("/api/orders", json={
+        "order": {"email": "hold@example.com", "first_name": "Hold", "last_name": "User"},
+        "products": [{"product_size_id": 1, "quantity": 1}],
+    })).json()
+    body = {"order_id": order["id"], "access_token": order["access_token"]}
+    reserved_until = (datetime.utcnow() + timedelta(minutes=10)).replace(microsecond=0)
+    await db_session.execute(update(Order).where(Order.id == order["id"]).values(reserved_until=reserved_until))
+    await db_session.commit()
+
+    assert (await client.post("/api/payments/init", json=body)).json()["success"] is True
+    assert tbank_calls[0]["redirect_due_date"].replace(tzinfo=None) == reserved_until
+    stored = await db_session.scalar(select(Order.payment_expires_at).where(Order.id == order["id"]))
+    assert stored == reserved_until
+
+    # Резерв уже истёк, но заказ ещё не отменён фоновым проходом — новую ссылку не выдаём
+    await db_session.execute(
+        update(Order).where(Order.id == order["id"]).values(
+            reserved_until=datetime.utcnow() - timedelta(minutes=1), payment_expires_at=None,
+        )
+    )
+    await db_session.commit()
+    response = await client.post("/api/payments/init", json=body)
+    assert response.status_code == 400
+    assert len(tbank_calls) == 1
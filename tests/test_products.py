@@ -184,3 +184,385 @@ async def test_delete_product(client: httpx.AsyncClient, auth_token: str):
     # Может быть 204 (если админ и продукт существует) или 403/404
     assert response.status_code in [204, 403, 404]
 
+
+
+async def _seed_nested_products(db_session, count: int) -> None:
+    from src.crud.category import rebuild_category_closure
+    from src.crud.product import rebuild_product_cards
+    from src.models.category import Category, ProductCategory
+    from src.models.product import Product, ProductColor, ProductSize
+
+    root = Category(name="Root", slug="root", level=0, sort_order=0, is_active=True)
+    db_session.add(root)
+    await db_session.flush()
+    child = Category(name="Child", slug="child", parent_id=root.id, level=1, sort_order=0, is_active=True)
+    db_session.add(child)
+    await db_session.flush()
+    leaf = Category(name="Leaf", slug="leaf", parent_id=child.id, level=2, sort_order=0, is_active=True)
+    db_session.add(leaf)
+    await db_session.flush()
+
+    for index in range(count):
+        product = Product(description=f"Nested {index}", price="10.00", weight=0.3, currency="RUB")
+        db_session.add(product)
+        await db_session.flush()
+        color = ProductColor(
+            product_id=product.id,
+            slug=f"nested-{index}",
+            title=f"Nested {index}",
+            label="Red",
+            hex="#FF0000",
+        )
+        db_session.add(color)
+        await db_session.flush()
+        db_session.add(ProductSize(product_color_id=color.id, size="S", quantity=1))
+        db_session.add(ProductCategory(product_id=product.id, category_id=leaf.id))
+    await db_session.commit()
+    await rebuild_category_closure(db_session)
+    await rebuild_product_cards(db_session)
+
+
+@pytest.mark.asyncio
+async def test_products_list_query_count_is_constant(client: httpx.AsyncClient, db_session, query_counter):
+    """Количество запросов на странице списка не растёт вместе с limit"""
+    await _seed_nested_products(db_session, 30)
+
+    query_counter.clear()
+    small = await client.get("/api/products?skip=0&limit=5")
+    small_count = len(query_counter)
+
+    query_counter.clear()
+    large = await client.get("/api/products?skip=0&limit=30")
+    large_count = len(query_counter)
+
+    assert small.status_code == 200
+    assert large.status_code == 200
+    assert len(large.json()["products"]) == 30
+    assert small_count == large_count
+
+    nested = [p for p in large.json()["products"] if p["slug"].startswith("nested-")]
+    assert nested
+    assert all(p["main_category"] == {"name": "Root", "slug": "root"} for p in nested)
+
+
+@pytest.mark.asyncio
+async def test_products_cursor_pagination(client: httpx.AsyncClient, db_session):
+    """Проход по курсорам даёт тот же порядок, что и один большой запрос"""
+    await _seed_nested_products(db_session, 30)
+
+    full = (await client.get("/api/products?limit=100&include_total=true")).json()
+    assert full["total"] == 31
+    assert full["next_cursor"] is None
+
+    slugs, cursor = [], None
+    while True:
+        url = "/api/products?limit=7" + (f"&cursor={cursor}" if cursor else "")
+        page = (await client.get(url)).json()
+        assert page["total"] is None
+        slugs += [p["slug"] for p in page["products"]]
+        cursor = page["next_cursor"]
+        if not cursor:
+            break
+    assert slugs == [p["slug"] for p in full["products"]]
+
+    response = await client.get("/api/products?cursor=broken")
+    assert response.status_code == 400
+
+
+@pytest.mark.asyncio
+async def test_product_cards_follow_admin_writes(client: httpx.AsyncClient, auth_token: str):
+    """Изменения цвета и размера сразу попадают в карточки витрины"""
+    headers = {"Authorization": f"Bearer {auth_token}"}
+
+    listing = await client.get("/api/products")
+    card = listing.json()["products"][0]
+    color_id = card["id"]
+    size_id = card["sizes"][0]["id"]
+
+    response = await client.put(f"/api/products/colors/{color_id}", json={"title": "Renamed"}, headers=headers)
+    assert response.status_code == 200
+    response = await client.put(f"/api/products/sizes/{size_id}?quantity=0", headers=headers)
+    assert response.status_code == 200
+
+    card = (await client.get("/api/products")).json()["products"][0]
+    assert card["title"] == "Renamed"
+    assert card["sizes"][0]["quantity"] == 0
+    assert (await client.get("/api/categories/outerwear")).json()[0]["title"] == "Renamed"
+    assert (await client.get("/api/collections/1/products")).json()[0]["title"] == "Renamed"
+
+
+@pytest.mark.asyncio
+async def test_products_full_text_search(client: httpx.AsyncClient, auth_headers: dict, db_session):
+    """Поиск по словам и префиксам, релевантные по названию выше, курсор работает и в выдаче поиска"""
+    from src.crud.product import rebuild_product_cards
+    from src.models.product import Product, ProductColor
+
+    items = [
+        ("Футболка оверсайз", "Хлопковая ткань"),
+        ("Худи", "Подходит к любой футболке"),
+        ("Cargo pants", "Wide fit trousers"),
+    ]
+    for index, (title, description) in enumerate(items):
+        product = Product(description=description, price="50.00", weight=0.2, currency="RUB")
+        db_session.add(product)
+        await db_session.flush()
+        db_session.add(ProductColor(product_id=product.id, slug=f"search-{index}", title=title, label="Black", hex="#000000"))
+    await db_session.commit()
+    await rebuild_product_cards(db_session)
+
+    response = await client.get("/api/products?search=футбол&include_total=true")
+    data = response.json()
+    assert response.status_code == 200
+    assert data["total"] == 2
+    assert [p["slug"] for p in data["products"]] == ["search-0", "search-1"]
+
+    first = (await client.get("/api/products?search=футбол&limit=1")).json()
+    second = (await client.get(f"/api/products?search=футбол&limit=1&cursor={first['next_cursor']}")).json()
+    assert [p["slug"] for p in first["products"] + second["products"]] == ["search-0", "search-1"]
+    assert second["next_cursor"] is None
+
+    assert [p["slug"] for p in (await client.get("/api/products?search=CARGO")).json()["products"]] == ["search-2"]
+    assert (await client.get("/api/products?search=%25%25")).json()["products"] != []
+
+    color_id = data["products"][0]["id"]
+    await client.put(f"/api/products/colors/{color_id}", json={"title": "Лонгслив"}, headers=auth_headers)
+    renamed = (await client.get("/api/products?search=лонгслив")).json()["products"]
+    assert [p["id"] for p in renamed] == [color_id]
+
+
+@pytest.mark.asyncio
+async def test_products_faceted_filters(client: httpx.AsyncClient, auth_headers: dict, db_session, query_counter):
+    """Фильтры по цене, размеру, цвету, категории и коллекции; фасеты считаются одним запросом"""
+    await _seed_nested_products(db_session, 3)
+
+    def slugs(response):
+        return sorted(p["slug"] for p in response.json()["products"])
+
+    assert slugs(await client.get("/api/products?size=S")) == ["nested-0", "nested-1", "nested-2"]
+    assert slugs(await client.get("/api/products?color=%23000000")) == ["seed-product"]
+    assert slugs(await client.get("/api/products?color=Red&category=root")) == ["nested-0", "nested-1", "nested-2"]
+    assert slugs(await client.get("/api/products?category=outerwear&collection_id=1")) == ["seed-product"]
+    assert slugs(await client.get("/api/products?price_min=50&price_max=100")) == ["seed-product"]
+
+    query_counter.clear()
+    await client.get("/api/products?size=S&price_max=50", headers=auth_headers)
+    plain_count = len(query_counter)
+    query_counter.clear()
+    response = await client.get("/api/products?size=S&price_max=50&facets=true", headers=auth_headers)
+    assert len(query_counter) == plain_count + 1
+
+    facets = response.json()["facets"]
+    # Счётчики измерения не учитывают выбор в нём самом, но учитывают остальные фильтры
+    assert facets["sizes"] == [{"value": "S", "count": 3}]
+    assert facets["colors"] == [{"label": "Red", "hex": "#FF0000", "count": 3}]
+    assert facets["price"] == {"min": "10.00", "max": "10.00"}
+
+    all_facets = (await client.get("/api/products?facets=true")).json()["facets"]
+    assert all_facets["sizes"] == [{"value": "M", "count": 1}, {"value": "S", "count": 3}]
+    assert [c["label"] for c in all_facets["colors"]] == ["Red", "Black"]
+
+    # Размер без остатка не считается доступным, кэшированный отфильтрованный ответ сбрасывается
+    assert slugs(await client.get("/api/products?size=M")) == ["seed-product"]
+    seed = next(p for p in (await client.get("/api/products?color=Black")).json()["products"])
+    await client.put(f"/api/products/sizes/{seed['sizes'][0]['id']}?quantity=0", headers=auth_headers)
+    assert slugs(await client.get("/api/products?size=M")) == []
+
+
+@pytest.mark.asyncio
+async def test_products_card_view_and_fields(client: httpx.AsyncClient, db_session, query_counter):
+    """view=card и fields= отдают урезанные карточки и не читают полный JSON из БД"""
+    from src.crud.product import create_product_image
+
+    color_id = (await client.get("/api/products")).json()["products"][0]["id"]
+    await create_product_image(db_session, color_id, file_url="gallery.jpg", sort_order=0)
+    await create_product_image(db_session, color_id, file_url="primary.jpg", sort_order=1000)
+
+    query_counter.clear()
+    card = (await client.get("/api/products?view=card")).json()["products"][0]
+    assert "description" not in card and "custom_sections" not in card
+    assert [image["file"] for image in card["images"]] == ["primary.jpg"]
+    assert card["sizes"][0]["size"] == "M"
+    listing_sql = [s for s in query_counter if "FROM product_cards" in s and "LIMIT" in s]
+    assert listing_sql and all("product_cards.data" not in s for s in listing_sql)
+
+    for url in ("/api/products?fields=id,title", "/api/categories/outerwear?fields=id,title", "/api/collections/1/products?fields=id,title"):
+        response = await client.get(url)
+        products = response.json()
+        products = products["products"] if isinstance(products, dict) else products
+        assert products == [{"id": color_id, "title": "Seed Product"}]
+
+    full = (await client.get("/api/products?fields=id,images")).json()["products"][0]
+    assert len(full["images"]) == 2
+    assert (await client.get("/api/products?view=card&fields=description")).status_code == 400
+    assert (await client.get("/api/products?fields=nope")).status_code == 400
+
+
+@pytest.mark.asyncio
+async def test_product_detail_routes_use_single_query(client: httpx.AsyncClient, db_session, query_counter):
+    """Детальные страницы продукта загружаются одним запросом независимо от числа цветов, фото и размеров"""
+    from src.crud.category import rebuild_category_closure
+    from src.crud.product import rebuild_product_cards
+    from src.models.category import Category, ProductCategory
+    from src.models.product import Product, ProductColor, ProductImage, ProductSection, ProductSize
+
+    root = Category(name="Root", slug="root", level=0, sort_order=0, is_active=True)
+    db_session.add(root)
+    await db_session.flush()
+    leaf = Category(name="Leaf", slug="leaf", parent_id=root.id, level=1, sort_order=0, is_active=True)
+    db_session.add(leaf)
+    product = Product(description="Detail", price="80.00", weight=0.4, currency="RUB")
+    db_session.add(product)
+    await db_session.flush()
+    db_session.add(ProductCategory(product_id=product.id, category_id=leaf.id))
+    db_session.add(ProductSection(product_id=product.id, title="Care", content="<p>Wash cold</p>"))
+    for index in range(3):
+        color = ProductColor(
+            product_id=product.id, slug=f"detail-{index}", title=f"Detail {index}",
+            label=f"Color {index}", hex="#123456", price="90.00" if index == 0 else None,
+        )
+        db_session.add(color)
+        await db_session.flush()
+        for size in ("S", "M", "L"):
+            db_session.add(ProductSize(product_color_id=color.id, size=size, quantity=2))
+        for image in range(2):
+            db_session.add(ProductImage(product_color_id=color.id, file=f"{index}-{image}.jpg", sort_order=image))
+    await db_session.commit()
+    await rebuild_category_closure(db_session)
+    await rebuild_product_cards(db_session)
+
+    for url in ("/api/products/slug/detail-1", "/api/products/leaf/detail-1", f"/api/products/{product.id}"):
+        query_counter.clear()
+        response = await client.get(url)
+        assert response.status_code == 200
+        assert len(query_counter) == 1, query_counter
+
+    by_slug = (await client.get("/api/products/slug/detail-0")).json()
+    assert by_slug["price"] == "90.00"
+    assert by_slug["main_category"] == {"name": "Root", "slug": "root"}
+    assert [s["size"] for s in by_slug["sizes"]] == ["S", "M", "L"]
+    assert by_slug["custom_sections"][0]["title"] == "Care"
+
+    assert (await client.get("/api/products/leaf/detail-1")).json()["categoryPath"] == ["leaf"]
+    assert (await client.get("/api/products/root/detail-1")).status_code == 404
+    assert (await client.get("/api/products/slug/missing")).status_code == 404
+
+    detail = (await client.get(f"/api/products/{product.id}")).json()
+    assert [c["slug"] for c in detail["colors"]] == ["detail-0", "detail-1", "detail-2"]
+    assert [c["price"] for c in detail["colors"]] == ["90.00", None, None]
+    assert all(len(c["images"]) == 2 and len(c["sizes"]) == 3 for c in detail["colors"])
+    assert detail["main_category"]["slug"] == "root"
+    assert detail["custom_sections"][0]["content"] == "<p>Wash cold</p>"
+
+
+@pytest.mark.asyncio
+async def test_products_batch_lookup(client: httpx.AsyncClient, db_session, query_counter):
+    """Пачка карточек по ID цветов и размеров за постоянное число запросов"""
+    await _seed_nested_products(db_session, 20)
+    listing = (await client.get("/api/products?limit=100")).json()["products"]
+    color_ids = [p["id"] for p in listing]
+    size_ids = [p["sizes"][0]["id"] for p in listing]
+
+    query_counter.clear()
+    few = await client.get(f"/api/products/batch?color_ids={color_ids[2]},{color_ids[0]}")
+    few_count = len(query_counter)
+    query_counter.clear()
+    many = await client.get("/api/products/batch?" + "&".join(f"color_ids={cid}" for cid in color_ids))
+    assert len(query_counter) == few_count == 1
+
+    assert [p["id"] for p in few.json()] == [color_ids[2], color_ids[0]]
+    assert [p["id"] for p in many.json()] == color_ids
+
+    by_size = (await client.get(f"/api/products/batch?size_ids={size_ids[3]},{size_ids[1]},999999&view=card")).json()
+    assert [p["id"] for p in by_size] == [color_ids[3], color_ids[1]]
+    assert "description" not in by_size[0]
+
+    assert (await client.get("/api/products/batch?color_ids=abc")).status_code == 400
+    too_many = ",".join(str(i) for i in range(301))
+    assert (await client.get(f"/api/products/batch?color_ids={too_many}")).status_code == 400
+    assert (await client.get("/api/products/batch")).json() == []
+
+
+@pytest.mark.asyncio
+async def test_products_listing_streams_stored_card_json(client: httpx.AsyncClient, db_session, monkeypatch):
+    """Листинг склеивает JSON карточек из БД в тело по кускам, не меняя его"""
+    from src.services import json_stream
+
+    await _seed_nested_products(db_session, 12)
+    monkeypatch.setattr(json_stream, "CHUNK_SIZE", 256)
+
+    data = (await client.get("/api/products?limit=5&include_total=true")).json()
+    assert len(data["products"]) == 5
+    assert data["total"] == 13
+    assert data["next_cursor"]
+    detail = (await client.get(f"/api/products/slug/{data['products'][0]['slug']}")).json()
+    assert data["products"][0] == detail
+
+    category = (await client.get("/api/categories/root?limit=3&fields=id,title")).json()
+    assert len(category) == 3
+    assert all(set(product) == {"id", "title"} for product in category)
+
+
+@pytest.mark.asyncio
+async def test_deleted_card_purges_following_listing_pages(client: httpx.AsyncClient, auth_headers: dict, db_session):
+    """Удаление карточки сдвигает следующие страницы листинга — их кэш сбрасывается"""
+    await _seed_nested_products(db_session, 3)
+
+    def slugs(response):
+        return [p["slug"] for p in response.json()["products"]]
+
+    listing = (await client.get("/api/products?limit=10")).json()["products"]
+    assert slugs(await client.get("/api/products?skip=1&limit=1")) == [listing[1]["slug"]]
+
+    response = await client.delete(f"/api/products/colors/{listing[0]['id']}", headers=auth_headers)
+    assert response.status_code == 204
+    assert slugs(await client.get("/api/products?skip=1&limit=1")) == [listing[2]["slug"]]
+
+
+@pytest.mark.asyncio
+async def test_deleted_product_purges_category_and_collection_listings(
+    client: httpx.AsyncClient, auth_headers: dict, db_session
+):
+    """Удаление продукта сбрасывает листинги его категорий и коллекций, хотя привязки удаляются каскадом"""
+    from sqlalchemy import event, select
+    from src.crud.product import rebuild_product_cards
+    from src.database import engine
+    from src.models.category import Category, ProductCategory
+    from src.models.collection import CollectionProduct
+    from src.models.product import Product, ProductColor, ProductSize
+
+    category = (await db_session.execute(select(Category).where(Category.slug == "outerwear"))).scalar_one()
+    product = Product(description="Extra", price="10.00", weight=0.3, currency="RUB")
+    db_session.add(product)
+    await db_session.flush()
+    color = ProductColor(product_id=product.id, slug="extra", title="Extra", label="Red", hex="#FF0000")
+    db_session.add(color)
+    await db_session.flush()
+    db_session.add(ProductSize(product_color_id=color.id, size="S", quantity=1))
+    db_session.add(ProductCategory(product_id=product.id, category_id=category.id, sort_order=1))
+    db_session.add(CollectionProduct(collection_id=1, product_id=product.id, sort_order=1))
+    await db_session.commit()
+    await rebuild_product_cards(db_session)
+
+    # Первая страница не содержит удаляемый продукт, но её X-Total-Count зависит от него
+    first_page = await client.get("/api/categories/outerwear?limit=1&include_total=true")
+    assert [p["slug"] for p in first_page.json()] == ["seed-product"]
+    assert first_page.headers["x-total-count"] == "2"
+    assert [p["slug"] for p in (await client.get("/api/collections/1/products")).json()] == ["seed-product", "extra"]
+
+    # Как на Postgres: привязки удаляет ON DELETE CASCADE, а не ORM
+    def enforce_foreign_keys(dbapi_connection, connection_record, connection_proxy):
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA foreign_keys=ON")
+        cursor.close()
+
+    event.listen(engine.sync_engine, "checkout", enforce_foreign_keys)
+    try:
+        await engine.dispose()
+        response = await client.delete(f"/api/products/base/{product.id}", headers=auth_headers)
+    finally:
+        event.remove(engine.sync_engine, "checkout", enforce_foreign_keys)
+        await engine.dispose()
+    assert response.status_code == 200
+
+    assert (await client.get("/api/categories/outerwear?limit=1&include_total=true")).headers["x-total-count"] == "1"
+    assert [p["slug"] for p in (await client.get("/api/collections/1/products")).json()] == ["seed-product"]
@@ -0,0 +1,82 @@
+"""
+Тесты серверного кэша ответов каталога
+"""
+import pytest
+import httpx
+
+from src.services.response_cache import CachedResponse, InMemoryCacheBackend
+
+
+@pytest.mark.asyncio
+async def test_anonymous_catalog_get_is_cached(client: httpx.AsyncClient, auth_headers: dict):
+    """Повторный анонимный GET отдаётся из кэша, авторизованный — всегда из БД"""
+    first = await client.get("/api/products?limit=10")
+    second = await client.get("/api/products?limit=10")
+    assert first.headers["x-cache"] == "MISS"
+    assert second.headers["x-cache"] == "HIT"
+    assert second.json() == first.json()
+    assert "surrogate-key" not in second.headers
+    assert second.headers["etag"] == first.headers["etag"]
+
+    other_query = await client.get("/api/products?limit=5")
+    assert other_query.headers["x-cache"] == "MISS"
+
+    admin = await client.get("/api/products?limit=10", headers=auth_headers)
+    assert "x-cache" not in admin.headers
+
+
+@pytest.mark.asyncio
+async def test_admin_mutation_purges_only_affected_entries(client: httpx.AsyncClient, auth_headers: dict):
+    """Изменение цвета сбрасывает листинги с продуктом, но не список коллекций и настройки"""
+    for url in ("/api/products", "/api/categories/outerwear", "/api/collections"):
+        await client.get(url)
+
+    color_id = (await client.get("/api/products")).json()["products"][0]["id"]
+    response = await client.put(f"/api/products/colors/{color_id}", json={"title": "Purged"}, headers=auth_headers)
+    assert response.status_code == 200
+
+    products = await client.get("/api/products")
+    assert products.headers["x-cache"] == "MISS"
+    assert products.json()["products"][0]["title"] == "Purged"
+    category = await client.get("/api/categories/outerwear")
+    assert category.headers["x-cache"] == "MISS"
+    assert (await client.get("/api/collections")).headers["x-cache"] == "HIT"
+
+
+@pytest.mark.asyncio
+async def test_category_assignment_purges_category_listing(client: httpx.AsyncClient, auth_headers: dict):
+    """Новая привязка к категории сбрасывает листинг этой категории и её предков"""
+    parent = await client.post("/api/categories", json={"name": "Tops", "slug": "tops", "level": 0}, headers=auth_headers)
+    child = await client.post(
+        "/api/categories",
+        json={"name": "Shirts", "slug": "shirts", "parent_id": parent.json()["id"], "level": 1},
+        headers=auth_headers,
+    )
+    assert (await client.get("/api/categories/tops")).json() == []
+    assert (await client.get("/api/categories/tops")).headers["x-cache"] == "HIT"
+
+    response = await client.post(
+        "/api/products/base/1/categories",
+        json={"category_id": child.json()["id"]},
+        headers=auth_headers,
+    )
+    assert response.status_code == 204
+
+    tops = await client.get("/api/categories/tops")
+    assert tops.headers["x-cache"] == "MISS"
+    assert [p["slug"] for p in tops.json()] == ["seed-product"]
+
+
+@pytest.mark.asyncio
+async def test_in_memory_backend_evicts_lru_and_purges_by_tag():
+    backend = InMemoryCacheBackend(max_entries=2)
+    entry = CachedResponse(status=200, headers=[], body=b"{}")
+    await backend.set("/a", entry, ["product:1"], ttl=60)
+    await backend.set("/b", entry, ["product:2"], ttl=60)
+    await backend.get("/a")
+    await backend.set("/c", entry, ["product:1", "products"], ttl=60)
+
+    assert await backend.get("/b") is None
+    assert await backend.purge(["product:1"]) == 2
+    assert await backend.get("/a") is None
+    assert await backend.get("/c") is None
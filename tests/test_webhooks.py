@@ -0,0 +1,154 @@
+"""
+Тесты inbox вебхуков: дедупликация, порядок внутри заказа, повторы и replay
+"""
+import json
+from datetime import datetime, timedelta
+
+import pytest
+import httpx
+from sqlalchemy import select
+
+from src.config import settings
+from src.crud.webhook_inbox import delete_webhook_events_before, replay_webhook_events, store_webhook_event
+from src.models.orders import Order, OrderStatus
+from src.models.webhooks import WebhookEvent
+from src.routers import payments as payments_router
+from src.services import webhook_inbox
+from src.services.webhook_inbox import process_pending_webhooks
+
+
+async def _events(db_session) -> list[WebhookEvent]:
+    result = await db_session.execute(
+        select(WebhookEvent).order_by(WebhookEvent.id).execution_options(populate_existing=True)
+    )
+    return result.scalars().all()
+
+
+@pytest.mark.asyncio
+async def test_tbank_webhook_is_stored_once_and_processed_later(client: httpx.AsyncClient, db_session, monkeypatch):
+    """Вебхук сохраняется и подтверждается сразу, повтор провайдера не дублируется, заказ обновляет воркер"""
+    order = (await client.post("/api/orders", json={
+        "order": {"email": "hook@example.com", "first_name": "Hook", "last_name": "User"},
+        "products": [{"product_size_id": 1, "quantity": 1}],
+    })).json()
+    monkeypatch.setattr(payments_router.tbank_client, "terminal_key", "terminal")
+    monkeypatch.setattr(payments_router.tbank_client, "secret_key", "secret")
+    notification = {
+        "TerminalKey": "terminal", "OrderId": str(order["id"]), "Success": True,
+        "Status": "CONFIRMED", "PaymentId": 555, "ErrorCode": "0", "Amount": 10000,
+    }
+    notification["Token"] = payments_router.tbank_client._generate_token(notification)
+
+    for _ in range(2):
+        response = await client.post("/api/payments/webhook", json=notification)
+        assert response.json() == "OK"
+    forged = await client.post("/api/payments/webhook", json={**notification, "Token": "forged"})
+    assert forged.json() == {"error": "Invalid token"}
+
+    events = await _events(db_session)
+    assert [(event.provider, event.dedup_key, event.state) for event in events] == [("tbank", "555:CONFIRMED", "pending")]
+    assert (await client.get(f"/api/payments/status/{order['id']}")).json()["status"] == "not_paid"
+
+    assert await process_pending_webhooks() == 1
+    assert (await _events(db_session))[0].state == WebhookEvent.DONE
+    db_order = (await db_session.execute(
+        select(Order).where(Order.id == order["id"]).execution_options(populate_existing=True)
+    )).scalar_one()
+    assert db_order.status == OrderStatus.PAID
+    assert db_order.payment_id == "555"
+
+
+@pytest.mark.asyncio
+async def test_inbox_keeps_order_per_order_and_retries(db_session, monkeypatch):
+    """События заказа идут по порядку: упавшее событие повторяется и задерживает следующие, но не чужие"""
+    handled = []
+    failures = {"a1": 1}
+
+    async def handler(db, body):
+        if failures.get(body["name"], 0) > 0:
+            failures[body["name"]] -= 1
+            handled.append(f"{body['name']}!")
+            raise RuntimeError("provider glitch")
+        handled.append(body["name"])
+
+    monkeypatch.setitem(webhook_inbox._handlers, "test", handler)
+    monkeypatch.setattr(settings, "WEBHOOK_RETRY_BASE_SECONDS", 0)
+    for name, order_key in (("a1", "a"), ("a2", "a"), ("b1", "b")):
+        assert await store_webhook_event(db_session, "test", name, order_key, json.dumps({"name": name}))
+    assert not await store_webhook_event(db_session, "test", "a1", "a", json.dumps({"name": "a1"}))
+
+    assert await process_pending_webhooks() == 3
+    assert handled.index("a1!") < handled.index("a1") < handled.index("a2")
+    assert "b1" in handled
+    events = await _events(db_session)
+    assert [(event.dedup_key, event.state, event.attempts) for event in events] == [
+        ("a1", "done", 2), ("a2", "done", 1), ("b1", "done", 1),
+    ]
+
+
+@pytest.mark.asyncio
+async def test_dead_event_is_replayed(db_session, monkeypatch):
+    """После исчерпания попыток событие становится dead и обрабатывается после replay"""
+    failing = True
+
+    async def handler(db, body):
+        if failing:
+            raise RuntimeError("still broken")
+
+    monkeypatch.setitem(webhook_inbox._handlers, "test", handler)
+    monkeypatch.setattr(settings, "WEBHOOK_MAX_ATTEMPTS", 1)
+    await store_webhook_event(db_session, "test", "c1", "c", "{}")
+
+    assert await process_pending_webhooks() == 0
+    event = (await _events(db_session))[0]
+    assert (event.state, event.last_error) == ("dead", "RuntimeError: still broken")
+
+    failing = False
+    assert await replay_webhook_events(db_session) == 1
+    assert await process_pending_webhooks() == 1
+    event = (await _events(db_session))[0]
+    assert (event.state, event.attempts, event.last_error) == ("done", 1, None)
+
+
+
+@pytest.mark.asyncio
+async def test_retention_deletes_only_old_done_events(db_session, monkeypatch):
+    """Очистка удаляет обработанные события старше срока хранения, мёртвые и свежие остаются"""
+    async def handler(db, body):
+        if body["fail"]:
+            raise RuntimeError("broken")
+
+    monkeypatch.setitem(webhook_inbox._handlers, "test", handler)
+    monkeypatch.setattr(settings, "WEBHOOK_MAX_ATTEMPTS", 1)
+    await store_webhook_event(db_session, "test", "old", "a", json.dumps({"fail": False}))
+    await store_webhook_event(db_session, "test", "dead", "b", json.dumps({"fail": True}))
+    assert await process_pending_webhooks() == 1
+
+    assert await delete_webhook_events_before(db_session, datetime.utcnow() - timedelta(days=1)) == 0
+    assert await delete_webhook_events_before(db_session, datetime.utcnow() + timedelta(minutes=1)) == 1
+    assert [(event.dedup_key, event.state) for event in await _events(db_session)] == [("dead", "dead")]
+
+@pytest.mark.asyncio
+async def test_processed_webhook_purges_cached_listing(client: httpx.AsyncClient, monkeypatch):
+    """Неуспешная оплата из вебхука возвращает остаток, и публичный листинг это видит"""
+    async def public_stock() -> int:
+        return (await client.get("/api/products")).json()["products"][0]["sizes"][0]["quantity"]
+
+    before = await public_stock()
+    order = (await client.post("/api/orders", json={
+        "order": {"email": "hook-fail@example.com", "first_name": "Hook", "last_name": "User"},
+        "products": [{"product_size_id": 1, "quantity": 2}],
+    })).json()
+    assert await public_stock() == before - 2
+
+    monkeypatch.setattr(payments_router.tbank_client, "terminal_key", "terminal")
+    monkeypatch.setattr(payments_router.tbank_client, "secret_key", "secret")
+    notification = {
+        "TerminalKey": "terminal", "OrderId": str(order["id"]), "Success": False,
+        "Status": "REJECTED", "PaymentId": 556, "ErrorCode": "1", "Amount": 20000,
+    }
+    notification["Token"] = payments_router.tbank_client._generate_token(notification)
+    assert (await client.post("/api/payments/webhook", json=notification)).json() == "OK"
+
+    assert await process_pending_webhooks() == 1
+    assert await public_stock() == before